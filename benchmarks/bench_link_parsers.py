@@ -0,0 +1,69 @@
+"""Compare link extraction backends on saved landing pages.
+
+Usage::
+
+    python benchmarks/bench_link_parsers.py [--selector "h2 a"] [--repeat 20] [page.html ...]
+
+Without page arguments a synthetic landing page is generated. For every page
+the backends must return identical links; a mismatch exits with status 1.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.links import BACKENDS, extract_links
+
+
+def synthetic_page(articles: int = 2000) -> str:
+    """Return a large landing page with navigation, articles and footer links."""
+    nav = "".join(f'<li><a href="/tag/{i}">tag {i}</a></li>' for i in range(200))
+    posts = "".join(
+        f'<article class="post"><h2><a href="/{i}/post-{i}/">Post {i}</a></h2>'
+        f'<p>{"Lorem ipsum dolor sit amet. " * 20}</p>'
+        f'<a class="author" href="/author/{i % 17}">author</a></article>'
+        for i in range(articles)
+    )
+    return f"<html><head><title>x</title></head><body><nav><ul>{nav}</ul></nav>{posts}<footer></footer></body></html>"
+
+
+def bench(html: str, selector: str, backend: str, repeat: int) -> float:
+    """Return the best wall-clock time in seconds over ``repeat`` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract_links(html, selector, backend)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="Saved HTML pages")
+    parser.add_argument("--selector", default="h2 a", help="CSS selector for article links")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [(p, Path(p).read_text(encoding="utf-8", errors="replace")) for p in args.pages]
+    if not pages:
+        pages = [("<synthetic>", synthetic_page())]
+
+    status = 0
+    for name, html in pages:
+        results = {backend: extract_links(html, args.selector, backend) for backend in BACKENDS}
+        reference = results["bs4"]
+        mismatched = [b for b, links in results.items() if links != reference]
+        print(f"{name}: {len(html) / 1024:.0f} KiB, {len(reference)} links for {args.selector!r}")
+        if mismatched:
+            print(f"  MISMATCH: {', '.join(mismatched)} differ from bs4")
+            status = 1
+        for backend in BACKENDS:
+            ms = bench(html, args.selector, backend, args.repeat) * 1000
+            print(f"  {backend:>5}: {ms:8.2f} ms")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
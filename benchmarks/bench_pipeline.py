@@ -0,0 +1,492 @@
+"""Measure watcher and pipeline throughput against a local synthetic web.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py [--scales 10 100 1000] [--json]
+
+A local HTTP server stands in for the internet: it serves RSS feeds, landing
+pages whose article links match the ``h2 a`` selector, article pages of about
+``--article-kb`` KiB each, and an OpenAI-compatible chat completions endpoint
+that returns a fixed DetectionSpec. Nothing leaves the machine and the real
+``watcher.db`` and ``config.yaml`` are not touched.
+
+Each scenario runs in a fresh subprocess so its peak RSS is its own:
+
+* ``core-feeds`` / ``core-sites``: :mod:`detectobot.core.watcher`
+* ``agent-feeds`` / ``agent-sites``: :mod:`detectobot.agents` watchers
+* ``articles``: :func:`detectobot.core.article.fetch_article_text`
+* ``pipeline``: site discovery, fetch, cleanup and analysis with the fake model
+* ``leased``: ``--procs`` worker processes sharing sites and articles through
+  :func:`detectobot.core.watcher.iter_leased_links`; articles are downloaded
+  but not extracted, and every one must be downloaded exactly once
+
+For every scenario and scale it reports sources/sec, articles/sec, p50/p99
+latency of each stage and peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+SCENARIOS = ["core-feeds", "core-sites", "agent-feeds", "agent-sites", "articles", "pipeline", "leased"]
+
+_WORDS = (
+    "the actor used powershell to download a second stage payload from a staging server "
+    "then created a scheduled task for persistence and dumped lsass memory with comsvcs "
+    "lateral movement followed over smb using stolen credentials before ransomware deployment"
+).split()
+
+
+def _paragraph(seed: int, words: int = 90) -> str:
+    return " ".join(_WORDS[(seed * 7 + i * 3) % len(_WORDS)] for i in range(words)).capitalize() + "."
+
+
+def article_page(source: int, item: int, size_kb: int) -> str:
+    """Return an article page with navigation, body, comments and footer."""
+    nav = "".join(f'<li><a href="/tag/{i}">Tag {i}</a></li>' for i in range(40))
+    body, i = [], 0
+    while sum(map(len, body)) < size_kb * 1024:
+        body.append(f"<p>{_paragraph(source + item + i)}</p>")
+        if i % 6 == 5:
+            body.append(f"<pre>schtasks /create /tn upd{i} /tr C:\\\\Users\\\\Public\\\\u.exe</pre>")
+        i += 1
+    comments = "".join(f'<div class="comment"><p>Great post {c}!</p></div>' for c in range(10))
+    return (
+        f"<html><head><title>Report {source}-{item}</title></head><body>"
+        f"<nav><ul>{nav}</ul></nav><article><h1>Intrusion report {source}-{item}</h1>"
+        f"{''.join(body)}</article><section><h3>3 Comments</h3>{comments}</section>"
+        "<footer>Copyright 2024</footer></body></html>"
+    )
+
+
+def landing_page(source: int, items: int) -> str:
+    """Return a landing page with ``items`` article links plus navigation links."""
+    nav = "".join(f'<a href="/tag/{i}">Tag {i}</a>' for i in range(50))
+    posts = "".join(
+        f'<div class="post"><h2><a href="/article/{source}/{i}">Post {i}</a></h2>'
+        f'<p>{_paragraph(i, 30)}</p></div>'
+        for i in range(items)
+    )
+    return f"<html><body><nav>{nav}</nav>{posts}</body></html>"
+
+
+def feed_xml(base: str, source: int, items: int) -> str:
+    """Return an RSS 2.0 feed with ``items`` entries."""
+    entries = "".join(
+        f"<item><title>Post {i}</title><link>{base}/article/{source}/{i}</link>"
+        f"<description>{_paragraph(i, 30)}</description></item>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Feed {source}</title><link>{base}/</link><description>x</description>"
+        f"{entries}</channel></rss>"
+    )
+
+
+FAKE_SPEC = {
+    "article_title": "Synthetic intrusion report",
+    "source_url": "https://example.com/report",
+    "publication_date": "2024-01-01",
+    "threat_actor": None,
+    "ttps": [],
+    "prerequisites": [],
+    "notes": "",
+    "status": "draft",
+}
+
+
+def make_handler(items: int, article_kb: int, latency: float, llm_latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs add ~40 ms to every response on a kept-alive connection.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            time.sleep(latency)
+            parts = self.path.strip("/").split("/")
+            base = f"http://{self.headers['Host']}"
+            if parts[0] == "feed" and len(parts) == 2:
+                self._send(200, feed_xml(base, int(parts[1]), items), "application/rss+xml")
+            elif parts[0] == "site" and len(parts) == 2:
+                self._send(200, landing_page(int(parts[1]), items), "text/html")
+            elif parts[0] == "article" and len(parts) == 3:
+                self._send(200, article_page(int(parts[1]), int(parts[2]), article_kb), "text/html")
+            else:
+                self._send(404, "not found", "text/plain")
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(llm_latency)
+            message = {"role": "assistant", "content": None}
+            tools = body.get("tools") or []
+            if tools:
+                name = (tools[0].get("function") or tools[0])["name"]
+                message["tool_calls"] = [
+                    {"id": "call-1", "type": "function", "function": {"name": name, "arguments": json.dumps(FAKE_SPEC)}}
+                ]
+            else:
+                message["content"] = json.dumps(FAKE_SPEC)
+            reply = {
+                "id": "bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tools else "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+            self._send(200, json.dumps(reply), "application/json")
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    # Leased workers open many connections at once; the default backlog of 5
+    # drops some, and the client only retries them a second later.
+    request_queue_size = 128
+
+
+def start_server(items: int, article_kb: int, latency: float, llm_latency: float) -> ThreadingHTTPServer:
+    """Start the synthetic web on an ephemeral localhost port in a daemon thread."""
+    server = _Server(("127.0.0.1", 0), make_handler(items, article_kb, latency, llm_latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_configs(
+    workdir: Path, base: str, sources: int, workers: int, extract_workers: int | None = None
+) -> tuple[Path, Path]:
+    """Write a full config and a feeds-only config for ``sources`` feeds and sites.
+
+    All sources share one host, so the per-host cap is raised to the global
+    cap to model ``sources`` distinct hosts. ``extract_workers`` sets
+    ``extraction.workers`` (one per CPU if None, 0 for in-process).
+    """
+    feeds = "".join(f"  - name: feed-{i}\n    url: {base}/feed/{i}\n" for i in range(sources))
+    sites = "".join(f"  - name: site-{i}\n    url: {base}/site/{i}\n    selector: h2 a\n" for i in range(sources))
+    settings = (
+        f"concurrency:\n  max_workers: {workers}\n  per_host: {workers}\n"
+        "seen_filter:\n  enabled: true\n  max_entries: 200000\n"
+        f"pipeline:\n  queue_size: 16\n  fetch_workers: {workers}\n"
+        "llm:\n  max_concurrency: 8\n"
+        "link_parser: auto\n"
+    )
+    if extract_workers is not None:
+        settings += f"extraction:\n  workers: {extract_workers}\n"
+    config = workdir / "config.yaml"
+    config.write_text(f"feeds:\n{feeds}sites:\n{sites}{settings}")
+    feeds_only = workdir / "feeds.yaml"
+    feeds_only.write_text(f"feeds:\n{feeds}")
+    return config, feeds_only
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))]
+
+
+def timed(samples: list[float], fn):
+    """Wrap ``fn`` so every call's duration is appended to ``samples``."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_scenario(
+    scenario: str,
+    base: str,
+    sources: int,
+    items: int,
+    workers: int,
+    max_articles: int,
+    workdir: str | None = None,
+    extract_workers: int | None = None,
+) -> dict:
+    """Run one scenario in this process and return its measurements.
+
+    ``workdir`` holds configs and a database shared with other processes;
+    by default a fresh one is created.
+    """
+    if workdir is None:
+        workdir = Path(tempfile.mkdtemp(prefix="detectobot-bench-"))
+        config, feeds_only = write_configs(workdir, base, sources, workers, extract_workers)
+    else:
+        workdir = Path(workdir)
+        config, feeds_only = workdir / "config.yaml", workdir / "feeds.yaml"
+    db_path = str(workdir / "bench.db")
+
+    from detectobot.core import config as core_config
+
+    core_config.CONFIG_PATH = str(config)
+    from detectobot.core import watcher
+    from detectobot.core.article import fetch_article_text
+    from detectobot.core.content_store import ContentStore
+    from detectobot.core.fetcher import fetch_all
+
+    stages: dict[str, list[float]] = {}
+    articles = 0
+    start = time.perf_counter()
+    if scenario == "core-feeds":
+        stages["fetch"] = []
+        watcher._fetch_feed_entries = timed(stages["fetch"], watcher._fetch_feed_entries)
+        articles = len(watcher.get_new_feed_links(db_path))
+    elif scenario == "core-sites":
+        stages["fetch"] = []
+        watcher._fetch_site_links = timed(stages["fetch"], watcher._fetch_site_links)
+        articles = len(watcher.get_new_site_links(db_path))
+    elif scenario == "agent-feeds":
+        from detectobot.agents import feed_watcher
+
+        stages["fetch"] = []
+        feed_watcher._fetch_entries = timed(stages["fetch"], feed_watcher._fetch_entries)
+        articles = len(feed_watcher.get_new_article_links(db_path, str(feeds_only), workers, workers))
+    elif scenario == "agent-sites":
+        from detectobot.agents import site_watcher
+
+        stages["fetch"] = []
+        site_watcher._fetch_links = timed(stages["fetch"], site_watcher._fetch_links)
+        articles = len(site_watcher.get_new_article_links(db_path, str(config), workers, workers))
+    elif scenario == "articles":
+        urls = [f"{base}/article/{s}/{i}" for s in range(sources) for i in range(items)][:max_articles]
+        store = ContentStore(db_path)
+        stages["fetch"] = []
+        fetch = timed(stages["fetch"], fetch_article_text)
+        start = time.perf_counter()
+        articles = len(fetch_all(urls, lambda url: fetch(url, store), workers, workers))
+    elif scenario == "pipeline":
+        articles, stages = _run_pipeline(watcher, base, db_path, workers, max_articles)
+    elif scenario == "leased":
+        run = _leased_worker(watcher, db_path, workers)
+        # Tell run_leased this worker is set up, then start with the others.
+        print("ready", flush=True)
+        while not (workdir / "go").exists():
+            time.sleep(0.01)
+        start = time.perf_counter()
+        links, stages = run()
+        articles = len(links)
+    else:
+        raise ValueError(f"unknown scenario {scenario!r}")
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": scenario,
+        "sources": sources,
+        "articles": articles,
+        "seconds": elapsed,
+        "sources_per_sec": sources / elapsed,
+        "articles_per_sec": articles / elapsed,
+        "latency_ms": {
+            name: {"p50": percentile(s, 0.5) * 1000, "p99": percentile(s, 0.99) * 1000}
+            for name, s in stages.items()
+        },
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **({"links": links} if scenario == "leased" else {}),
+    }
+
+
+def _run_pipeline(watcher, base: str, db_path: str, workers: int, max_articles: int):
+    from itertools import islice
+
+    from detectobot.agents import summarizer
+    from detectobot.core.analysis import AnalysisPool, ModelGate
+    from detectobot.core.article import fetch_article_text
+    from detectobot.core.content_store import ContentStore
+    from detectobot.core.llm_cache import LLMCache
+    from detectobot.core.pipeline import Stage, run_pipeline
+    from detectobot.core.textprep import clean_text
+
+    os.environ["OPENAI_BASE_URL"] = f"{base}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    # The fake endpoint speaks chat completions only.
+    summarizer.MODEL = summarizer.MODEL.replace("openai:", "openai-chat:")
+    cache = LLMCache(db_path)
+    summarizer.get_llm_cache = lambda: cache
+    store = ContentStore(db_path)
+    gate = ModelGate(max_concurrency=8, requests_per_minute=None, tokens_per_minute=None)
+    summarizer.get_model_gate = lambda: gate
+    pool = AnalysisPool(lambda text: summarizer.analyze_text(text, use_cache=False), max_concurrency=8, gate=gate)
+    stages = {"fetch": [], "prepare": [], "analyze": []}
+    pipeline = [
+        Stage("fetch", timed(stages["fetch"], lambda item: dict(item, text=fetch_article_text(item["link"], store))), workers),
+        Stage("prepare", timed(stages["prepare"], lambda item: dict(item, text=clean_text(item["text"])))),
+        Stage("analyze", timed(stages["analyze"], lambda item: dict(item, result=pool.analyze_one(item["text"]))), 8),
+    ]
+    source = islice(watcher.iter_new_site_links(db_path), max_articles)
+    articles = 0
+    for item in run_pipeline(source, pipeline):
+        if item.get("error") is not None:
+            raise RuntimeError(f"{item['stage']} failed for {item['link']}: {item['error']}")
+        articles += 1
+    return articles, stages
+
+
+def _leased_worker(watcher, db_path: str, workers: int):
+    """Set up a leased worker and return a function that runs it.
+
+    The imports and connections are made up front so that the measured run
+    covers the work shared with the other workers, not process startup.
+    """
+    from detectobot.core import http_client
+    from detectobot.core.leases import LeaseQueue
+    from detectobot.core.pipeline import Stage, run_pipeline
+
+    leases = LeaseQueue(db_path)
+    stages = {"fetch": []}
+    fetch = timed(stages["fetch"], lambda item: dict(item, size=len(http_client.get(item["link"]).content)))
+
+    def run():
+        links = []
+        stream = watcher.iter_leased_links(leases, ("site",), db_path)
+        for item in run_pipeline(stream, [Stage("fetch", fetch, workers)]):
+            if item.get("error") is not None:
+                raise RuntimeError(f"{item['stage']} failed for {item['link']}: {item['error']}")
+            leases.finish_article(item)
+            links.append(item["link"])
+        leases.flush()
+        return links, stages
+
+    return run
+
+
+def run_leased(base: str, sources: int, procs: int, args) -> dict:
+    """Run ``procs`` leased workers against one shared database and merge their results."""
+    workdir = Path(tempfile.mkdtemp(prefix="detectobot-bench-"))
+    write_configs(workdir, base, sources, args.workers)
+    cmd = [
+        sys.executable, __file__, "--run", "leased", str(sources), "--base-url", base,
+        "--items", str(args.items), "--workers", str(args.workers), "--workdir", str(workdir),
+    ]
+    running = [subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(procs)]
+    # Time the shared work only: every worker imports and connects first.
+    for proc in running:
+        proc.stdout.readline()
+    (workdir / "go").touch()
+    start = time.perf_counter()
+    outputs = [proc.communicate() for proc in running]
+    elapsed = time.perf_counter() - start
+    for proc, (_, err) in zip(running, outputs):
+        if proc.returncode != 0:
+            raise RuntimeError(f"leased worker failed:\n{err}")
+    results = [json.loads(out.strip().splitlines()[-1]) for out, _ in outputs]
+    links = [link for r in results for link in r["links"]]
+    return {
+        "scenario": f"leased x{procs}",
+        "sources": sources,
+        "articles": len(set(links)),
+        "duplicates": len(links) - len(set(links)),
+        "seconds": elapsed,
+        "sources_per_sec": sources / elapsed,
+        "articles_per_sec": len(set(links)) / elapsed,
+        "latency_ms": {
+            name: {q: max(r["latency_ms"][name][q] for r in results) for q in ("p50", "p99")}
+            for name in results[0]["latency_ms"]
+        },
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in results),
+    }
+
+
+def print_table(results: list[dict]) -> None:
+    print(f"{'scenario':<12} {'sources':>7} {'articles':>8} {'src/s':>9} {'art/s':>9} {'RSS MiB':>8}  stage p50/p99 ms")
+    for r in results:
+        latency = "  ".join(f"{name} {v['p50']:.1f}/{v['p99']:.1f}" for name, v in r["latency_ms"].items())
+        print(
+            f"{r['scenario']:<12} {r['sources']:>7} {r['articles']:>8} {r['sources_per_sec']:>9.1f}"
+            f" {r['articles_per_sec']:>9.1f} {r['peak_rss_mb']:>8.1f}  {latency}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000], help="Numbers of sources")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--items", type=int, default=3, help="Articles per feed or site")
+    parser.add_argument("--article-kb", type=int, default=40, help="Approximate article page size")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated network latency per request")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="Simulated model latency per call")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetches")
+    parser.add_argument("--max-articles", type=int, default=300, help="Cap on articles fetched or analyzed")
+    parser.add_argument(
+        "--extract-workers", type=int, help="Extraction processes (default: one per CPU; 0 for in-process)"
+    )
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4], help="Worker processes for leased")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per result")
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--run", nargs=2, metavar=("SCENARIO", "SOURCES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        scenario, sources = args.run[0], int(args.run[1])
+        result = run_scenario(
+            scenario, args.base_url, sources, args.items, args.workers, args.max_articles, args.workdir,
+            args.extract_workers,
+        )
+        print(json.dumps(result))
+        return 0
+
+    server = start_server(args.items, args.article_kb, args.latency_ms / 1000, args.llm_latency_ms / 1000)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    for sources in args.scales:
+        for scenario in args.scenarios:
+            if scenario == "leased":
+                for procs in args.procs:
+                    result = run_leased(base, sources, procs, args)
+                    if result["duplicates"] or result["articles"] != sources * args.items:
+                        print(f"leased x{procs} @ {sources}: {result}", file=sys.stderr)
+                        return 1
+                    results.append(result)
+                    if args.json:
+                        print(json.dumps(result), flush=True)
+                continue
+            cmd = [
+                sys.executable, __file__, "--run", scenario, str(sources), "--base-url", base,
+                "--items", str(args.items), "--workers", str(args.workers),
+                "--max-articles", str(args.max_articles),
+            ]
+            if args.extract_workers is not None:
+                cmd += ["--extract-workers", str(args.extract_workers)]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{scenario} @ {sources}: failed\n{proc.stderr}", file=sys.stderr)
+                return 1
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            if args.json:
+                print(json.dumps(result), flush=True)
+    server.shutdown()
+    if not args.json:
+        print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Measure CLI cold-start time with ``python -X importtime``.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--repeat 5] [--top 8] [--budget-ms 800] [--json]
+
+Every target runs ``--repeat`` times in a fresh interpreter. For each it
+reports the median wall-clock time, the median total import time, the
+packages that cost the most to import and which heavy dependencies (the LLM
+stack, the article extractor, feed and HTML parsers) got loaded at all. With
+``--budget-ms`` it exits with status 1 when a target's median wall-clock time
+exceeds the budget, so CI can catch startup regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+TARGETS = {
+    "python": ["-c", "pass"],
+    "import summarizer": ["-c", "import detectobot.agents.summarizer"],
+    "import detection_agent": ["-c", "import detectobot.agents.detection_agent"],
+    "summarize --help": ["-m", "detectobot.agents.summarizer", "--help"],
+    "detect --help": ["-m", "detectobot.agents.detection_agent", "--help"],
+}
+
+HEAVY = ("pydantic_ai", "openai", "readability", "feedparser", "bs4", "requests", "lxml")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int]]:
+    """Return ``(module, self microseconds)`` for every ``-X importtime`` line."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us)))
+    return modules
+
+
+def run_once(args: list[str]) -> tuple[float, list[tuple[str, int]]]:
+    """Run one fresh interpreter and return its wall time and import timings."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], capture_output=True, text=True, env=env, cwd=ROOT
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def bench(name: str, args: list[str], repeat: int, top: int) -> dict:
+    walls, totals = [], []
+    packages: dict[str, list[int]] = defaultdict(list)
+    loaded: set[str] = set()
+    for _ in range(repeat):
+        wall, modules = run_once(args)
+        walls.append(wall)
+        totals.append(sum(us for _, us in modules))
+        per_package: dict[str, int] = defaultdict(int)
+        for module, us in modules:
+            package = module.split(".")[0]
+            per_package[package] += us
+            if package in HEAVY:
+                loaded.add(package)
+        for package, us in per_package.items():
+            packages[package].append(us)
+    heaviest = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[:top]
+    return {
+        "target": name,
+        "wall_ms": statistics.median(walls) * 1000,
+        "import_ms": statistics.median(totals) / 1000,
+        "heaviest": {package: us / 1000 for us, package in heaviest},
+        "heavy_loaded": sorted(loaded),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target")
+    parser.add_argument("--top", type=int, default=8, help="Packages listed per target")
+    parser.add_argument("--budget-ms", type=float, help="Fail if a target's median wall time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per target")
+    args = parser.parse_args()
+
+    status = 0
+    for name in args.targets:
+        result = bench(name, TARGETS[name], args.repeat, args.top)
+        over = args.budget_ms is not None and name != "python" and result["wall_ms"] > args.budget_ms
+        if over:
+            status = 1
+        if args.json:
+            print(json.dumps(result), flush=True)
+            continue
+        print(f"{name}: {result['wall_ms']:.0f} ms wall, {result['import_ms']:.0f} ms importing"
+              + ("  OVER BUDGET" if over else ""))
+        print("  heavy: " + (", ".join(result["heavy_loaded"]) or "none"))
+        print("  " + "  ".join(f"{package} {ms:.0f}" for package, ms in result["heaviest"].items()))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,30 @@
-"""CLI tool that summarizes articles and proposes detections using an LLM."""
+"""CLI tool that summarizes articles and proposes detections using an LLM.
+
+The LLM client, the watcher and the article extractor are imported by the
+stage that first needs them, keeping startup cheap.
+"""
 
 import os
 import argparse
-from pydantic import BaseModel
-from pydantic_ai.llm.openai import OpenAIChat
-from pydantic_ai.prompt import Prompt
-import requests
-from bs4 import BeautifulSoup
-from readability import Document
-
-# Add the parent directory to sys.path to allow absolute imports
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from detectobot.core.watcher import get_new_feed_links, get_new_site_links
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+
+from ..core.llm_cache import cache_key, get_llm_cache
+from ..core.analysis import AnalysisPool, estimate_tokens, get_model_gate, pool_from_config
+from ..core.repair import Repairable
+from ..core.content_store import get_content_store
+from ..core.spec_store import get_spec_store
+from ..core.relevance import get_relevance_filter
+from ..core.pipeline import Stage, run_pipeline, pipeline_limits
+from ..core.textprep import clean_text, chunking_limits, count_tokens, map_reduce
+from ..core.metrics import LLM_SECONDS, LLM_TOKENS, start_metrics_server, write_json
+
+if TYPE_CHECKING:
+    from pydantic_ai.llm.openai import OpenAIChat
+    from pydantic_ai.prompt import Prompt
+
+MODEL = "gpt-4o"
 
 DEFAULT_PROMPT = (
     "You are a detection engineering assistant. "
@@ -22,17 +34,62 @@ DEFAULT_PROMPT = (
 )
 
 
-class DetectionResponse(BaseModel):
+class DetectionResponse(Repairable):
     summary: str
     detection_strategy: str
 
 
-def analyze_text(text: str, system_prompt: str) -> DetectionResponse:
-    """Send text to the LLM using Pydantic AI and return structured response."""
-    llm = OpenAIChat(
+@lru_cache(maxsize=1)
+def get_llm() -> "OpenAIChat":
+    """Return the process-wide chat client."""
+    from pydantic_ai.llm.openai import OpenAIChat
+
+    return OpenAIChat(
         api_key=os.environ.get("OPENAI_API_KEY"),
-        model="gpt-4o"
+        model=MODEL
+    )
+
+
+def lookup_cached(text: str, system_prompt: str) -> DetectionResponse | None:
+    """Return the cached DetectionResponse for ``text`` without calling the model."""
+    return get_llm_cache().get(cache_key(text, system_prompt, MODEL, DetectionResponse), DetectionResponse)
+
+
+def _call_llm(llm: "OpenAIChat", prompt: "Prompt", text: str) -> DetectionResponse:
+    """Run one model call through the shared gate, recording its latency and estimated token usage."""
+    def call():
+        with LLM_SECONDS.time(model=MODEL):
+            return llm(prompt, DetectionResponse, article_text=text)
+
+    response = get_model_gate().call(call, estimate_tokens(text))
+    LLM_TOKENS.inc(count_tokens(text), model=MODEL, direction="in")
+    LLM_TOKENS.inc(count_tokens(response.model_dump_json()), model=MODEL, direction="out")
+    return response
+
+
+def merge_responses(partials: list[DetectionResponse]) -> DetectionResponse:
+    """Join the responses for an article's chunks in document order."""
+    return DetectionResponse(
+        summary="\n\n".join(p.summary for p in partials),
+        detection_strategy="\n\n".join(p.detection_strategy for p in partials),
     )
+
+
+def analyze_text(text: str, system_prompt: str, use_cache: bool = True) -> DetectionResponse:
+    """Send text to the LLM using Pydantic AI and return structured response.
+
+    Articles longer than the ``chunking`` token budget are analyzed chunk by
+    chunk, concurrently, and the partial responses joined. Results are cached by article text, prompt, model
+    and schema; pass ``use_cache=False`` to always query the model.
+    """
+    key = cache_key(text, system_prompt, MODEL, DetectionResponse)
+    if use_cache:
+        cached = get_llm_cache().get(key, DetectionResponse)
+        if cached is not None:
+            return cached
+    from pydantic_ai.prompt import Prompt
+
+    llm = get_llm()
     prompt = Prompt(
         system=system_prompt,
         user="""{article_text}
@@ -41,50 +98,32 @@ Return your answer as two sections:
 - Summary: A concise summary (~200 words)
 - Detection Strategy: Your recommended detection strategy"""
     )
-    response = llm(
-        prompt,
-        DetectionResponse,
-        article_text=text
+    limits = chunking_limits()
+    response = map_reduce(
+        text,
+        lambda chunk: _call_llm(llm, prompt, chunk),
+        merge_responses,
+        budget=limits["budget_tokens"],
+        max_workers=limits["max_workers"],
     )
+    get_llm_cache().put(key, MODEL, response)
     return response
 
 
+def analysis_pool(system_prompt: str, use_cache: bool = True) -> AnalysisPool:
+    """Return the analysis pool used by :func:`main`.
 
+    The cache is only consulted by the pool, so each text is looked up, and
+    counted in the cache metrics, once.
+    """
+    return pool_from_config(
+        lambda text: analyze_text(text, system_prompt, use_cache=False),
+        lookup=(lambda text: lookup_cached(text, system_prompt)) if use_cache else None,
+    )
 
 
-def fetch_article_text(url: str) -> str:
-    """Fetch and return main text from an article URL."""
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            " AppleWebKit/537.36 (KHTML, like Gecko)"
-            " Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
-    try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
-        try:
-            doc = Document(resp.text)
-            article_html = doc.summary()
-            soup = BeautifulSoup(article_html, "html.parser")
-            text = soup.get_text(separator="\n")
-            if text.strip():
-                return text
-            raise ValueError("empty")
-        except Exception:
-            soup = BeautifulSoup(resp.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            text = "\n".join(p.get_text() for p in paragraphs)
-            if text.strip():
-                return text
-            return soup.get_text()
-    except Exception as e:
-        return f"[ERROR fetching article: {e}]"
-
-
-def main() -> None:
-    """Execute the detection agent from the command line."""
+def main(argv: list[str] | None = None) -> None:
+    """Execute the detection agent from the command line (``detectobot-detect``)."""
     parser = argparse.ArgumentParser(description="Detection engineering agent")
     parser.add_argument(
         "--prompt",
@@ -95,13 +134,50 @@ def main() -> None:
         action="store_true",
         help="Preview article text only",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached LLM results",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Re-process stored article pages without network access",
+    )
+    parser.add_argument(
+        "--reextract",
+        action="store_true",
+        help="Re-run text extraction on stored pages",
+    )
     parser.add_argument(
         "--source",
         choices=["feed", "site"],
         default="feed",
         help="Source type: feed (RSS) or site (HTML)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and poll each source on its own adaptive schedule",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Share sources and their articles with other --worker processes using the same database",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="Write run metrics as JSON to FILE ('-' for stdout); with --watch, on shutdown",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="With --watch, serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    args = parser.parse_args(argv)
+    if args.worker and args.watch:
+        parser.error("--worker cannot be combined with --watch")
 
     if args.prompt:
         if os.path.isfile(args.prompt):
@@ -111,20 +187,86 @@ def main() -> None:
     else:
         system_prompt = DEFAULT_PROMPT
 
-    sources = get_new_feed_links() if args.source == "feed" else get_new_site_links()
+    store = get_content_store()
+    specs = get_spec_store()
+    leases = None
+    if args.offline:
+        sources = [{"name": "stored", "link": url} for url in store.urls()]
+    elif args.worker:
+        from ..core.leases import get_lease_queue
+        from ..core.watcher import iter_leased_links
+
+        leases = get_lease_queue()
+        sources = iter_leased_links(leases, (args.source,))
+    else:
+        from ..core.watcher import iter_new_feed_links, iter_new_site_links
+
+        sources = iter_new_feed_links() if args.source == "feed" else iter_new_site_links()
+
+    def fetch(item):
+        from ..core.article import fetch_article_text
 
-    for item in sources:
-        name = item["name"]
-        link = item["link"]
-        print(f"\n=== Source: {name} ===")
-        print(f"Article URL: {link}")
-        text = fetch_article_text(link)
-        if args.dry_run:
+        return dict(item, text=fetch_article_text(item["link"], store, offline=args.offline, reextract=args.reextract))
+
+    limits = pipeline_limits()
+    relevance = get_relevance_filter()
+    stages = [
+        Stage("fetch", fetch, limits["fetch_workers"]),
+        Stage("prepare", lambda item: dict(item, text=clean_text(item["text"]))),
+    ]
+    if relevance is not None:
+        stages.insert(0, Stage("triage-url", relevance.check_url))
+        stages.append(Stage("triage-text", relevance.check_text))
+    if not args.dry_run:
+        pool = analysis_pool(system_prompt, use_cache=not args.no_cache)
+        stages.append(
+            Stage("analyze", lambda item: dict(item, result=pool.analyze_one(item["text"])), pool.max_concurrency)
+        )
+
+    def emit(item):
+        print(f"\n=== Source: {item['name']} ===")
+        print(f"Article URL: {item['link']}")
+        if item.get("error") is not None:
+            print(f"[ERROR in {item['stage']}: {item['error']}]")
+        elif item.get("skipped") is not None:
+            print(f"[SKIPPED: {item['skipped']}]")
+        elif args.dry_run:
+            text = item["text"]
             print(text[:7000] + ("..." if len(text) > 7000 else ""))
         else:
-            result = analyze_text(text, system_prompt)
+            result = item["result"]
             print(f"Summary:\n{result.summary}\n")
             print(f"Detection Strategy:\n{result.detection_strategy}\n")
+            if specs is not None:
+                specs.put(item["link"], result)
+
+    if args.watch:
+        from ..core.daemon import watch
+        from ..core.scheduler import scheduler_from_config
+        from ..core.watcher import watched_sources
+
+        if args.metrics_port:
+            start_metrics_server(args.metrics_port)
+        try:
+            watch(
+                scheduler_from_config(watched_sources((args.source,))),
+                stages,
+                emit,
+                sources=lambda: watched_sources((args.source,)),
+            )
+        except KeyboardInterrupt:
+            pass
+        if args.metrics:
+            write_json(args.metrics)
+        return
+    for item in run_pipeline(sources, stages, limits["queue_size"]):
+        emit(item)
+        if leases is not None:
+            leases.finish_article(item)
+    if leases is not None:
+        leases.flush()
+    if args.metrics:
+        write_json(args.metrics)
 
 
 if __name__ == "__main__":
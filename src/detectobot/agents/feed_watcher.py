@@ -1,10 +1,24 @@
 """Feed watcher utilities used by agents."""
 import os
-import sqlite3
+import time
 import feedparser
 from typing import List, Tuple, Dict
 
-from ..core.db_utils import init_db, entry_hash, check_and_store, DB_PATH
+from ..core.config import get_config
+from ..core.db_utils import (
+    connect,
+    init_db,
+    check_and_store_many,
+    check_and_store_changed,
+    load_http_cache,
+    store_http_cache,
+    DB_PATH,
+)
+from ..core.seen_filter import SeenFilter
+from ..core.urls import absolute_url, load_rules
+from ..core import http_client
+from ..core.fetcher import conditional_headers, fetch_all
+from ..core.metrics import record_fetch
 
 # Path to configuration file; can be overridden in tests
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../config.yaml'))
@@ -12,39 +26,72 @@ CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../
 
 def load_config(config_path: str | None = None) -> List[Tuple[str, str]]:
     """Return list of (name, url) tuples from the feeds section."""
-    if config_path is None:
-        config_path = CONFIG_PATH
-    with open(config_path, "r") as f:
-        text = f.read()
-    feeds = []
-    current = None
-    for line in text.splitlines():
-        line = line.rstrip()
-        if line.startswith("feeds:"):
+    return [(feed.name, feed.url) for feed in get_config(config_path or CONFIG_PATH).feeds]
+
+
+def _concurrency_limits(config_path: str | None, max_workers: int | None, per_host: int | None):
+    """Fill unset concurrency limits from the ``concurrency`` config section."""
+    cfg = get_config(config_path or CONFIG_PATH).concurrency
+    return (cfg.max_workers if max_workers is None else max_workers), (cfg.per_host if per_host is None else per_host)
+
+
+def _fetch_entries(url: str, cached: Dict | None = None) -> Tuple[list | None, Dict | None]:
+    """Download and parse one feed, returning ``(entries, validators)``.
+
+    The feed is downloaded through the shared HTTP client. Entry links are
+    kept as listed, skipping malformed ones. Cached ETag/Last-Modified values
+    are sent along so an unchanged feed answers 304 and is not parsed at all;
+    then ``entries`` is empty and ``validators`` None. Both are None if the
+    feed could not be downloaded.
+    """
+    started = time.perf_counter()
+    try:
+        resp = http_client.get(url, headers=conditional_headers(cached), accept=http_client.FEED_TYPES)
+        resp.raise_for_status()
+    except Exception as exc:
+        record_fetch('feed', url, time.perf_counter() - started, getattr(exc, 'result', 'error'))
+        return None, None
+    elapsed = time.perf_counter() - started
+    if resp.status_code == 304:
+        record_fetch('feed', url, elapsed, 'not_modified')
+        return [], None
+    record_fetch('feed', url, elapsed, 'ok', len(resp.content))
+    parsed = feedparser.parse(
+        resp.content,
+        response_headers={'content-location': resp.url, 'content-type': resp.headers.get('Content-Type', '')},
+    )
+    validators = {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+    entries = []
+    for entry in getattr(parsed, 'entries', []):
+        try:
+            link = absolute_url(entry.get('link'))
+        except ValueError:
+            # A malformed link must not hide the rest of the feed.
             continue
-        if line.startswith("  - "):
-            if current:
-                feeds.append(current)
-            current = {}
-            remainder = line[4:]
-            if remainder:
-                key, value = remainder.split(":", 1)
-                current[key.strip()] = value.strip()
-        elif line.startswith("    "):
-            key, value = line.strip().split(":", 1)
-            current[key.strip()] = value.strip()
-    if current:
-        feeds.append(current)
-    return [(f.get("name"), f.get("url")) for f in feeds]
+        entries.append({'title': entry.get('title'), 'link': link})
+    return entries, validators
 
 
-def get_latest_article_links(config_path: str | None = None) -> List[Dict[str, str]]:
+def get_latest_article_links(
+    config_path: str | None = None,
+    max_workers: int | None = None,
+    per_host: int | None = None,
+) -> List[Dict[str, str]]:
     """Return the latest article link from each configured feed."""
     feeds = load_config(config_path) if config_path is not None else load_config()
+    max_workers, per_host = _concurrency_limits(config_path, max_workers, per_host)
+    results = fetch_all(
+        feeds,
+        lambda feed: _fetch_entries(feed[1]),
+        max_workers,
+        per_host,
+        key=lambda feed: feed[1],
+    )
     links: List[Dict[str, str]] = []
-    for name, url in feeds:
-        parsed = feedparser.parse(url)
-        entries = getattr(parsed, 'entries', [])
+    for (name, url), (entries, _) in zip(feeds, results):
         if entries:
             link = entries[0].get('link')
             if link:
@@ -52,20 +99,49 @@ def get_latest_article_links(config_path: str | None = None) -> List[Dict[str, s
     return links
 
 
-def get_new_article_links(db_path: str = DB_PATH, config_path: str | None = None) -> List[Dict[str, str]]:
-    """Return unseen article links from all configured feeds."""
-    conn = sqlite3.connect(db_path)
-    init_db(conn)
-    new_links: List[Dict[str, str]] = []
+def get_new_article_links(
+    db_path: str = DB_PATH,
+    config_path: str | None = None,
+    max_workers: int | None = None,
+    per_host: int | None = None,
+    seen: SeenFilter | None = None,
+) -> List[Dict[str, str]]:
+    """Return unseen article links from all configured feeds.
+
+    Feeds are fetched concurrently; entries are checked against the database
+    in configuration order so the result matches a sequential run. Pass a
+    :class:`SeenFilter` as ``seen`` to skip database lookups for known links.
+    Entries a feed already listed last time are skipped as configured in the
+    ``incremental`` section (see :func:`check_and_store_changed`). Unset
+    concurrency limits come from the ``concurrency`` section.
+    """
     feeds = load_config(config_path) if config_path is not None else load_config()
-    for name, url in feeds:
-        parsed = feedparser.parse(url)
-        for entry in getattr(parsed, 'entries', []):
-            h = entry_hash(entry)
-            if check_and_store(conn, h, name, entry):
-                link = entry.get('link')
-                if link:
-                    new_links.append({'name': name, 'link': link})
+    rules = load_rules(config_path or CONFIG_PATH)
+    max_workers, per_host = _concurrency_limits(config_path, max_workers, per_host)
+    incremental = get_config(config_path or CONFIG_PATH).incremental
+    conn = connect(db_path)
+    init_db(conn, rules)
+    cache = load_http_cache(conn)
+    results = fetch_all(
+        feeds,
+        lambda feed: _fetch_entries(feed[1], cache.get(feed[1])),
+        max_workers,
+        per_host,
+        key=lambda feed: feed[1],
+    )
+    new_links: List[Dict[str, str]] = []
+    for (name, url), (entries, validators) in zip(feeds, results):
+        if entries is None:
+            continue
+        if incremental.enabled:
+            new = check_and_store_changed(conn, url, name, entries, seen, rules, incremental.full_scan_every)
+        else:
+            new = check_and_store_many(conn, name, entries, seen, rules)
+        for entry in new:
+            link = entry.get('link')
+            if link:
+                new_links.append({'name': name, 'link': link})
+        store_http_cache(conn, url, validators)
     conn.close()
     return new_links
 
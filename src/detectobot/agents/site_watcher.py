@@ -1,51 +1,121 @@
 """Website watcher utilities used by agents."""
 import os
-import sqlite3
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import time
 from typing import List, Tuple, Dict
 
 
-from ..core.db_utils import init_db, entry_hash, check_and_store, DB_PATH
+from ..core import http_client
+from ..core.config import get_config
+from ..core.db_utils import (
+    connect,
+    init_db,
+    check_and_store_many,
+    check_and_store_changed,
+    load_http_cache,
+    store_http_cache,
+    DB_PATH,
+)
+from ..core.seen_filter import SeenFilter
+from ..core.urls import absolute_links, load_rules
+from ..core.links import extract_links
+from ..core.metrics import PARSE_SECONDS, record_fetch
+from ..core.fetcher import (
+    fetch_all,
+    conditional_headers,
+    body_digest,
+)
 
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../config.yaml'))
 
 
 def load_config(config_path: str | None = None) -> List[Tuple[str, str, str]]:
     """Return list of (name, url, selector) tuples from the sites section."""
-    if config_path is None:
-        config_path = CONFIG_PATH
-    with open(config_path, "r") as f:
-        import yaml
-        cfg = yaml.safe_load(f)
-    sites = cfg.get('sites', [])
-    return [(s['name'], s['url'], s.get('selector', 'a')) for s in sites]
-
-
-def get_new_article_links(db_path: str = DB_PATH, config_path: str | None = None) -> List[Dict[str, str]]:
-    """Return unseen article links from configured websites."""
-    conn = sqlite3.connect(db_path)
-    init_db(conn)
-    new_links: List[Dict[str, str]] = []
-    headers = {"User-Agent": "Mozilla/5.0"}
+    return [(site.name, site.url, site.selector) for site in get_config(config_path or CONFIG_PATH).sites]
+
+
+def _fetch_links(
+    url: str,
+    selector: str,
+    cached: Dict | None = None,
+    backend: str = "auto",
+) -> Tuple[List[str] | None, Dict | None]:
+    """Download one site and return ``(links, validators)``.
+
+    ``links`` holds the absolute links matching ``selector``, found with the
+    ``backend`` link parser, or None when the page could not be fetched. A 304
+    or a body identical to the last poll is not parsed and yields no links.
+    """
+    started = time.perf_counter()
+    try:
+        resp = http_client.get(url, headers=conditional_headers(cached))
+        resp.raise_for_status()
+    except Exception as exc:
+        record_fetch('site', url, time.perf_counter() - started, getattr(exc, 'result', 'error'))
+        return None, None
+    elapsed = time.perf_counter() - started
+    if resp.status_code == 304:
+        record_fetch('site', url, elapsed, 'not_modified')
+        return [], None
+    validators = {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+        'digest': body_digest(resp.content, selector),
+    }
+    if cached and cached.get('digest') == validators['digest']:
+        record_fetch('site', url, elapsed, 'unchanged', len(resp.content))
+        return [], validators
+    record_fetch('site', url, elapsed, 'ok', len(resp.content))
+    with PARSE_SECONDS.time(backend=backend):
+        found = extract_links(resp.text, selector, backend)
+    links = absolute_links(found, base=url)
+    return links, validators
+
+
+def get_new_article_links(
+    db_path: str = DB_PATH,
+    config_path: str | None = None,
+    max_workers: int | None = None,
+    per_host: int | None = None,
+    seen: SeenFilter | None = None,
+) -> List[Dict[str, str]]:
+    """Return unseen article links from configured websites.
+
+    Sites are fetched and parsed concurrently; links are checked against the
+    database in configuration order so the result matches a sequential run. Pass a
+    :class:`SeenFilter` as ``seen`` to skip database lookups for known links.
+    Links a site already listed last time are skipped as configured in the
+    ``incremental`` section (see :func:`check_and_store_changed`). Unset
+    concurrency limits and the link parser come from the ``concurrency`` and
+    ``link_parser`` config keys, as for :mod:`detectobot.core.watcher`.
+    """
+    config = get_config(config_path or CONFIG_PATH)
     sites = load_config(config_path) if config_path is not None else load_config()
-    for name, url, selector in sites:
-        try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-        except Exception:
+    rules = load_rules(config_path or CONFIG_PATH)
+    max_workers = config.concurrency.max_workers if max_workers is None else max_workers
+    per_host = config.concurrency.per_host if per_host is None else per_host
+    conn = connect(db_path)
+    init_db(conn, rules)
+    cache = load_http_cache(conn)
+    results = fetch_all(
+        sites,
+        lambda site: _fetch_links(site[1], site[2], cache.get(site[1]), config.link_parser),
+        max_workers,
+        per_host,
+        key=lambda site: site[1],
+    )
+    new_links: List[Dict[str, str]] = []
+    for (name, url, selector), (links, validators) in zip(sites, results):
+        if links is None:
             continue
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        for a in soup.select(selector):
-            link = a.get('href')
-            if not link:
-                continue
-            abs_link = urljoin(url, link)
-            entry = {'link': abs_link}
-            h = entry_hash(entry)
-            if check_and_store(conn, h, name, entry):
-                new_links.append({'name': name, 'link': abs_link})
+        entries = [{'link': link} for link in links]
+        if config.incremental.enabled:
+            new = check_and_store_changed(
+                conn, url, name, entries, seen, rules, config.incremental.full_scan_every
+            )
+        else:
+            new = check_and_store_many(conn, name, entries, seen, rules)
+        for entry in new:
+            new_links.append({'name': name, 'link': entry['link']})
+        store_http_cache(conn, url, validators)
     conn.close()
     return new_links
-
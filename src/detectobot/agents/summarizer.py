@@ -1,17 +1,31 @@
-"""ThreatIntel2Detection summarizer using Pydantic AI."""
+"""ThreatIntel2Detection summarizer using Pydantic AI.
+
+Only the lightweight core modules are imported up front; the watcher, the
+article extractor and Pydantic AI are imported by the stage that first needs
+them, so ``--help``, ``--dry-run`` and runs without new articles start fast.
+"""
 import os
 import argparse
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import requests
-from bs4 import BeautifulSoup
-from readability import Document
 from pydantic import BaseModel, HttpUrl
-from pydantic_ai import Agent
+from pydantic.json_schema import SkipJsonSchema
+
+from ..core.llm_cache import cache_key, get_llm_cache
+from ..core.analysis import AnalysisPool, estimate_tokens, get_model_gate, pool_from_config, run_async
+from ..core.repair import Repairable
+from ..core.content_store import get_content_store
+from ..core.spec_store import get_spec_store
+from ..core.relevance import get_relevance_filter
+from ..core.pipeline import Stage, run_pipeline, pipeline_limits
+from ..core.textprep import clean_text, chunking_limits, map_reduce
+from ..core.metrics import LLM_RETRIES, LLM_SECONDS, LLM_TOKENS, start_metrics_server, write_json
 
-# Allow absolute imports for watcher utilities
-import sys
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
-from detectobot.core.watcher import get_new_site_links
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
+
+MODEL = "openai:gpt-4o"
 
 DEFAULT_PROMPT = ("""
     You are “ThreatIntel2Detection”, an expert LLM assistant that ingests public cyber-threat-intelligence documents and converts them into high-quality, production-ready detection specifications.
@@ -21,7 +35,7 @@ DEFAULT_PROMPT = ("""
 
     ### 2. Required reasoning steps (think, then only output the final JSON)
     1. **Read & comprehend** the entire source; do not skim.  
-    2. **Extract metadata**: article_title, source_url, publication_date, threat_actor.  
+    2. **Extract metadata**: article_title, publication_date, threat_actor.  
     3. **Parse TTPs**  
     • Map each to ATT&CK tactic, technique, sub-technique following CISA mapping best-practices.  
     • Capture procedure-level detail (commands, registry keys, HTTP headers, etc.).  
@@ -49,7 +63,7 @@ DEFAULT_PROMPT = ("""
     • Don't hallucinate.
 
     ### 5. Error handling
-    If validation of the JSON against the schema would fail, retry once internally; otherwise return `status` = `insufficient_detail`.
+    Always include every list field, using an empty list when there is nothing to report.
 
     ### 6. JSON schema
     class SigmaStub(BaseModel):
@@ -74,7 +88,6 @@ DEFAULT_PROMPT = ("""
 
     class DetectionSpec(BaseModel):
         article_title: str
-        source_url: HttpUrl
         publication_date: date
         threat_actor: Optional[str]
         ttps: List[TTPEntry]
@@ -108,9 +121,10 @@ class TTPEntry(BaseModel):
     falsepositive_notes: list[str]
 
 
-class DetectionSpec(BaseModel):
+class DetectionSpec(Repairable):
     article_title: str
-    source_url: HttpUrl
+    # Filled from the article link (see with_source_url), not asked of the model.
+    source_url: SkipJsonSchema[HttpUrl | None] = None
     publication_date: str
     threat_actor: str | None
     ttps: list[TTPEntry]
@@ -118,55 +132,181 @@ class DetectionSpec(BaseModel):
     notes: str
     status: str
 
-def analyze_text(text: str, system_prompt: str = DEFAULT_PROMPT) -> DetectionSpec:
-    """Send text to the LLM and parse the DetectionSpec."""
-    agent = Agent(
-        "openai:gpt-4o",
+@lru_cache(maxsize=8)
+def get_agent(system_prompt: str = DEFAULT_PROMPT) -> "Agent":
+    """Return the process-wide agent for ``system_prompt``."""
+    from pydantic_ai import Agent
+
+    return Agent(
+        MODEL,
         system_prompt=system_prompt,
         output_type=DetectionSpec,
     )
-    result = agent.run_sync(
-        f"Here is the article text:\n\n{text}",
+
+
+def lookup_cached(text: str, system_prompt: str = DEFAULT_PROMPT) -> DetectionSpec | None:
+    """Return the cached DetectionSpec for ``text`` without calling the model."""
+    return get_llm_cache().get(cache_key(text, system_prompt, MODEL, DetectionSpec), DetectionSpec)
+
+
+def _run_agent(agent: "Agent", text: str) -> DetectionSpec:
+    """Run one model call through the shared gate, recording its latency and token usage."""
+    prompt = f"Here is the article text:\n\n{text}"
+
+    def call():
+        with LLM_SECONDS.time(model=MODEL):
+            return run_async(agent.run(prompt))
+
+    result = get_model_gate().call(call, estimate_tokens(prompt))
+    # ``usage`` is a method in older Pydantic AI releases and a property in newer ones.
+    usage = result.usage() if callable(result.usage) else result.usage
+    LLM_TOKENS.inc(getattr(usage, "input_tokens", None) or getattr(usage, "request_tokens", 0) or 0,
+                   model=MODEL, direction="in")
+    LLM_TOKENS.inc(getattr(usage, "output_tokens", None) or getattr(usage, "response_tokens", 0) or 0,
+                   model=MODEL, direction="out")
+    # Each retry prompt is a round trip spent on output that failed validation.
+    retries = sum(
+        getattr(part, "part_kind", None) == "retry-prompt"
+        for message in result.all_messages()
+        for part in getattr(message, "parts", ())
     )
+    if retries:
+        LLM_RETRIES.inc(retries, model=MODEL)
     return result.output
 
 
-def fetch_article_text(url: str) -> str:
-    """Fetch and return the main text from an article URL."""
-    headers = {"User-Agent": "Mozilla/5.0"}
+def with_source_url(spec: DetectionSpec, link: str) -> DetectionSpec:
+    """Return ``spec`` with ``source_url`` set to the analyzed article's ``link``."""
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
-        try:
-            doc = Document(resp.text)
-            article_html = doc.summary()
-            soup = BeautifulSoup(article_html, "html.parser")
-            text = soup.get_text(separator="\n")
-            if text.strip():
-                return text
-            raise ValueError("empty")
-        except Exception:
-            soup = BeautifulSoup(resp.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            text = "\n".join(p.get_text() for p in paragraphs)
-            if text.strip():
-                return text
-            return soup.get_text()
-    except Exception as e:
-        return f"[ERROR fetching article: {e}]"
-
-
-def main() -> argparse.Namespace:
+        return spec.model_copy(update={"source_url": HttpUrl(link)})
+    except ValueError:
+        return spec
+
+
+_CONFIDENCE_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+def merge_specs(partials: list[DetectionSpec]) -> DetectionSpec:
+    """Combine the DetectionSpecs of an article's chunks into one.
+
+    Metadata comes from the first chunk that has it, TTPs are de-duplicated
+    by tactic and technique keeping the most confident entry, prerequisites
+    are merged in order and notes concatenated.
+    """
+    def first(field):
+        return next((getattr(p, field) for p in partials if getattr(p, field)), getattr(partials[0], field))
+
+    ttps: dict[tuple, TTPEntry] = {}
+    for partial in partials:
+        for ttp in partial.ttps:
+            key = (ttp.tactic.strip().lower(), ttp.technique.strip().upper(), (ttp.subtechnique or "").strip().upper())
+            current = ttps.get(key)
+            if current is None or (
+                _CONFIDENCE_RANK.get(ttp.detectability_confidence, 3)
+                < _CONFIDENCE_RANK.get(current.detectability_confidence, 3)
+            ):
+                ttps[key] = ttp
+    prerequisites = list(dict.fromkeys(p for partial in partials for p in partial.prerequisites))
+    statuses = [p.status for p in partials if p.status != "insufficient_detail"]
+    if not statuses:
+        status = "insufficient_detail"
+    elif "draft" in statuses:
+        status = "draft"
+    else:
+        status = statuses[0]
+    return DetectionSpec(
+        article_title=first("article_title"),
+        source_url=partials[0].source_url,
+        publication_date=first("publication_date"),
+        threat_actor=first("threat_actor"),
+        ttps=list(ttps.values()),
+        prerequisites=prerequisites,
+        notes="\n".join(p.notes for p in partials if p.notes),
+        status=status,
+    )
+
+
+def analyze_text(text: str, system_prompt: str = DEFAULT_PROMPT, use_cache: bool = True) -> DetectionSpec:
+    """Send text to the LLM and parse the DetectionSpec.
+
+    Articles longer than the ``chunking`` token budget are split into chunks
+    that are analyzed concurrently and merged with :func:`merge_specs`.
+    Results are cached by article text, prompt, model and schema; pass
+    ``use_cache=False`` to always query the model.
+    """
+    key = cache_key(text, system_prompt, MODEL, DetectionSpec)
+    if use_cache:
+        cached = get_llm_cache().get(key, DetectionSpec)
+        if cached is not None:
+            return cached
+    agent = get_agent(system_prompt)
+    limits = chunking_limits()
+    output = map_reduce(
+        text,
+        lambda chunk: _run_agent(agent, chunk),
+        merge_specs,
+        budget=limits["budget_tokens"],
+        max_workers=limits["max_workers"],
+    )
+    get_llm_cache().put(key, MODEL, output)
+    return output
+
+
+def analysis_pool(system_prompt: str = DEFAULT_PROMPT, use_cache: bool = True) -> AnalysisPool:
+    """Return a pool running :func:`analyze_text` with the shared model gate.
+
+    With ``use_cache`` the pool looks each text up in the LLM cache first, so
+    hits skip the gate; :func:`analyze_text` then skips its own lookup, which
+    would count every miss twice. Results are cached either way.
+    """
+    return pool_from_config(
+        lambda text: analyze_text(text, system_prompt, use_cache=False),
+        lookup=(lambda text: lookup_cached(text, system_prompt)) if use_cache else None,
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     """Parse command-line arguments for the summarizer utility."""
     parser = argparse.ArgumentParser(description="Summarize a threat intel article")
     parser.add_argument("url", nargs="?", help="Article URL to process")
     parser.add_argument("--prompt", help="Override system prompt text or path to file")
     parser.add_argument("--dry-run", action="store_true", help="Print article text only")
-    return parser.parse_args()
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached LLM results")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use only stored article pages; without a URL, re-process every stored article",
+    )
+    parser.add_argument("--reextract", action="store_true", help="Re-run text extraction on stored pages")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and poll each configured site on its own adaptive schedule",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Share sites and their articles with other --worker processes using the same database",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="Write run metrics as JSON to FILE ('-' for stdout); with --watch, on shutdown",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="With --watch, serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    args = parser.parse_args(argv)
+    if args.worker and args.watch:
+        parser.error("--worker cannot be combined with --watch")
+    return args
 
 
-if __name__ == "__main__":
-    args = main()
+def main(argv: list[str] | None = None) -> None:
+    """Run the summarizer from the command line (``detectobot-summarize``)."""
+    args = parse_args(argv)
     system_prompt = DEFAULT_PROMPT
     if args.prompt:
         if os.path.isfile(args.prompt):
@@ -174,19 +314,95 @@ if __name__ == "__main__":
         else:
             system_prompt = args.prompt
 
+    store = get_content_store()
+    specs = get_spec_store()
+    leases = None
     if args.url:
         sources = [{"name": "manual", "link": args.url}]
+    elif args.offline:
+        sources = [{"name": "stored", "link": url} for url in store.urls()]
+    elif args.worker:
+        from ..core.leases import get_lease_queue
+        from ..core.watcher import iter_leased_links
+
+        leases = get_lease_queue()
+        sources = iter_leased_links(leases, ("site",))
     else:
-        sources = get_new_site_links()
-        if not sources:
-            print("No new articles found.")
-            exit(0)
-
-    for item in sources:
-        link = item["link"]
-        text = fetch_article_text(link)
-        if args.dry_run:
-            print(text)
+        from ..core.watcher import iter_new_site_links
+
+        sources = iter_new_site_links()
+
+    def fetch(item):
+        from ..core.article import fetch_article_text
+
+        return dict(item, text=fetch_article_text(item["link"], store, offline=args.offline, reextract=args.reextract))
+
+    limits = pipeline_limits()
+    # A URL given on the command line is always analyzed.
+    relevance = None if args.url else get_relevance_filter()
+    stages = [
+        Stage("fetch", fetch, limits["fetch_workers"]),
+        Stage("prepare", lambda item: dict(item, text=clean_text(item["text"]))),
+    ]
+    if relevance is not None:
+        stages.insert(0, Stage("triage-url", relevance.check_url))
+        stages.append(Stage("triage-text", relevance.check_text))
+    if not args.dry_run:
+        pool = analysis_pool(system_prompt, use_cache=not args.no_cache)
+        stages.append(
+            Stage(
+                "analyze",
+                lambda item: dict(item, result=with_source_url(pool.analyze_one(item["text"]), item["link"])),
+                pool.max_concurrency,
+            )
+        )
+
+    emitted = 0
+
+    def emit(item):
+        nonlocal emitted
+        emitted += 1
+        if item.get("error") is not None:
+            print(f"[ERROR {item['stage']} {item['link']}: {item['error']}]")
+        elif item.get("skipped") is not None:
+            print(f"[SKIPPED {item['link']}: {item['skipped']}]")
+        elif args.dry_run:
+            print(item["text"])
         else:
-            spec = analyze_text(text, system_prompt)
-            print(spec.model_dump_json(indent=2))
+            print(item["result"].model_dump_json(indent=2))
+            if specs is not None:
+                specs.put(item["link"], item["result"])
+
+    if args.watch:
+        from ..core.daemon import watch
+        from ..core.scheduler import scheduler_from_config
+        from ..core.watcher import watched_sources
+
+        if args.metrics_port:
+            start_metrics_server(args.metrics_port)
+        try:
+            watch(
+                scheduler_from_config(watched_sources(("site",))),
+                stages,
+                emit,
+                sources=lambda: watched_sources(("site",)),
+            )
+        except KeyboardInterrupt:
+            pass
+        if args.metrics:
+            write_json(args.metrics)
+        return
+    for item in run_pipeline(sources, stages, limits["queue_size"]):
+        emit(item)
+        if leases is not None:
+            leases.finish_article(item)
+    if leases is not None:
+        leases.flush()
+    if not emitted:
+        print("No new articles found.")
+    if args.metrics:
+        write_json(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
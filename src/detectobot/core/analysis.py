@@ -0,0 +1,260 @@
+"""Concurrent, rate-limited LLM analysis stage used by the CLIs."""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Tuple
+
+from .config import get_config
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 30000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 2.0
+
+_WINDOW = 60.0
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Return a rough token count for rate limiting (about 4 chars per token)."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Return True if ``exc`` is an HTTP 429 from the model provider."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429
+
+
+def run_async(awaitable: Awaitable[Any]) -> Any:
+    """Run ``awaitable`` on the process-wide background event loop and return its result.
+
+    Async model clients pool connections on the event loop that opened them,
+    so worker threads must not each run their own loop (as ``run_sync`` does)
+    or a reused connection fails with "bound to a different event loop".
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="analysis-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(awaitable, _loop).result()
+
+
+class RateLimiter:
+    """Sliding one-minute window over request count and token volume.
+
+    :meth:`acquire` blocks until a request of the given size fits in both
+    budgets. A single request larger than the token budget is let through once
+    the window is empty so it cannot block forever.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int | None = DEFAULT_TOKENS_PER_MINUTE,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._events: deque[Tuple[float, int]] = deque()
+        self._tokens = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        while self._events and self._events[0][0] <= now - _WINDOW:
+            _, used = self._events.popleft()
+            self._tokens -= used
+        if now < self._paused_until:
+            return self._paused_until - now
+        if not self._events:
+            return 0.0
+        over_requests = self.requests_per_minute is not None and len(self._events) >= self.requests_per_minute
+        over_tokens = self.tokens_per_minute is not None and self._tokens + tokens > self.tokens_per_minute
+        if over_requests or over_tokens:
+            return self._events[0][0] + _WINDOW - now
+        return 0.0
+
+    def acquire(self, tokens: int = 1) -> None:
+        """Block until a request costing ``tokens`` may be sent, then record it."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                delay = self._wait_time(tokens, now)
+                if delay <= 0:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+            self._sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds``, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class ModelGate:
+    """Admission for single model calls: concurrency, rate budget and 429 retries.
+
+    Every call passed to :meth:`call` takes one of ``max_concurrency`` slots
+    and one request plus its own tokens from the :class:`RateLimiter`. A call
+    answered with HTTP 429 pauses all callers and is retried on its own, so
+    an article analyzed in chunks is budgeted per chunk and one rate-limited
+    chunk does not re-send the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute: int | None = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int | None = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute, sleep=sleep)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def call(self, fn: Callable[[], Any], tokens: int = 1) -> Any:
+        """Run the model call ``fn`` costing about ``tokens`` once it is admitted."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            with self._slots:
+                try:
+                    return fn()
+                except Exception as exc:
+                    if not is_rate_limited(exc) or attempt == self.max_retries:
+                        raise
+            delay = self.backoff * (2 ** attempt) * (1 + random.random())
+            self.limiter.pause(delay)
+
+
+class AnalysisPool:
+    """Run an analysis callable over many texts concurrently.
+
+    Args:
+        analyze: Callable taking article text and returning the model output.
+            It is shared by all worker threads, so it should reuse one
+            long-lived agent or client.
+        lookup: Optional callable returning a cached result for a text, or
+            None. Cache hits skip the rate limiter entirely.
+        max_concurrency: Number of analyses in flight at once.
+        requests_per_minute: Request budget, or None for no limit.
+        tokens_per_minute: Estimated token budget, or None for no limit.
+        max_retries: Retries after an HTTP 429 before giving up.
+        backoff: Base delay in seconds for jittered exponential backoff.
+        gate: Shared :class:`ModelGate` that ``analyze`` passes each of its
+            model calls through, for analyses that make several calls. Without
+            one, the pool builds a gate from the limits above and treats every
+            ``analyze`` call as a single model call.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[str], Any],
+        lookup: Callable[[str], Any] | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute: int | None = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int | None = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        sleep: Callable[[float], None] = time.sleep,
+        gate: ModelGate | None = None,
+    ):
+        self.analyze = analyze
+        self.lookup = lookup
+        self.max_concurrency = max(1, max_concurrency)
+        self.shared_gate = gate is not None
+        self.gate = gate or ModelGate(
+            self.max_concurrency, requests_per_minute, tokens_per_minute, max_retries, backoff, sleep
+        )
+
+    def analyze_one(self, text: str) -> Any:
+        """Analyze ``text`` in the calling thread, honouring limits and retries."""
+        if self.lookup is not None:
+            hit = self.lookup(text)
+            if hit is not None:
+                return hit
+        if self.shared_gate:
+            return self.analyze(text)
+        return self.gate.call(lambda: self.analyze(text), estimate_tokens(text))
+
+    def imap_unordered(
+        self,
+        items: Iterable[Any],
+        text_of: Callable[[Any], str] = lambda item: item,
+    ) -> Iterator[Tuple[Any, Any, BaseException | None]]:
+        """Yield ``(item, result, error)`` for each item as analyses complete.
+
+        ``items`` may be a lazy iterable; only ``max_concurrency`` analyses are
+        submitted ahead of the results being consumed. ``error`` is the
+        exception raised for that item, in which case ``result`` is None.
+        """
+        iterator = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            pending = {}
+
+            def submit_next() -> bool:
+                for item in iterator:
+                    pending[pool.submit(self.analyze_one, text_of(item))] = item
+                    return True
+                return False
+
+            for _ in range(self.max_concurrency):
+                if not submit_next():
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    yield item, (None if error else future.result()), error
+                    submit_next()
+
+
+_gate: ModelGate | None = None
+_gate_lock = threading.Lock()
+
+
+def get_model_gate() -> ModelGate:
+    """Return the process-wide :class:`ModelGate`, with limits from the ``llm`` config section.
+
+    The agents send every model call through it, so the configured budgets
+    hold however the calls are spread over articles and chunks.
+    """
+    global _gate
+    with _gate_lock:
+        if _gate is None:
+            cfg = get_config().llm
+            _gate = ModelGate(
+                max_concurrency=cfg.max_concurrency,
+                requests_per_minute=cfg.requests_per_minute,
+                tokens_per_minute=cfg.tokens_per_minute,
+                max_retries=cfg.max_retries,
+            )
+        return _gate
+
+
+def pool_from_config(analyze: Callable[[str], Any], lookup: Callable[[str], Any] | None = None) -> AnalysisPool:
+    """Build an :class:`AnalysisPool` sharing :func:`get_model_gate`.
+
+    ``analyze`` must send its model calls through that gate; the pool itself
+    only bounds the number of articles in flight to ``llm.max_concurrency``.
+    """
+    gate = get_model_gate()
+    return AnalysisPool(analyze, lookup=lookup, max_concurrency=gate.max_concurrency, gate=gate)
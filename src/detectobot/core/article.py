@@ -0,0 +1,262 @@
+"""Article download and main-text extraction shared by the agents."""
+import io
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict
+
+from bs4 import BeautifulSoup
+from readability import Document
+
+from . import http_client
+from .config import get_config
+from .content_store import ContentStore
+from .metrics import CONTENT_STORE, EXTRACT_SECONDS, record_fetch
+
+DEFAULT_EXTRACT_TIMEOUT = 30
+
+# Extra time the parent waits for a worker whose own timer could not fire
+# (e.g. stuck inside lxml) before it kills the pool.
+_TIMEOUT_GRACE = 5
+# Workers are replaced after this many pages, bounding leaks in the parsers.
+_MAX_TASKS_PER_CHILD = 200
+
+
+class ExtractionTimeout(TimeoutError):
+    """Extraction of one page took longer than the configured timeout."""
+
+
+class NotStored(LookupError):
+    """An offline fetch asked for an article that is not in the content store."""
+
+
+class _Deadline(BaseException):
+    """Raised by the worker's alarm; a BaseException so the fallbacks do not swallow it."""
+
+
+def _on_alarm(signum, frame):
+    raise _Deadline()
+
+
+def _extract_in_worker(fn: Callable[[str], str], html: str, timeout: float | None):
+    """Run ``fn(html)`` in a pool worker under a ``timeout`` second alarm; return the text and its time."""
+    started = time.perf_counter()
+    timeout = timeout if hasattr(signal, "setitimer") else None
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text = fn(html)
+    except _Deadline:
+        raise ExtractionTimeout(f"extraction took over {timeout:g}s") from None
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return text, time.perf_counter() - started
+
+
+class ExtractionPool:
+    """Runs CPU-bound text extraction in ``workers`` processes.
+
+    readability and BeautifulSoup hold the GIL, so extraction threads share
+    one core; worker processes use them all. Each page travels to a worker
+    once, as the pickled string, and only the extracted text comes back.
+    A page taking longer than ``timeout`` seconds raises
+    :class:`ExtractionTimeout`: the worker's alarm interrupts it, and if the
+    worker does not answer shortly after, the pool is killed and replaced so
+    later pages are not stuck behind it. Workers start from a fork server
+    that has already imported the parsers, so they start fast.
+    """
+
+    def __init__(self, workers: int, timeout: float | None = DEFAULT_EXTRACT_TIMEOUT, fn: Callable = None):
+        self.workers = workers
+        self.timeout = timeout
+        self.fn = fn or _extract_text
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context("forkserver")
+                    ctx.set_forkserver_preload([__name__])
+                else:
+                    ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=ctx, max_tasks_per_child=_MAX_TASKS_PER_CHILD
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # ProcessPoolExecutor cannot cancel a running task; kill its workers.
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, html, fn: Callable | None = None) -> str:
+        """Return the main text of ``html``, extracted in a worker process by ``fn`` (default: the pool's)."""
+        wait = None if self.timeout is None else self.timeout + _TIMEOUT_GRACE
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                text, seconds = executor.submit(_extract_in_worker, fn or self.fn, html, self.timeout).result(wait)
+            except ExtractionTimeout:
+                raise
+            except TimeoutError:
+                self._discard(executor)
+                raise ExtractionTimeout(f"extraction took over {self.timeout:g}s") from None
+            except BrokenProcessPool:
+                # Another page's timeout replaced the pool under us; retry once.
+                self._discard(executor)
+                if attempt:
+                    raise
+                continue
+            EXTRACT_SECONDS.observe(seconds)
+            return text
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: ExtractionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _pdf_text(content: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF articles need pypdf (pip install pypdf)") from None
+    return "\n".join(page.extract_text() or "" for page in PdfReader(io.BytesIO(content)).pages)
+
+
+# Extractors for article documents that are not web pages, by media type.
+# They run in the extraction pool, so they must be module-level functions.
+EXTRACTORS: Dict[str, Callable[[bytes], str]] = {
+    "application/pdf": _pdf_text,
+}
+
+
+def get_extraction_pool() -> ExtractionPool | None:
+    """Return the process-wide extraction pool, or None if ``extraction.workers`` is 0.
+
+    Without a configured worker count the pool uses every CPU. Worker
+    processes are only started by the first extraction.
+    """
+    global _pool
+    cfg = get_config().extraction
+    if cfg.workers == 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool(cfg.workers or os.cpu_count() or 1, cfg.timeout_seconds)
+        return _pool
+
+
+def extract_text(html: str) -> str:
+    """Return the main text of an article page.
+
+    Uses readability's summary and falls back to the page's paragraphs, then
+    to all of its text. Runs in the extraction pool (see
+    :class:`ExtractionPool`) unless ``extraction.workers`` is 0, in which
+    case it runs in this thread without a timeout.
+    """
+    pool = get_extraction_pool()
+    if pool is not None:
+        return pool.extract(html)
+    with EXTRACT_SECONDS.time():
+        return _extract_text(html)
+
+
+def extract_document(content: bytes, content_type: str) -> str:
+    """Return the text of a non-HTML article using the :data:`EXTRACTORS` hook for ``content_type``."""
+    fn = EXTRACTORS[content_type]
+    pool = get_extraction_pool()
+    if pool is not None:
+        return pool.extract(content, fn)
+    with EXTRACT_SECONDS.time():
+        return fn(content)
+
+
+def _extract_text(html: str) -> str:
+    try:
+        doc = Document(html)
+        article_html = doc.summary()
+        soup = BeautifulSoup(article_html, "html.parser")
+        text = soup.get_text(separator="\n")
+        if text.strip():
+            return text
+        raise ValueError("empty")
+    except Exception:
+        soup = BeautifulSoup(html, "html.parser")
+        paragraphs = soup.find_all("p")
+        text = "\n".join(p.get_text() for p in paragraphs)
+        if text.strip():
+            return text
+        return soup.get_text()
+
+
+def fetch_article_text(
+    url: str,
+    store: ContentStore | None = None,
+    offline: bool = False,
+    reextract: bool = False,
+) -> str:
+    """Fetch and return the main text from an article URL.
+
+    With a ``store``, a stored copy of the page is used instead of the
+    network, and freshly fetched pages are saved to it. ``reextract`` re-runs
+    extraction on the stored HTML rather than reusing the stored text;
+    ``offline`` never touches the network. Downloads are bounded as
+    described in :func:`~detectobot.core.http_client.get`; documents of a
+    type in :data:`EXTRACTORS` (PDFs) go to that extractor instead of
+    readability.
+
+    Raises:
+        NotStored: If ``offline`` and the page is not in ``store``.
+        requests.RequestException: If the download fails or is rejected.
+        ExtractionTimeout: If extraction takes too long.
+    """
+    if store is not None:
+        entry = store.get(url)
+        CONTENT_STORE.inc(result="miss" if entry is None else "hit")
+        if entry is not None:
+            # Documents from an EXTRACTORS hook are stored without HTML.
+            if not reextract or not entry["html"]:
+                return entry["text"]
+            text = extract_text(entry["html"])
+            store.update_text(url, text)
+            return text
+    if offline:
+        raise NotStored(f"{url} is not in the content store")
+    started = time.perf_counter()
+    try:
+        resp = http_client.get(url, accept=http_client.PAGE_TYPES + tuple(EXTRACTORS))
+        resp.raise_for_status()
+    except Exception as e:
+        record_fetch("article", url, time.perf_counter() - started, getattr(e, "result", "error"))
+        raise
+    record_fetch("article", url, time.perf_counter() - started, "ok", len(resp.content))
+    document = resp.content_type in EXTRACTORS
+    text = extract_document(resp.content, resp.content_type) if document else extract_text(resp.text)
+    if store is not None:
+        store.put(
+            url,
+            "" if document else resp.text,
+            text,
+            final_url=resp.url,
+            status=resp.status_code,
+            content_type=resp.headers.get("Content-Type"),
+        )
+    return text
@@ -1,22 +1,230 @@
-"""Configuration handling for detectobot."""
+"""Configuration handling for detectobot.
+
+``config.yaml`` is parsed into a validated :class:`Config` once and cached;
+later calls only ``stat`` the file and re-parse it when its modification time
+or size changes, so long-running processes pick up edits without a restart.
+"""
 import os
+import threading
+import warnings
+from typing import Any, Dict, List, Literal, Tuple
+
 import yaml
+from pydantic import BaseModel, ConfigDict, Field, PositiveFloat, PositiveInt
 
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../config.yaml'))
 
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class Feed(_Section):
+    name: str
+    url: str
+    allow: List[str] = []
+    deny: List[str] = []
+
+
+class Site(_Section):
+    name: str
+    url: str
+    selector: str = "a"
+    allow: List[str] = []
+    deny: List[str] = []
+
+
+class WatchConfig(_Section):
+    min_interval_minutes: float = 10
+    max_interval_minutes: float = 720
+    speedup: float = 0.5
+    backoff: float = 1.5
+    jitter: float = 0.1
+
+
+class ConcurrencyConfig(_Section):
+    max_workers: PositiveInt = 8
+    per_host: PositiveInt = 2
+
+
+class SeenFilterConfig(_Section):
+    enabled: bool = False
+    max_entries: PositiveInt = 200_000
+
+
+class HttpConfig(_Section):
+    connect_timeout: float = 5.0
+    read_timeout: float = 15.0
+    retries: int = Field(3, ge=0)
+    backoff: float = 0.5
+    pool_hosts: PositiveInt = 100
+    pool_size: PositiveInt = 10
+    max_mb: PositiveFloat | None = 10
+    deadline_seconds: PositiveFloat | None = 60
+
+
+class LLMCacheConfig(_Section):
+    max_entries: PositiveInt | None = 5000
+    max_age_days: float | None = 30
+
+
+class LLMConfig(_Section):
+    max_concurrency: PositiveInt = 4
+    requests_per_minute: PositiveInt | None = 60
+    tokens_per_minute: PositiveInt | None = 30000
+    max_retries: int = Field(5, ge=0)
+
+
+class PipelineConfig(_Section):
+    queue_size: PositiveInt = 16
+    fetch_workers: PositiveInt = 8
+
+
+class ChunkingConfig(_Section):
+    budget_tokens: PositiveInt = 8000
+    max_workers: PositiveInt = 4
+
+
+class ContentStoreConfig(_Section):
+    ttl_hours: float | None = 72
+    max_mb: float | None = 200
+
+
+class IncrementalConfig(_Section):
+    enabled: bool = True
+    full_scan_every: PositiveInt | None = 24
+
+
+class ExtractionConfig(_Section):
+    workers: int | None = Field(None, ge=0)
+    timeout_seconds: PositiveFloat | None = 30
+
+
+class SpecStoreConfig(_Section):
+    enabled: bool = True
+
+
+class RelevanceConfig(_Section):
+    enabled: bool = True
+    url_heuristics: bool = True
+    min_score: float = 6.0
+    min_words: int = Field(150, ge=0)
+    keywords: Dict[str, float] = {}
+
+
+class RetentionConfig(_Section):
+    seen_days: PositiveFloat | None = 90
+
+
+class LeasesConfig(_Section):
+    lease_seconds: PositiveInt = 600
+    batch: PositiveInt = 8
+    max_attempts: PositiveInt = 3
+    idle_seconds: PositiveFloat = 0.2
+
+
+class CanonicalizationRules(_Section):
+    strip_params: List[str] = []
+    strip_trailing_slash: bool | None = None
+    sort_query: bool | None = None
+    fold_scheme: bool | None = None
+
+
+class CanonicalizationConfig(CanonicalizationRules):
+    hosts: Dict[str, CanonicalizationRules] = {}
+
+    def as_rules(self) -> Dict[str, Any]:
+        """Return the rules in the dict form :mod:`detectobot.core.urls` takes.
+
+        Keys left out of the config are dropped, so they keep the defaults of
+        :data:`~detectobot.core.urls.DEFAULT_RULES` (or of the top level, for
+        a host).
+        """
+        return self.model_dump(exclude_unset=True, exclude_none=True)
+
+
+class Config(_Section):
+    """Typed view of ``config.yaml``; unknown keys are kept as extras."""
+
+    feeds: List[Feed] = []
+    sites: List[Site] = []
+    poll_interval_minutes: float = 60
+    watch: WatchConfig = WatchConfig()
+    http: HttpConfig = HttpConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    seen_filter: SeenFilterConfig = SeenFilterConfig()
+    incremental: IncrementalConfig = IncrementalConfig()
+    canonicalization: CanonicalizationConfig = CanonicalizationConfig()
+    llm_cache: LLMCacheConfig = LLMCacheConfig()
+    llm: LLMConfig = LLMConfig()
+    pipeline: PipelineConfig = PipelineConfig()
+    chunking: ChunkingConfig = ChunkingConfig()
+    content_store: ContentStoreConfig = ContentStoreConfig()
+    extraction: ExtractionConfig = ExtractionConfig()
+    leases: LeasesConfig = LeasesConfig()
+    spec_store: SpecStoreConfig = SpecStoreConfig()
+    relevance: RelevanceConfig = RelevanceConfig()
+    retention: RetentionConfig = RetentionConfig()
+    link_parser: Literal["auto", "lxml", "bs4"] = "auto"
+
+
+_cache: Dict[str, Tuple[Tuple[int, int], Config, Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+def _parse(path: str) -> Tuple[Config, Dict[str, Any]]:
+    with open(path, 'r') as f:
+        raw = yaml.safe_load(f) or {}
+    config = Config.model_validate(raw)
+    return config, config.model_dump()
+
+
+def _load(path: str | None) -> Tuple[Config, Dict[str, Any]]:
+    path = os.path.abspath(path or CONFIG_PATH)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1], cached[2]
+        try:
+            config, data = _parse(path)
+        except Exception as exc:
+            if cached is None:
+                raise
+            # Keep running on the last good config while an edit is in progress.
+            warnings.warn(f"Ignoring invalid config {path}: {exc}")
+            _cache[path] = (stamp, cached[1], cached[2])
+            return cached[1], cached[2]
+        _cache[path] = (stamp, config, data)
+        return config, data
+
+
+def get_config(path: str | None = None) -> Config:
+    """Return the validated configuration, re-parsing only if the file changed.
+
+    Args:
+        path: Config file to read; defaults to :data:`CONFIG_PATH`.
+
+    Raises:
+        pydantic.ValidationError: If the file is invalid on first load. An
+            invalid edit to an already loaded file is ignored with a warning.
+    """
+    return _load(path)[0]
+
+
 def load_config(section: str = None):
     """
     Load configuration from YAML file.
-    
+
     Args:
         section: Optional section name to return only that section
-        
+
     Returns:
-        The entire config dict or just the specified section
+        The entire config dict or just the specified section, with defaults
+        filled in. The dict is shared between callers and must not be mutated.
     """
-    with open(CONFIG_PATH, 'r') as f:
-        config = yaml.safe_load(f)
-    
+    data = _load(None)[1]
     if section:
-        return config.get(section, [])
-    return config
+        return data.get(section, [])
+    return data
@@ -0,0 +1,207 @@
+"""Local store of fetched article pages and their extracted text."""
+import threading
+import time
+import zlib
+
+from .config import get_config
+from .db_utils import connect, DB_PATH
+from .urls import url_key
+
+DEFAULT_TTL_HOURS = 72
+DEFAULT_MAX_MB = 200
+
+
+class ContentStore:
+    """SQLite-backed, size-capped store keyed by canonical article URL.
+
+    Each entry keeps the zlib-compressed raw HTML, the extracted text and the
+    fetch metadata (final URL, HTTP status, content type, fetch time). Entries
+    older than ``ttl_hours`` are treated as missing; once the stored bytes
+    exceed ``max_mb`` the least recently used entries are evicted. The total
+    size is kept in a one-row table maintained by triggers, so checking the
+    cap after each write does not scan the store.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        ttl_hours: float | None = DEFAULT_TTL_HOURS,
+        max_mb: float | None = DEFAULT_MAX_MB,
+    ):
+        self.ttl_hours = ttl_hours
+        self.max_mb = max_mb
+        self._lock = threading.Lock()
+        self.conn = connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS article_store (
+                url TEXT PRIMARY KEY,
+                final_url TEXT,
+                status INTEGER,
+                content_type TEXT,
+                raw BLOB,
+                text TEXT,
+                size INTEGER,
+                fetched_at INTEGER,
+                last_used INTEGER
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_article_store_last_used ON article_store (last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_article_store_fetched_at ON article_store (fetched_at)")
+        # The total is seeded from the existing rows in the same transaction that
+        # adds the triggers, so a put from another process is either already in
+        # the seed or counted by a trigger.
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS article_store_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                """
+                INSERT OR IGNORE INTO article_store_size (id, total)
+                SELECT 0, COALESCE(SUM(size), 0) FROM article_store
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS article_store_size_insert AFTER INSERT ON article_store BEGIN
+                    UPDATE article_store_size SET total = total + COALESCE(NEW.size, 0);
+                END
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS article_store_size_delete AFTER DELETE ON article_store BEGIN
+                    UPDATE article_store_size SET total = total - COALESCE(OLD.size, 0);
+                END
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS article_store_size_update AFTER UPDATE OF size ON article_store BEGIN
+                    UPDATE article_store_size SET total = total + COALESCE(NEW.size, 0) - COALESCE(OLD.size, 0);
+                END
+                """
+            )
+        self.evict()
+
+    def _expired(self, fetched_at: int) -> bool:
+        return self.ttl_hours is not None and fetched_at < time.time() - self.ttl_hours * 3600
+
+    def get(self, url: str) -> dict | None:
+        """Return the stored entry for ``url`` or None if missing or expired.
+
+        The entry dict holds ``url``, ``final_url``, ``status``,
+        ``content_type``, ``html``, ``text`` and ``fetched_at``.
+        """
+        key = url_key(url)
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT final_url, status, content_type, raw, text, fetched_at
+                FROM article_store WHERE url = ?
+                """,
+                (key,),
+            ).fetchone()
+            if row is None or self._expired(row[5]):
+                return None
+            self.conn.execute("UPDATE article_store SET last_used = ? WHERE url = ?", (int(time.time()), key))
+            self.conn.commit()
+        final_url, status, content_type, raw, text, fetched_at = row
+        return {
+            "url": key,
+            "final_url": final_url,
+            "status": status,
+            "content_type": content_type,
+            "html": zlib.decompress(raw).decode("utf-8"),
+            "text": text,
+            "fetched_at": fetched_at,
+        }
+
+    def put(self, url: str, html: str, text: str, final_url: str | None = None,
+            status: int | None = None, content_type: str | None = None) -> None:
+        """Store a fetched page and its extracted text."""
+        raw = zlib.compress(html.encode("utf-8"), 6)
+        now = int(time.time())
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the implicit delete of a
+            # REPLACE does not fire triggers, which would skew the size total.
+            self.conn.execute(
+                """
+                INSERT INTO article_store
+                    (url, final_url, status, content_type, raw, text, size, fetched_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    final_url = excluded.final_url,
+                    status = excluded.status,
+                    content_type = excluded.content_type,
+                    raw = excluded.raw,
+                    text = excluded.text,
+                    size = excluded.size,
+                    fetched_at = excluded.fetched_at,
+                    last_used = excluded.last_used
+                """,
+                (url_key(url), final_url or url, status, content_type, raw, text,
+                 len(raw) + len(text.encode("utf-8")), now, now),
+            )
+            self.conn.commit()
+        self.evict()
+
+    def update_text(self, url: str, text: str) -> None:
+        """Replace the extracted text of a stored page, e.g. after re-extraction."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE article_store SET text = ?, size = length(raw) + ? WHERE url = ?",
+                (text, len(text.encode("utf-8")), url_key(url)),
+            )
+            self.conn.commit()
+
+    def urls(self) -> list[str]:
+        """Return the URLs of all unexpired entries, most recently fetched first."""
+        cutoff = 0 if self.ttl_hours is None else int(time.time() - self.ttl_hours * 3600)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT url FROM article_store WHERE fetched_at >= ? ORDER BY fetched_at DESC",
+                (cutoff,),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def evict(self) -> int:
+        """Drop expired entries and trim to the size cap; return rows removed."""
+        removed = 0
+        with self._lock, self.conn:
+            if self.ttl_hours is not None:
+                cutoff = int(time.time() - self.ttl_hours * 3600)
+                removed += self.conn.execute("DELETE FROM article_store WHERE fetched_at < ?", (cutoff,)).rowcount
+            if self.max_mb is not None:
+                limit = int(self.max_mb * 1024 * 1024)
+                total = self.conn.execute("SELECT total FROM article_store_size").fetchone()[0]
+                if total > limit:
+                    doomed = []
+                    for url, size in self.conn.execute("SELECT url, size FROM article_store ORDER BY last_used"):
+                        if total <= limit:
+                            break
+                        doomed.append((url,))
+                        total -= size
+                    self.conn.executemany("DELETE FROM article_store WHERE url = ?", doomed)
+                    removed += len(doomed)
+        return removed
+
+
+_stores: dict[str, ContentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_content_store(db_path: str = DB_PATH) -> ContentStore:
+    """Return the process-wide store for ``db_path``.
+
+    Limits come from the ``content_store`` config section.
+    """
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            cfg = get_config().content_store
+            store = ContentStore(db_path, ttl_hours=cfg.ttl_hours, max_mb=cfg.max_mb)
+            _stores[db_path] = store
+        return store
@@ -0,0 +1,51 @@
+"""Long-running watch mode that keeps polling sources on their own schedules."""
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from .db_utils import connect, DB_PATH
+from .pipeline import Stage, run_pipeline, pipeline_limits
+from .scheduler import PollScheduler
+from .watcher import iter_due_links
+
+
+def watch(
+    scheduler: PollScheduler,
+    stages: List[Stage],
+    emit: Callable[[Dict[str, Any]], None],
+    db_path: str = DB_PATH,
+    cycles: int | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    sources: Callable[[], List[Tuple[str, Dict[str, Any]]]] | None = None,
+) -> None:
+    """Poll due sources and stream their new articles through ``stages`` until stopped.
+
+    One database connection and the process-wide caches (seen filter, content
+    store, LLM client and cache) stay open between polls. After each round the
+    loop sleeps until the next source falls due; a due source whose poll raised
+    (e.g. on a locked database) is recorded as failed, so it backs off instead
+    of being retried at once. ``sources`` is called before
+    every round and its result synced into the scheduler, so sources added to
+    or removed from the config are picked up without a restart. ``cycles``
+    limits the number of rounds, mainly for tests; by default the loop runs
+    until interrupted.
+    """
+    queue_size = pipeline_limits()["queue_size"]
+    conn = connect(db_path, check_same_thread=False)
+    try:
+        rounds = 0
+        while True:
+            if sources is not None:
+                scheduler.sync(sources())
+            due = [(state, state.next_due) for state in scheduler.due()]
+            for item in run_pipeline(iter_due_links(scheduler, db_path, conn), stages, queue_size):
+                emit(item)
+            for state, next_due in due:
+                # Not rescheduled, so the poll raised before its outcome was recorded.
+                if state.next_due == next_due:
+                    scheduler.record(state.kind, state.source, None)
+            rounds += 1
+            if cycles is not None and rounds >= cycles:
+                return
+            sleep(scheduler.seconds_until_due())
+    finally:
+        conn.close()
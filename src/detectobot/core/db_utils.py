@@ -1,45 +1,464 @@
 """Database utilities for detectobot."""
+import argparse
 import hashlib
+import sqlite3
 import time
 import os
 
+from . import metrics
+from .config import get_config
+from .urls import url_key
+
 # Define the database path relative to this file
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../watcher.db'))
 
-def entry_hash(entry: dict) -> str:
-    """Return a stable SHA-256 hash for a feed or site entry."""
-    link = entry.get("link", "")
+# Rows per multi-row INSERT; 5 bound parameters each stays well under
+# SQLite's default variable limit.
+_INSERT_BATCH = 150
+
+
+def connect(db_path: str = DB_PATH, busy_timeout: float = 30.0, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open the watcher database in WAL mode with a busy timeout.
+
+    WAL lets concurrent CLI runs read while another writes, and the busy
+    timeout makes a writer wait for the lock instead of failing with
+    "database is locked". Pass ``check_same_thread=False`` for connections
+    shared between threads behind a lock.
+    """
+    conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=check_same_thread)
+    # Switching a fresh database to WAL can fail with "database is locked"
+    # without waiting when another process is switching it at the same time.
+    deadline = time.monotonic() + busy_timeout
+    while True:
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            break
+        except sqlite3.OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# Bumped whenever stored hashes or tables need migrating; tracked in
+# ``PRAGMA user_version``.
+SCHEMA_VERSION = 2
+
+DEFAULT_RETENTION_DAYS = 90
+
+# Rows copied per statement when migrating seen_entries.
+_MIGRATE_BATCH = 5000
+
+# Bytes of each link digest kept in a source's scan mark.
+_MARK_BYTES = 8
+
+DEFAULT_FULL_SCAN_EVERY = 24
+
+
+def entry_hash(entry: dict, rules: dict | None = None) -> str:
+    """Return a stable SHA-256 hash for a feed or site entry.
+
+    The link is canonicalized first (see :func:`~detectobot.core.urls.url_key`)
+    so tracking parameters, fragments and scheme variants hash the same. The
+    hash is returned as hex; ``seen_entries`` stores the raw 32 bytes.
+    """
+    link = url_key(entry.get("link") or "", rules)
     return hashlib.sha256(link.encode("utf-8")).hexdigest()
 
 
-def init_db(conn):
-    """Ensure the seen_entries table exists."""
+def rekey_seen_entries(conn, rules: dict | None = None) -> int:
+    """Recompute every stored hash from its canonical link.
+
+    Rows whose canonical links collide are merged into a single row. Run this
+    after changing canonicalization rules. Pruned rows no longer have a link
+    and keep their hash. Returns the number of rows re-keyed or merged.
+    """
+    rows = conn.execute(
+        "SELECT hash, entry_link FROM seen_entries WHERE entry_link IS NOT NULL ORDER BY timestamp"
+    ).fetchall()
+    changed = 0
+    with conn:
+        for old, link in rows:
+            new = bytes.fromhex(entry_hash({"link": link}, rules))
+            if new == old:
+                continue
+            cur = conn.execute("UPDATE OR IGNORE seen_entries SET hash = ? WHERE hash = ?", (new, old))
+            if cur.rowcount == 0:
+                conn.execute("DELETE FROM seen_entries WHERE hash = ?", (old,))
+            changed += 1
+    return changed
+
+
+def _create_seen_tables(conn, table: str = "seen_entries") -> None:
     conn.execute(
         """
-        CREATE TABLE IF NOT EXISTS seen_entries (
-            hash TEXT PRIMARY KEY,
-            feed_name TEXT,
+        CREATE TABLE IF NOT EXISTS sources (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    # 32-byte SHA-256 keys in a clustered (WITHOUT ROWID) table: lookups and
+    # inserts touch a single b-tree instead of an index plus the table.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            hash BLOB PRIMARY KEY,
+            source_id INTEGER REFERENCES sources (id),
             entry_title TEXT,
             entry_link TEXT,
+            timestamp INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _is_legacy(conn) -> bool:
+    """Return whether ``seen_entries`` still has the version 0/1 layout.
+
+    Decided from the columns rather than ``user_version``, so a table created
+    in the current layout is never mistaken for one that needs migrating.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(seen_entries)")}
+    return "feed_name" in columns
+
+
+def _migrate_seen_entries(conn, rules: dict | None) -> None:
+    """Copy a version 0/1 ``seen_entries`` (hex TEXT keys) into the compact schema.
+
+    Version 0 rows were keyed by the raw link and are re-keyed from their
+    canonical link on the way; colliding rows keep the earliest one. The copy
+    is a single transaction, so a concurrent process waits for it and then
+    finds the database already migrated.
+    """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not _is_legacy(conn):
+            return
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        _create_seen_tables(conn, "seen_entries_v2")
+        cur = conn.execute(
+            "SELECT hash, feed_name, entry_title, entry_link, timestamp FROM seen_entries ORDER BY timestamp, rowid"
+        )
+        while rows := cur.fetchmany(_MIGRATE_BATCH):
+            names = {row[1] for row in rows if row[1] is not None}
+            conn.executemany("INSERT OR IGNORE INTO sources (name) VALUES (?)", [(n,) for n in names])
+            ids = dict(conn.execute("SELECT name, id FROM sources"))
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO seen_entries_v2 (hash, source_id, entry_title, entry_link, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        bytes.fromhex(entry_hash({"link": link}, rules) if version < 1 else h),
+                        ids.get(name),
+                        title,
+                        link,
+                        ts or 0,
+                    )
+                    for h, name, title, link, ts in rows
+                ],
+            )
+        conn.execute("DROP TABLE seen_entries")
+        conn.execute("ALTER TABLE seen_entries_v2 RENAME TO seen_entries")
+
+
+def _create_schema(conn) -> None:
+    _create_seen_tables(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_entries_timestamp ON seen_entries (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_entries_source ON seen_entries (source_id, timestamp)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            digest TEXT,
             timestamp INTEGER
         )
         """
     )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_marks (
+            url TEXT PRIMARY KEY,
+            hashes BLOB NOT NULL,
+            polls INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def init_db(conn, rules: dict | None = None):
+    """Ensure the seen_entries, sources and http_cache tables exist.
+
+    Older databases are migrated to the current schema once; those written
+    before links were canonicalized are re-keyed using ``rules``. The tables
+    are created and the schema version stamped in one transaction, so a
+    process opening a fresh database concurrently never sees half of it, and
+    a stamped database needs no further setup.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    if _is_legacy(conn):
+        _migrate_seen_entries(conn, rules)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _create_schema(conn)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def load_http_cache(conn) -> dict:
+    """Return cached HTTP validators keyed by source URL.
+
+    Each value is a dict with ``etag``, ``last_modified`` and ``digest`` keys.
+    """
+    cur = conn.execute("SELECT url, etag, last_modified, digest FROM http_cache")
+    return {
+        url: {"etag": etag, "last_modified": last_modified, "digest": digest}
+        for url, etag, last_modified, digest in cur.fetchall()
+    }
+
+
+def store_http_cache(conn, url: str, validators: dict | None) -> None:
+    """Persist the validators returned by the latest fetch of ``url``.
+
+    Nothing is written when the server sent no validators at all.
+    """
+    if not validators or not any(validators.values()):
+        return
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO http_cache (url, etag, last_modified, digest, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            url,
+            validators.get("etag"),
+            validators.get("last_modified"),
+            validators.get("digest"),
+            int(time.time()),
+        ),
+    )
     conn.commit()
 
 
-def check_and_store(conn, h: str, feed_name: str, entry: dict) -> bool:
-    """Insert the entry if unseen and return True. Return False if already seen."""
+def source_id(conn, name: str | None) -> int | None:
+    """Return the id of source ``name`` in the ``sources`` table, adding it if new."""
+    if name is None:
+        return None
+    row = conn.execute("SELECT id FROM sources WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        row = conn.execute("INSERT INTO sources (name) VALUES (?) RETURNING id", (name,)).fetchone()
+    return row[0]
+
+
+def check_and_store(conn, h: str, feed_name: str, entry: dict, seen=None) -> bool:
+    """Insert the entry if unseen and return True. Return False if already seen.
+
+    ``h`` is the hex hash from :func:`entry_hash`. ``seen`` is an optional
+    :class:`~detectobot.core.seen_filter.SeenFilter`; hashes it already holds
+    are rejected without querying the database.
+    """
+    if seen is not None and h in seen:
+        return False
     cur = conn.cursor()
-    cur.execute("SELECT 1 FROM seen_entries WHERE hash = ?", (h,))
+    cur.execute("SELECT 1 FROM seen_entries WHERE hash = ?", (bytes.fromhex(h),))
     if cur.fetchone():
+        if seen is not None:
+            seen.add(h)
         return False
     cur.execute(
         """
-        INSERT INTO seen_entries (hash, feed_name, entry_title, entry_link, timestamp)
+        INSERT INTO seen_entries (hash, source_id, entry_title, entry_link, timestamp)
         VALUES (?, ?, ?, ?, ?)
         """,
-        (h, feed_name, entry.get("title"), entry.get("link"), int(time.time())),
+        (bytes.fromhex(h), source_id(conn, feed_name), entry.get("title"), entry.get("link"), int(time.time())),
     )
     conn.commit()
+    if seen is not None:
+        seen.add(h)
     return True
+
+
+def check_and_store_many(
+    conn, feed_name: str, entries: list, seen=None, rules: dict | None = None, on_new=None
+) -> list:
+    """Store all unseen entries in one transaction and return them.
+
+    Uses ``INSERT OR IGNORE ... RETURNING`` so each batch of entries costs a
+    single statement, and commits once at the end. The returned entries keep
+    their input order; repeated links within ``entries`` are returned once.
+    Entries already held by the optional ``seen`` filter never reach the
+    database, and every hash sent to it is added to the filter afterwards.
+    ``rules`` are the canonicalization rules passed to :func:`entry_hash`.
+    ``on_new`` is called with ``conn`` and the new entries before the commit,
+    so whatever it writes is stored together with them or not at all.
+    """
+    started = time.perf_counter()
+    now = int(time.time())
+    hashed = [(entry_hash(entry, rules), entry) for entry in entries]
+    if seen is not None:
+        hashed = [(h, entry) for h, entry in hashed if h not in seen]
+    if not hashed:
+        _record_check(started, len(entries), 0)
+        return []
+    inserted = set()
+    with conn:
+        source = source_id(conn, feed_name)
+        for start in range(0, len(hashed), _INSERT_BATCH):
+            batch = hashed[start:start + _INSERT_BATCH]
+            placeholders = ", ".join(["(?, ?, ?, ?, ?)"] * len(batch))
+            params = []
+            for h, entry in batch:
+                params.extend((bytes.fromhex(h), source, entry.get("title"), entry.get("link"), now))
+            cur = conn.execute(
+                f"""
+                INSERT OR IGNORE INTO seen_entries (hash, source_id, entry_title, entry_link, timestamp)
+                VALUES {placeholders}
+                RETURNING hash
+                """,
+                params,
+            )
+            inserted.update(row[0].hex() for row in cur.fetchall())
+        new_entries = []
+        for h, entry in hashed:
+            if h in inserted:
+                inserted.discard(h)
+                new_entries.append(entry)
+        if on_new is not None and new_entries:
+            on_new(conn, new_entries)
+    if seen is not None:
+        for h, _ in hashed:
+            seen.add(h)
+    _record_check(started, len(entries), len(new_entries))
+    return new_entries
+
+
+def check_and_store_changed(
+    conn,
+    url: str,
+    feed_name: str,
+    entries: list,
+    seen=None,
+    rules: dict | None = None,
+    full_scan_every: int | None = DEFAULT_FULL_SCAN_EVERY,
+    on_new=None,
+) -> list:
+    """Like :func:`check_and_store_many`, but skip entries ``url`` already listed last poll.
+
+    Each poll leaves a scan mark in ``scan_marks``: a short digest of every
+    link the source listed. Those entries were stored by that poll, so the
+    next one only canonicalizes, hashes and looks up the entries missing from
+    the mark, and a busy feed costs work per new entry instead of per entry. The mark is an unordered set rather than a position, so links
+    the page lists above its articles (navigation, pinned posts) do not hide
+    new ones. After ``full_scan_every`` incremental polls (never if None)
+    and whenever there is no mark yet, every entry is checked again. An empty
+    ``entries`` (a 304 or an unchanged page) leaves the mark alone.
+    """
+    if not entries:
+        return []
+    prefixes = [
+        hashlib.sha256((entry.get("link") or "").encode("utf-8")).digest()[:_MARK_BYTES] for entry in entries
+    ]
+    row = conn.execute("SELECT hashes, polls FROM scan_marks WHERE url = ?", (url,)).fetchone()
+    if row is None or (full_scan_every is not None and row[1] >= full_scan_every):
+        candidates, polls = entries, 0
+    else:
+        marked, polls = row[0], row[1] + 1
+        known = {marked[i:i + _MARK_BYTES] for i in range(0, len(marked), _MARK_BYTES)}
+        candidates = [entry for entry, prefix in zip(entries, prefixes) if prefix not in known]
+        metrics.LINKS.inc(len(entries) - len(candidates), result="seen")
+    # Written in the same transaction as the new entries.
+    conn.execute(
+        "INSERT OR REPLACE INTO scan_marks (url, hashes, polls) VALUES (?, ?, ?)",
+        (url, b"".join(dict.fromkeys(prefixes)), polls),
+    )
+    try:
+        new = check_and_store_many(conn, feed_name, candidates, seen, rules, on_new)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return new
+
+
+def _record_check(started: float, total: int, new: int) -> None:
+    metrics.DB_SECONDS.observe(time.perf_counter() - started, op="check_and_store")
+    metrics.LINKS.inc(new, result="new")
+    metrics.LINKS.inc(total - new, result="seen")
+
+
+def prune_seen_entries(conn, retention_days: float = DEFAULT_RETENTION_DAYS, now: float | None = None) -> int:
+    """Drop the title and link of entries first seen more than ``retention_days`` ago.
+
+    The hash, source and timestamp are kept, so a pruned link is still known
+    and never comes back as new; only the bytes nothing reads any more are
+    freed. Pruned rows are skipped by :func:`rekey_seen_entries`. Returns the
+    number of rows pruned.
+    """
+    cutoff = int((time.time() if now is None else now) - retention_days * 86400)
+    with conn:
+        cur = conn.execute(
+            """
+            UPDATE seen_entries SET entry_title = NULL, entry_link = NULL
+            WHERE timestamp < ? AND (entry_link IS NOT NULL OR entry_title IS NOT NULL)
+            """,
+            (cutoff,),
+        )
+    return cur.rowcount
+
+
+def seen_stats(conn) -> dict:
+    """Return row counts and the database file size for ``detectobot-db stats``."""
+    entries, pruned, oldest, newest = conn.execute(
+        "SELECT COUNT(*), SUM(entry_link IS NULL), MIN(timestamp), MAX(timestamp) FROM seen_entries"
+    ).fetchone()
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return {
+        "entries": entries,
+        "pruned": pruned or 0,
+        "sources": conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0],
+        "oldest": oldest,
+        "newest": newest,
+        "file_bytes": page_count * page_size,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Inspect and prune the watcher database (``detectobot-db``)."""
+    parser = argparse.ArgumentParser(description="Maintain the watcher database")
+    parser.add_argument("--db", default=DB_PATH, help="Database file (default: watcher.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prune = commands.add_parser("prune", help="Drop titles and links of old entries, keeping their hashes")
+    prune.add_argument("--days", type=float, help="Retention in days (default: retention.seen_days)")
+    prune.add_argument("--vacuum", action="store_true", help="Rebuild the file afterwards to return the space")
+    commands.add_parser("stats", help="Print entry counts and the file size")
+    args = parser.parse_args(argv)
+
+    config = get_config()
+    conn = connect(args.db)
+    try:
+        init_db(conn, config.canonicalization.as_rules())
+        if args.command == "prune":
+            days = args.days if args.days is not None else config.retention.seen_days
+            if days is None:
+                parser.error("no retention configured; pass --days")
+            print(f"Pruned {prune_seen_entries(conn, days)} entries older than {days:g} days")
+            if args.vacuum:
+                conn.execute("VACUUM")
+        stats = seen_stats(conn)
+        print(
+            f"{stats['entries']} entries ({stats['pruned']} pruned) from {stats['sources']} sources,"
+            f" {stats['file_bytes'] / 1024 / 1024:.1f} MiB"
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
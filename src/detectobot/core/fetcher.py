@@ -0,0 +1,122 @@
+"""Concurrent fetch engine and conditional-GET helpers shared by the watchers."""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST = 2
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased network location of ``url``."""
+    return urlsplit(url).netloc.lower()
+
+
+def conditional_headers(cached: dict | None) -> dict:
+    """Return ``If-None-Match``/``If-Modified-Since`` headers for cached validators."""
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def body_digest(content: bytes, salt: str = "") -> str:
+    """Return a SHA-256 digest of a response body.
+
+    ``salt`` is mixed in so that a change in how the body is interpreted (for
+    example a new CSS selector) invalidates the stored digest.
+    """
+    h = hashlib.sha256(salt.encode("utf-8"))
+    h.update(content)
+    return h.hexdigest()
+
+
+def _interleave_by_host(urls: List[str]) -> List[int]:
+    """Return indices into ``urls`` ordered round-robin across hosts.
+
+    Submitting work in this order keeps pool threads from piling up behind a
+    single host's semaphore while other hosts sit idle.
+    """
+    groups: dict[str, List[int]] = {}
+    for i, url in enumerate(urls):
+        groups.setdefault(host_of(url), []).append(i)
+    order = []
+    for batch in zip_longest(*groups.values()):
+        order.extend(i for i in batch if i is not None)
+    return order
+
+
+def iter_fetch(
+    items: Iterable[Any],
+    fetch: Callable[[Any], T],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    per_host: int = DEFAULT_PER_HOST,
+    key: Callable[[Any], str] = str,
+    ordered: bool = False,
+) -> Iterator[Tuple[int, T]]:
+    """Yield ``(index, result)`` for every item as soon as its fetch completes.
+
+    Takes the same arguments as :func:`fetch_all`; use it when results should
+    be processed while slower sources are still downloading. With ``ordered``
+    results are yielded in input order instead of completion order.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        for i, item in enumerate(items):
+            yield i, fetch(item)
+        return
+
+    urls = [key(item) for item in items]
+    per_host = max(1, per_host)
+    limits = {host: threading.BoundedSemaphore(per_host) for host in map(host_of, urls)}
+
+    def limited(i: int) -> T:
+        with limits[host_of(urls[i])]:
+            return fetch(items[i])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = {pool.submit(limited, i): i for i in _interleave_by_host(urls)}
+        if ordered:
+            by_index = {i: future for future, i in futures.items()}
+            for i in range(len(items)):
+                yield i, by_index[i].result()
+        else:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def fetch_all(
+    items: Iterable[Any],
+    fetch: Callable[[Any], T],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    per_host: int = DEFAULT_PER_HOST,
+    key: Callable[[Any], str] = str,
+) -> List[T]:
+    """Apply ``fetch`` to every item and return the results in input order.
+
+    Args:
+        items: Sources to fetch, usually URLs or config entries.
+        fetch: Callable run once per item. It should handle its own network
+            errors; an exception raised here propagates to the caller exactly
+            as it would from a plain loop.
+        max_workers: Global cap on concurrent fetches. ``1`` or less runs the
+            fetches sequentially in the calling thread.
+        per_host: Cap on concurrent fetches against a single host.
+        key: Returns the URL of an item, used for the per-host cap.
+
+    Returns:
+        A list with one result per item, in the same order as ``items``.
+    """
+    items = list(items)
+    results: List[T] = [None] * len(items)  # type: ignore[list-item]
+    for i, result in iter_fetch(items, fetch, max_workers, per_host, key, ordered=True):
+        results[i] = result
+    return results
@@ -0,0 +1,271 @@
+"""Shared, pooled HTTP client used by every fetch path."""
+import codecs
+import re
+import threading
+import time
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from .config import get_config
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+    " AppleWebKit/537.36 (KHTML, like Gecko)"
+    " Chrome/120.0.0.0 Safari/537.36"
+)
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_HOSTS = 100
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_MB = 10
+DEFAULT_DEADLINE = 60.0
+
+# Transient statuses worth retrying; anything else is returned as-is.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Content types read by default: web pages and feeds; ``*xml`` matches any
+# type ending in "xml", such as application/rss+xml.
+PAGE_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "*xml")
+FEED_TYPES = PAGE_TYPES + ("application/json", "application/feed+json")
+
+_CHUNK = 64 * 1024
+# Bytes looked at for a BOM, XML declaration or <meta charset> when the
+# Content-Type names no charset.
+_SNIFF_BYTES = 4096
+_HEADER_CHARSET = re.compile(r"""charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+_XML_ENCODING = re.compile(rb"""^\s*<\?xml[^>]*encoding\s*=\s*["']([\w.:-]+)""")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+
+_session: requests.Session | None = None
+_timeout: tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+_max_bytes: int | None = int(DEFAULT_MAX_MB * 1024 * 1024)
+_deadline: float | None = DEFAULT_DEADLINE
+_lock = threading.Lock()
+
+
+class DownloadError(requests.RequestException):
+    """A download abandoned by one of the guards in :func:`get`.
+
+    ``result`` is the label recorded in the fetch metrics.
+    """
+
+    result = "error"
+
+
+class ContentTooLarge(DownloadError):
+    result = "too_large"
+
+
+class UnsupportedContentType(DownloadError):
+    result = "unsupported"
+
+
+class DeadlineExceeded(DownloadError):
+    result = "deadline"
+
+
+class Download:
+    """A response whose body was read in full, within the limits of :func:`get`.
+
+    Offers the parts of :class:`requests.Response` the fetch paths use:
+    ``status_code``, ``url``, ``headers``, ``content``, ``text`` and
+    :meth:`raise_for_status`.
+    """
+
+    def __init__(self, response: requests.Response, content: bytes, text: str | None, encoding: str | None):
+        self.response = response
+        self.status_code = response.status_code
+        self.url = response.url
+        self.headers = response.headers
+        self.content = content
+        self.encoding = encoding
+        self._text = text
+
+    @property
+    def content_type(self) -> str:
+        """The media type without parameters, lower-cased ("" if the server sent none)."""
+        return media_type(self.headers.get("Content-Type"))
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.content.decode(self.encoding or "utf-8", errors="replace")
+        return self._text
+
+    def raise_for_status(self) -> None:
+        self.response.raise_for_status()
+
+
+def media_type(content_type: str | None) -> str:
+    """Return the media type of a Content-Type header, e.g. ``text/html``."""
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def _accepted(mime: str, accept) -> bool:
+    # Servers that send no type at all are given the benefit of the doubt.
+    return not mime or any(
+        mime == pattern or (pattern.startswith("*") and mime.endswith(pattern[1:])) for pattern in accept
+    )
+
+
+def _is_textual(mime: str) -> bool:
+    return not mime or mime.startswith("text/") or mime.endswith(("xml", "json"))
+
+
+def sniff_charset(content_type: str | None, head: bytes) -> str:
+    """Pick the encoding of a body from its BOM, Content-Type, XML declaration or ``<meta>``.
+
+    Falls back to UTF-8. Unlike ``requests``, a text/html body without a
+    declared charset is not assumed to be ISO-8859-1.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    candidates = [m.group(1) for m in [_HEADER_CHARSET.search(content_type or "")] if m]
+    for pattern in (_XML_ENCODING, _META_CHARSET):
+        match = pattern.search(head[:_SNIFF_BYTES])
+        if match:
+            candidates.append(match.group(1).decode("ascii"))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+def build_session(
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    pool_hosts: int = DEFAULT_POOL_HOSTS,
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> requests.Session:
+    """Return a session with keep-alive pools, retries and compression.
+
+    Args:
+        retries: Retries for connection errors, read errors and
+            :data:`RETRY_STATUSES`, honouring ``Retry-After``.
+        backoff: Base of the exponential backoff between retries; the same
+            amount of random jitter is added to every delay.
+        pool_hosts: Number of per-host connection pools kept alive.
+        pool_size: Connections kept per host; size it to the per-host
+            concurrency.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_jitter=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Advertises gzip and deflate, plus br/zstd when their decoders are installed.
+    session.headers["Accept-Encoding"] = make_headers(accept_encoding=True)["accept-encoding"]
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, configured from the ``http`` config section."""
+    global _session, _timeout, _max_bytes, _deadline
+    with _lock:
+        if _session is None:
+            cfg = get_config().http
+            _timeout = (cfg.connect_timeout, cfg.read_timeout)
+            _max_bytes = None if cfg.max_mb is None else int(cfg.max_mb * 1024 * 1024)
+            _deadline = cfg.deadline_seconds
+            _session = build_session(
+                retries=cfg.retries,
+                backoff=cfg.backoff,
+                pool_hosts=cfg.pool_hosts,
+                pool_size=cfg.pool_size,
+            )
+        return _session
+
+
+def _body_chunks(raw) -> Iterator[bytes]:
+    """Yield the decompressed body of ``raw`` as it arrives, then a final ``b""``."""
+    if hasattr(raw, "read1"):
+        # urllib3 2 returns whatever has arrived, so a trickling server cannot
+        # keep a read from reaching the deadline check.
+        while chunk := raw.read1(_CHUNK, decode_content=True):
+            yield chunk
+    else:
+        # urllib3 1.26: read() waits for a full chunk, and may return nothing
+        # before the end of a compressed body, which stream() skips over.
+        yield from raw.stream(_CHUNK, decode_content=True)
+    yield b""
+
+
+def get(
+    url: str,
+    headers: dict | None = None,
+    timeout=None,
+    accept=PAGE_TYPES,
+    max_bytes: int | None = None,
+    deadline: float | None = None,
+    **kwargs,
+) -> Download:
+    """GET ``url`` through the shared session, streaming the body under guards.
+
+    ``headers`` are added to the session's User-Agent and Accept-Encoding.
+    ``timeout`` defaults to the configured ``(connect, read)`` timeouts.
+    The body is read a chunk at a time and the download abandoned with a
+    :class:`DownloadError` as soon as
+
+    * the Content-Type is not in ``accept`` (checked before any of the body
+      is read),
+    * the declared or decompressed size exceeds ``max_bytes``, or
+    * more than ``deadline`` seconds have passed since the request was
+      sent. The deadline is checked between reads, so it can be overrun by
+      at most the read timeout.
+
+    ``max_bytes`` and ``deadline`` default to the ``http`` section's
+    ``max_mb`` and ``deadline_seconds``. Text bodies are decoded
+    incrementally while they arrive (see :func:`sniff_charset`).
+    """
+    session = get_session()
+    max_bytes = _max_bytes if max_bytes is None else max_bytes
+    deadline = _deadline if deadline is None else deadline
+    started = time.monotonic()
+    resp = session.get(url, headers=headers, timeout=timeout or _timeout, stream=True, **kwargs)
+    with resp:
+        mime = media_type(resp.headers.get("Content-Type"))
+        if not _accepted(mime, accept):
+            raise UnsupportedContentType(f"unsupported content type {mime} at {url}", response=resp)
+        length = resp.headers.get("Content-Length", "")
+        if max_bytes is not None and length.isdigit() and int(length) > max_bytes:
+            raise ContentTooLarge(f"{url} is {length} bytes, over the {max_bytes} byte limit", response=resp)
+        chunks, parts, size = [], [], 0
+        pending, decoder, encoding = b"", None, None
+        textual = _is_textual(mime)
+        for chunk in _body_chunks(resp.raw):
+            if deadline is not None and time.monotonic() - started > deadline:
+                raise DeadlineExceeded(f"{url} took over {deadline:g}s", response=resp)
+            if chunk:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ContentTooLarge(f"{url} is over the {max_bytes} byte limit", response=resp)
+                chunks.append(chunk)
+            if textual:
+                if decoder is None:
+                    pending += chunk
+                    if chunk and len(pending) < _SNIFF_BYTES:
+                        continue
+                    encoding = sniff_charset(resp.headers.get("Content-Type"), pending)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                    chunk, pending = pending, b""
+                parts.append(decoder.decode(chunk, final=not chunk))
+    return Download(resp, b"".join(chunks), "".join(parts) if textual else None, encoding)
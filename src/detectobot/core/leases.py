@@ -0,0 +1,266 @@
+"""SQLite lease table that lets several worker processes share sources and articles."""
+import json
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .config import get_config
+from .db_utils import connect, DB_PATH
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_BATCH = 8
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Queue holding article links discovered by any worker.
+ARTICLES = "article"
+
+
+def default_owner() -> str:
+    """Return an owner id that is unique per process, even across hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseQueue:
+    """Work items in ``watcher.db`` that workers claim for a limited time.
+
+    Items live in named queues (one per source kind plus :data:`ARTICLES`).
+    :meth:`claim` hands an item to one owner for ``lease_seconds``; the owner
+    then acks it, which deletes it or, with a ``delay``, makes it available
+    again later. If the owner dies the lease expires and another worker
+    claims the item. Items claimed ``max_attempts`` times without an ack are
+    left in the table and no longer handed out.
+
+    Articles finished with :meth:`finish_article` are acked in bulk, with the
+    next :meth:`claim` or :meth:`flush`, rather than one transaction each.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        owner: str | None = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        batch: int = DEFAULT_BATCH,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._finished: List[str] = []
+        self.conn = connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                owner TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (queue, key)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_leases_available ON leases (queue, available_at)")
+        self.conn.commit()
+
+    def offer(self, queue: str, items: Iterable[Tuple[str, dict]], conn=None) -> int:
+        """Add ``(key, payload)`` items not yet in ``queue``; return how many were added.
+
+        With ``conn``, an open connection to the same database, the items are
+        written in that connection's current transaction instead of one of
+        their own, and are committed or rolled back with it.
+        """
+        rows = [(queue, key, json.dumps(payload)) for key, payload in items]
+        if not rows:
+            return 0
+        if conn is not None:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO leases (queue, key, payload) VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO leases (queue, key, payload) VALUES (?, ?, ?)", rows)
+            return self.conn.total_changes - before
+
+    def sync(self, queue: str, items: Iterable[Tuple[str, dict]]) -> None:
+        """Make ``queue`` hold exactly ``items``, keeping the lease state of existing keys.
+
+        Used for the configured sources, so sources added to or removed from
+        the config are picked up by every worker.
+        """
+        payloads = {key: json.dumps(payload) for key, payload in items}
+        with self._lock, self.conn:
+            # Take the write lock up front: upgrading a read transaction fails
+            # instead of waiting when another worker has written meanwhile.
+            self.conn.execute("BEGIN IMMEDIATE")
+            existing = {row[0] for row in self.conn.execute("SELECT key FROM leases WHERE queue = ?", (queue,))}
+            self.conn.executemany(
+                "DELETE FROM leases WHERE queue = ? AND key = ?",
+                [(queue, key) for key in existing - payloads.keys()],
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO leases (queue, key, payload) VALUES (?, ?, ?)
+                ON CONFLICT (queue, key) DO UPDATE SET payload = excluded.payload
+                """,
+                [(queue, key, payload) for key, payload in payloads.items()],
+            )
+
+    def claim(self, queue: str, limit: int | None = None) -> List[Tuple[str, dict]]:
+        """Lease up to ``limit`` available items of ``queue`` to this owner.
+
+        The claim runs in an immediate transaction, so concurrent workers
+        never receive the same item. Articles finished since the last claim
+        are acked in the same transaction.
+        """
+        now = self._clock()
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._ack_finished()
+            rows = self.conn.execute(
+                """
+                UPDATE leases
+                SET owner = ?, lease_until = ?, attempts = attempts + 1
+                WHERE rowid IN (
+                    SELECT rowid FROM leases
+                    WHERE queue = ? AND available_at <= ? AND lease_until <= ? AND attempts < ?
+                    ORDER BY available_at, rowid
+                    LIMIT ?
+                )
+                RETURNING key, payload
+                """,
+                (self.owner, now + self.lease_seconds, queue, now, now, self.max_attempts, limit or self.batch),
+            ).fetchall()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def ack(self, queue: str, key: str, delay: float | None = None) -> bool:
+        """Finish a claimed item.
+
+        Without ``delay`` the item is removed; otherwise it becomes available
+        again ``delay`` seconds from now with its attempts reset. Returns False
+        if this owner no longer holds the lease (it expired and was taken over).
+        """
+        return self.ack_many(queue, [key], delay) > 0
+
+    def ack_many(self, queue: str, keys: Iterable[str], delay: float | None = None) -> int:
+        """Finish several claimed items in one transaction, as :meth:`ack` does.
+
+        Returns how many of them this owner still held.
+        """
+        keys = list(keys)
+        if not keys:
+            return 0
+        with self._lock, self.conn:
+            return self._ack_rows(queue, keys, delay)
+
+    def _ack_rows(self, queue: str, keys: List[str], delay: float | None) -> int:
+        before = self.conn.total_changes
+        if delay is None:
+            self.conn.executemany(
+                "DELETE FROM leases WHERE queue = ? AND key = ? AND owner = ?",
+                [(queue, key, self.owner) for key in keys],
+            )
+        else:
+            available_at = self._clock() + delay
+            self.conn.executemany(
+                """
+                UPDATE leases SET owner = NULL, lease_until = 0, attempts = 0, available_at = ?
+                WHERE queue = ? AND key = ? AND owner = ?
+                """,
+                [(available_at, queue, key, self.owner) for key in keys],
+            )
+        return self.conn.total_changes - before
+
+    def _ack_finished(self) -> None:
+        if self._finished:
+            self._ack_rows(ARTICLES, self._finished, None)
+            self._finished = []
+
+    def release(self, queue: str, key: str) -> bool:
+        """Give a claimed item back so any worker can retry it right away."""
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "UPDATE leases SET owner = NULL, lease_until = 0 WHERE queue = ? AND key = ? AND owner = ?",
+                (queue, key, self.owner),
+            )
+            return cur.rowcount > 0
+
+    def finish_article(self, item: dict) -> None:
+        """Ack a processed article item, or release it for a retry if it failed.
+
+        Acks are written with the next claim, or once a batch has piled up;
+        call :meth:`flush` when done with the queue.
+        """
+        if not item.get("link"):
+            return
+        if item.get("error") is not None:
+            self.release(ARTICLES, item["link"])
+            return
+        with self._lock:
+            self._finished.append(item["link"])
+            if len(self._finished) < self.batch:
+                return
+            with self.conn:
+                self._ack_finished()
+
+    def flush(self) -> None:
+        """Write the acks of finished articles that are still pending."""
+        with self._lock, self.conn:
+            self._ack_finished()
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        """Return how many items of ``queue`` are available, leased, waiting or failed."""
+        now = self._clock()
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT
+                    SUM(attempts >= ? AND lease_until <= ?),
+                    SUM(lease_until > ?),
+                    SUM(attempts < ? AND lease_until <= ? AND available_at > ?),
+                    SUM(attempts < ? AND lease_until <= ? AND available_at <= ?)
+                FROM leases WHERE queue = ?
+                """,
+                (self.max_attempts, now, now, self.max_attempts, now, now, self.max_attempts, now, now, queue),
+            ).fetchone()
+        failed, leased, waiting, available = (n or 0 for n in row)
+        return {"available": available, "leased": leased, "waiting": waiting, "failed": failed}
+
+    def leased_by_others(self, queues: Iterable[str]) -> int:
+        """Return how many items of ``queues`` other owners hold unexpired leases on."""
+        queues = list(queues)
+        with self._lock:
+            row = self.conn.execute(
+                f"""
+                SELECT COUNT(*) FROM leases
+                WHERE queue IN ({", ".join("?" * len(queues))}) AND lease_until > ? AND owner != ?
+                """,
+                (*queues, self._clock(), self.owner),
+            ).fetchone()
+        return row[0]
+
+
+_queues: dict[str, LeaseQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_lease_queue(db_path: str = DB_PATH) -> LeaseQueue:
+    """Return the process-wide lease queue for ``db_path``, configured from the ``leases`` section."""
+    with _queues_lock:
+        queue = _queues.get(db_path)
+        if queue is None:
+            cfg = get_config().leases
+            queue = _queues[db_path] = LeaseQueue(
+                db_path,
+                lease_seconds=cfg.lease_seconds,
+                batch=cfg.batch,
+                max_attempts=cfg.max_attempts,
+            )
+        return queue
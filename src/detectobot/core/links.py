@@ -0,0 +1,87 @@
+"""Pluggable backends for extracting article links from landing pages."""
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+    from cssselect import SelectorError
+except ImportError:  # pragma: no cover - exercised only without lxml/cssselect
+    lxml = None
+
+DEFAULT_BACKEND = "auto"
+
+# Selectors that can only ever match anchors, so nothing but <a> tags needs
+# to be considered while parsing.
+_ANCHOR_ONLY = re.compile(r"^\s*a(\[[^\]]*\])*\s*$")
+
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str):
+    """Return a compiled lxml selector, or None if lxml cannot handle it.
+
+    Compiled selectors are cached, so each site's selector is translated to
+    XPath once per process.
+    """
+    if lxml is None:
+        return None
+    try:
+        return CSSSelector(selector)
+    except SelectorError:
+        return None
+
+
+def _bs4_links(html: str, selector: str) -> List[str]:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    if _ANCHOR_ONLY.match(selector):
+        soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a"))
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+    return [href for a in soup.select(selector) if (href := a.get("href"))]
+
+
+def _lxml_links(html: str, selector: str) -> List[str] | None:
+    compiled = compile_selector(selector)
+    if compiled is None:
+        return None
+    # lxml refuses str input that carries an encoding declaration
+    html = _XML_DECLARATION.sub("", html, count=1)
+    if not html.strip():
+        return []
+    try:
+        root = lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:
+        return []
+    if selector.strip() == "a":
+        elements = root.iter("a")
+    else:
+        elements = compiled(root)
+    return [href for el in elements if (href := el.get("href"))]
+
+
+BACKENDS: Dict[str, Callable[[str, str], List[str] | None]] = {
+    "lxml": _lxml_links,
+    "bs4": _bs4_links,
+}
+
+
+def extract_links(html: str, selector: str, backend: str = DEFAULT_BACKEND) -> List[str]:
+    """Return the ``href`` of every element matching ``selector``, in document order.
+
+    Args:
+        html: Page source.
+        selector: CSS selector for article links.
+        backend: ``"lxml"``, ``"bs4"`` or ``"auto"``. ``auto`` prefers lxml and
+            falls back to BeautifulSoup when lxml is not installed or cannot
+            compile the selector; so does an explicit ``"lxml"``.
+    """
+    if backend in ("auto", "lxml"):
+        links = _lxml_links(html, selector)
+        if links is not None:
+            return links
+        return _bs4_links(html, selector)
+    return BACKENDS[backend](html, selector)
@@ -0,0 +1,149 @@
+"""Persistent cache of validated LLM outputs stored in the watcher database."""
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from .config import get_config
+from .db_utils import connect, DB_PATH
+from .metrics import LLM_CACHE
+
+M = TypeVar("M", bound=BaseModel)
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic extraction differences share a key."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def schema_version(output_type: Type[BaseModel]) -> str:
+    """Return a short digest of the JSON schema of ``output_type``.
+
+    Any change to the output model yields a new version, so stale entries are
+    never validated against a different schema.
+    """
+    schema = json.dumps(output_type.model_json_schema(), sort_keys=True)
+    return _sha256(schema)[:16]
+
+
+def cache_key(text: str, system_prompt: str, model: str, output_type: Type[BaseModel]) -> str:
+    """Return the cache key for one analysis request."""
+    parts = (
+        _sha256(normalize_text(text)),
+        _sha256(system_prompt),
+        model,
+        schema_version(output_type),
+    )
+    return _sha256("\0".join(parts))
+
+
+class LLMCache:
+    """SQLite-backed store of model outputs keyed by :func:`cache_key`.
+
+    Entries older than ``max_age_days`` are dropped, and beyond
+    ``max_entries`` the least recently used entries are evicted. A value of
+    ``None`` disables the corresponding limit.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        max_entries: int | None = DEFAULT_MAX_ENTRIES,
+        max_age_days: float | None = DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.conn = connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                output TEXT,
+                created INTEGER,
+                last_used INTEGER
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self.conn.commit()
+        self.evict()
+
+    def get(self, key: str, output_type: Type[M]) -> M | None:
+        """Return the cached output for ``key`` or None on a miss."""
+        with self._lock:
+            row = self.conn.execute("SELECT output FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                LLM_CACHE.inc(result="miss")
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (int(time.time()), key))
+            self.conn.commit()
+        try:
+            output = output_type.model_validate_json(row[0])
+        except ValidationError:
+            LLM_CACHE.inc(result="miss")
+            return None
+        LLM_CACHE.inc(result="hit")
+        return output
+
+    def put(self, key: str, model: str, output: BaseModel) -> None:
+        """Store a validated output under ``key``."""
+        now = int(time.time())
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (key, model, output, created, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, model, output.model_dump_json(), now, now),
+            )
+            self.conn.commit()
+        self.evict()
+
+    def evict(self) -> int:
+        """Apply the age and size limits and return the number of rows removed."""
+        removed = 0
+        with self._lock, self.conn:
+            if self.max_age_days is not None:
+                cutoff = int(time.time() - self.max_age_days * 86400)
+                removed += self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (cutoff,)).rowcount
+            if self.max_entries is not None:
+                removed += self.conn.execute(
+                    """
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                ).rowcount
+        return removed
+
+
+_caches: dict[str, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(db_path: str = DB_PATH) -> LLMCache:
+    """Return the process-wide cache for ``db_path``.
+
+    Limits come from the ``llm_cache`` config section.
+    """
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cfg = get_config().llm_cache
+            cache = LLMCache(db_path, max_entries=cfg.max_entries, max_age_days=cfg.max_age_days)
+            _caches[db_path] = cache
+        return cache
@@ -0,0 +1,246 @@
+"""In-process counters and histograms with Prometheus text and JSON export."""
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Tuple
+
+from .fetcher import host_of
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, value
+
+    def to_json(self) -> list:
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (usually seconds)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), count, sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series = {}
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[1] if series else 0
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            return [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+
+    def samples(self) -> Iterator[Tuple[str, LabelKey, float]]:
+        for key, counts, count, total in self._snapshot():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", key + (("le", le),), cumulative
+            yield f"{self.name}_count", key, count
+            yield f"{self.name}_sum", key, total
+
+    def to_json(self) -> list:
+        return [
+            {
+                "labels": dict(key),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "buckets": dict(zip([*map(repr, self.buckets), "+Inf"], counts)),
+            }
+            for key, counts, count, total in self._snapshot()
+        ]
+
+
+class Registry:
+    """Named collection of metrics; ``counter``/``histogram`` get or create."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def reset(self) -> None:
+        """Forget all recorded values, keeping the metric definitions."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def render_prometheus(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> dict:
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return {m.name: {"type": m.kind, "help": m.help, "series": m.to_json()} for m in metrics}
+
+
+REGISTRY = Registry()
+
+FETCH_SECONDS = REGISTRY.histogram("detectobot_fetch_seconds", "Feed, site and article download time by host")
+FETCH_BYTES = REGISTRY.counter("detectobot_fetch_bytes_total", "Bytes downloaded by host")
+FETCH_RESULTS = REGISTRY.counter(
+    "detectobot_fetch_total", "Downloads by host and result (ok, not_modified, unchanged, error)"
+)
+PARSE_SECONDS = REGISTRY.histogram("detectobot_parse_seconds", "Landing page link extraction time")
+DB_SECONDS = REGISTRY.histogram("detectobot_db_seconds", "Seen-entry check and store time")
+LINKS = REGISTRY.counter("detectobot_links_total", "Discovered links by result (new, seen)")
+EXTRACT_SECONDS = REGISTRY.histogram("detectobot_extract_seconds", "Article text extraction time")
+CONTENT_STORE = REGISTRY.counter("detectobot_content_store_total", "Stored article lookups by result (hit, miss)")
+LLM_SECONDS = REGISTRY.histogram("detectobot_llm_seconds", "Model call latency")
+LLM_TOKENS = REGISTRY.counter("detectobot_llm_tokens_total", "Model tokens by direction (in, out)")
+LLM_REPAIRS = REGISTRY.counter(
+    "detectobot_llm_repairs_total", "Model output fields fixed locally by schema, field and error"
+)
+LLM_RETRIES = REGISTRY.counter("detectobot_llm_retries_total", "Model re-requests after output failed validation")
+RELEVANCE = REGISTRY.counter("detectobot_relevance_total", "Triage decisions by stage and decision (pass, drop, park)")
+LLM_CACHE = REGISTRY.counter("detectobot_llm_cache_total", "LLM result cache lookups by result (hit, miss)")
+
+
+def record_fetch(kind: str, url: str, seconds: float, result: str, nbytes: int | None = None) -> None:
+    """Record one download of a ``kind`` source (feed, site or article)."""
+    host = host_of(url or "")
+    FETCH_SECONDS.observe(seconds, kind=kind, host=host)
+    FETCH_RESULTS.inc(kind=kind, host=host, result=result)
+    if nbytes:
+        FETCH_BYTES.inc(nbytes, kind=kind, host=host)
+
+
+def write_json(path: str, registry: Registry = REGISTRY) -> None:
+    """Dump ``registry`` as JSON to ``path`` (``-`` for stdout)."""
+    data = json.dumps(registry.to_json(), indent=2)
+    if path == "-":
+        print(data)
+    else:
+        with open(path, "w") as f:
+            f.write(data)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body = json.dumps(registry.to_json()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
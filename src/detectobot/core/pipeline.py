@@ -0,0 +1,98 @@
+"""Streaming discover → fetch → analyze pipeline with bounded queues."""
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple
+
+from .config import get_config
+
+DEFAULT_QUEUE_SIZE = 16
+
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    """One pipeline step.
+
+    ``fn`` receives an item dict and returns the (possibly updated) item. It
+    runs on ``workers`` threads, so it must be thread-safe. An item returned
+    with a ``skipped`` reason is passed through the remaining stages as is.
+    """
+
+    name: str
+    fn: Callable[[Dict[str, Any]], Dict[str, Any]]
+    workers: int = 1
+
+
+def _discover(source: Iterable[Dict[str, Any]], outbox: queue.Queue) -> None:
+    try:
+        for item in source:
+            outbox.put(item)
+    except Exception as exc:
+        outbox.put({"name": None, "link": None, "error": exc, "stage": "discover"})
+    finally:
+        outbox.put(_DONE)
+
+
+def _start_stage(stage: Stage, inbox: queue.Queue, outbox: queue.Queue) -> List[threading.Thread]:
+    remaining = [max(1, stage.workers)]
+    lock = threading.Lock()
+
+    def work() -> None:
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Wake the next sibling; the last worker out closes the stage.
+                inbox.put(_DONE)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_DONE)
+                return
+            if item.get("error") is None and item.get("skipped") is None:
+                try:
+                    item = stage.fn(item)
+                except Exception as exc:
+                    item = dict(item, error=exc, stage=stage.name)
+            outbox.put(item)
+
+    threads = [
+        threading.Thread(target=work, name=f"pipeline-{stage.name}-{i}", daemon=True)
+        for i in range(remaining[0])
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_pipeline(
+    source: Iterable[Dict[str, Any]],
+    stages: List[Stage],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Stream items from ``source`` through ``stages`` and yield them as they finish.
+
+    Discovery runs on its own thread and every stage on its own workers,
+    connected by queues holding at most ``queue_size`` items. The first result
+    is therefore emitted while discovery is still running, and memory does not
+    grow with the size of the backlog. An item whose stage raised carries the
+    exception under ``error`` and the stage name under ``stage``; later stages
+    pass it through untouched. Items are yielded in completion order.
+    """
+    inbox: queue.Queue = queue.Queue(maxsize=queue_size)
+    threading.Thread(target=_discover, args=(source, inbox), name="pipeline-discover", daemon=True).start()
+    for stage in stages:
+        outbox: queue.Queue = queue.Queue(maxsize=queue_size)
+        _start_stage(stage, inbox, outbox)
+        inbox = outbox
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        yield item
+
+
+def pipeline_limits() -> Dict[str, int]:
+    """Return ``queue_size`` and ``fetch_workers`` from the ``pipeline`` config section."""
+    cfg = get_config().pipeline
+    return {"queue_size": cfg.queue_size, "fetch_workers": cfg.fetch_workers}
@@ -0,0 +1,258 @@
+"""Local triage of discovered links before they are fetched or sent to the model."""
+import argparse
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Tuple
+from urllib.parse import urlsplit
+
+from .config import get_config
+from .db_utils import connect, DB_PATH
+from .metrics import RELEVANCE
+
+DEFAULT_MIN_SCORE = 6.0
+DEFAULT_MIN_WORDS = 150
+
+# Paths that list, tag or describe posts rather than being one.
+DEFAULT_DENY = (
+    r"/(tags?|tagged|topics?|categor(y|ies)|authors?|users?|profile|page|search|archives?|about|contact|"
+    r"privacy|terms|legal|login|signin|signup|register|subscribe|newsletter|careers|jobs|feed|rss)(/|$)",
+    r"/@[^/]+/?$",
+    r"\.(png|jpe?g|gif|svg|webp|ico|css|js|zip|xml|json|mp4)$",
+    r"[?&](page|s|q)=",
+)
+
+# Threat-intel vocabulary with IDF-like weights: specific tooling and
+# techniques count more than general security terms.
+VOCABULARY: Dict[str, float] = {
+    **dict.fromkeys((
+        "mimikatz", "cobalt strike", "lsass", "shellcode", "bloodhound", "rubeus", "kerberoasting", "dcsync",
+        "sigma", "yara", "webshell", "web shell", "sideloading", "process injection", "credential dumping",
+        "lateral movement", "privilege escalation", "defense evasion", "command and control", "exfiltration",
+        "ransomware", "infostealer", "backdoor", "implant", "beacon", "loader", "dropper", "c2", "iocs",
+        "indicators of compromise", "att&ck", "ttps", "threat actor", "apt", "zero-day", "0-day",
+    ), 3.0),
+    **dict.fromkeys((
+        "malware", "payload", "persistence", "initial access", "phishing", "exploit", "exploitation",
+        "vulnerability", "intrusion", "adversary", "attacker", "campaign", "detection", "edr", "telemetry",
+        "powershell", "rundll32", "regsvr32", "scheduled task", "registry", "kerberos", "ntlm",
+        "active directory", "credential", "credentials", "forensics", "dfir", "incident", "threat hunting",
+        "hunting", "mitre", "tactic", "technique", "ioc",
+    ), 2.0),
+    **dict.fromkeys((
+        "attack", "threat", "security", "compromise", "windows", "linux", "process", "network", "domain",
+        "hash", "execution", "command", "event id", "log", "logs",
+    ), 0.5),
+}
+# ATT&CK technique and CVE IDs are strong signals on their own.
+_ID_TERMS = {
+    "attack-id": (re.compile(r"\bT\d{4}(?:\.\d{3})?\b"), 3.0),
+    "cve": (re.compile(r"\bCVE-\d{4}-\d{4,}\b", re.IGNORECASE), 3.0),
+}
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=8)
+def _vocabulary_pattern(terms: Tuple[str, ...]) -> re.Pattern:
+    alternation = "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+
+def score_text(text: str, vocabulary: Dict[str, float] = VOCABULARY) -> Tuple[float, Dict[str, int]]:
+    """Score ``text`` against a weighted vocabulary with sublinear term frequency.
+
+    Every vocabulary term found adds ``weight * (1 + ln(count))``, so a page
+    mentioning many distinct intel terms outscores one repeating a single
+    word. Returns the score and the term counts behind it.
+    """
+    counts: Dict[str, int] = {}
+    for match in _vocabulary_pattern(tuple(vocabulary)).finditer(text):
+        term = " ".join(match.group(0).lower().split())
+        counts[term] = counts.get(term, 0) + 1
+    weights = dict(vocabulary)
+    for name, (pattern, weight) in _ID_TERMS.items():
+        found = len(pattern.findall(text))
+        if found:
+            counts[name] = found
+            weights[name] = weight
+    score = sum(weights[term] * (1 + math.log(count)) for term, count in counts.items())
+    return score, counts
+
+
+@lru_cache(maxsize=256)
+def _compile(patterns: Tuple[str, ...]) -> Tuple[re.Pattern, ...]:
+    return tuple(re.compile(pattern, re.IGNORECASE) for pattern in patterns)
+
+
+def url_verdict(link: str, source: Dict[str, Any] | None = None, heuristics: bool = True) -> Tuple[bool, str]:
+    """Decide from the URL alone whether ``link`` can be an article.
+
+    A source's ``deny`` patterns reject first; if it has ``allow`` patterns a
+    link must match one of them and skips the heuristics. Otherwise links to
+    the source's own landing page, listing pages (tags, authors, pagination)
+    and static files are rejected. Returns ``(keep, reason)``.
+    """
+    source = source or {}
+    for pattern in _compile(tuple(source.get("deny") or ())):
+        if pattern.search(link):
+            return False, f"deny {pattern.pattern}"
+    allow = _compile(tuple(source.get("allow") or ()))
+    if allow:
+        for pattern in allow:
+            if pattern.search(link):
+                return True, f"allow {pattern.pattern}"
+        return False, "no allow pattern matched"
+    if not heuristics:
+        return True, "url"
+    parts = urlsplit(link)
+    if parts.scheme not in ("http", "https"):
+        return False, "not http"
+    if parts.path in ("", "/") or link.rstrip("/") == (source.get("url") or "").rstrip("/"):
+        return False, "landing page"
+    for pattern in _compile(DEFAULT_DENY):
+        if pattern.search(link):
+            return False, f"heuristic {pattern.pattern}"
+    return True, "url"
+
+
+class RelevanceFilter:
+    """Two pipeline stages that skip irrelevant links and record every decision.
+
+    :meth:`check_url` runs before the fetch and drops links whose URL cannot
+    be an article (see :func:`url_verdict`). :meth:`check_text` runs on the
+    cleaned text and parks articles that are too short or score below
+    ``min_score`` (see :func:`score_text`); parked pages stay in the content
+    store, so they can be analyzed by hand later. Skipped items carry the
+    reason under ``skipped`` and pass through the remaining stages untouched.
+    Decisions are kept in the ``relevance`` table for auditing.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        sources: Iterable[Dict[str, Any]] = (),
+        min_score: float = DEFAULT_MIN_SCORE,
+        min_words: int = DEFAULT_MIN_WORDS,
+        vocabulary: Dict[str, float] | None = None,
+        url_heuristics: bool = True,
+    ):
+        self.sources = {source.get("name"): source for source in sources}
+        self.min_score = min_score
+        self.min_words = min_words
+        self.vocabulary = {**VOCABULARY, **(vocabulary or {})}
+        self.url_heuristics = url_heuristics
+        self._lock = threading.Lock()
+        self.conn = connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS relevance (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                stage TEXT NOT NULL,
+                decision TEXT NOT NULL,
+                score REAL,
+                reason TEXT,
+                decided_at INTEGER NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_relevance_decision ON relevance (decision, decided_at)")
+        self.conn.commit()
+
+    def record(self, item: Dict[str, Any], stage: str, decision: str, reason: str, score: float | None = None):
+        """Store the latest triage decision for ``item`` and count it."""
+        RELEVANCE.inc(stage=stage, decision=decision)
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO relevance (url, source, stage, decision, score, reason, decided_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (item["link"], item.get("name"), stage, decision, score, reason, int(time.time())),
+            )
+
+    def check_url(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Pipeline stage: drop ``item`` if its URL cannot be an article."""
+        keep, reason = url_verdict(item["link"], self.sources.get(item.get("name")), self.url_heuristics)
+        if keep:
+            return item
+        self.record(item, "url", "drop", reason)
+        return dict(item, skipped=f"dropped by URL: {reason}")
+
+    def check_text(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Pipeline stage: park ``item`` if its text does not look like threat intel."""
+        text = item.get("text") or ""
+        words = len(_WORD.findall(text))
+        score, counts = score_text(text, self.vocabulary)
+        top = ", ".join(term for term, _ in sorted(counts.items(), key=lambda kv: -kv[1])[:5])
+        if words < self.min_words:
+            reason = f"{words} words"
+        elif score < self.min_score:
+            reason = f"score {score:.1f} ({top or 'no terms'})"
+        else:
+            self.record(item, "text", "pass", top, score)
+            return item
+        self.record(item, "text", "park", reason, score)
+        return dict(item, skipped=f"parked: {reason}")
+
+    def decisions(self, decision: str | None = None, limit: int | None = None):
+        """Return recorded decisions, newest first, as tuples matching the table columns."""
+        where = "WHERE decision = ?" if decision else ""
+        params = ([decision] if decision else []) + [-1 if limit is None else limit]
+        with self._lock:
+            return self.conn.execute(
+                f"""
+                SELECT url, source, stage, decision, score, reason, decided_at FROM relevance
+                {where} ORDER BY decided_at DESC LIMIT ?
+                """,
+                params,
+            ).fetchall()
+
+
+_filters: dict[str, RelevanceFilter] = {}
+_filters_lock = threading.Lock()
+
+
+def get_relevance_filter(db_path: str = DB_PATH) -> RelevanceFilter | None:
+    """Return the process-wide filter for ``db_path``, or None if ``relevance.enabled`` is off.
+
+    Thresholds come from the ``relevance`` config section and per-source
+    ``allow``/``deny`` patterns from the configured feeds and sites.
+    """
+    config = get_config()
+    cfg = config.relevance
+    if not cfg.enabled:
+        return None
+    with _filters_lock:
+        relevance = _filters.get(db_path)
+        if relevance is None:
+            relevance = _filters[db_path] = RelevanceFilter(
+                db_path,
+                sources=[source.model_dump() for source in [*config.feeds, *config.sites]],
+                min_score=cfg.min_score,
+                min_words=cfg.min_words,
+                vocabulary=cfg.keywords,
+                url_heuristics=cfg.url_heuristics,
+            )
+        return relevance
+
+
+def main(argv: list[str] | None = None) -> None:
+    """List recorded triage decisions (``detectobot-triage``)."""
+    parser = argparse.ArgumentParser(description="Audit relevance triage decisions")
+    parser.add_argument("--db", default=DB_PATH, help="Database file (default: watcher.db)")
+    parser.add_argument("--decision", choices=["pass", "drop", "park"], help="Only show this decision")
+    parser.add_argument("--limit", type=int, default=50, help="Show at most this many decisions")
+    args = parser.parse_args(argv)
+
+    relevance = RelevanceFilter(args.db)
+    for url, source, stage, decision, score, reason, decided_at in relevance.decisions(args.decision, args.limit):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(decided_at))
+        score = "-" if score is None else f"{score:.1f}"
+        print(f"{when}  {decision:<4}  {stage:<4}  {score:>6}  {source or '-'}  {url}  {reason}")
+
+
+if __name__ == "__main__":
+    main()
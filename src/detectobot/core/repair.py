@@ -0,0 +1,174 @@
+"""Local repair of model output that almost matches its schema.
+
+When structured output fails validation, Pydantic AI sends the errors back to
+the model and asks again, which costs a full round trip. Output schemas that
+derive from :class:`Repairable` first try to fix the failing fields locally
+and only fail (triggering the re-request) if something is left that cannot be
+fixed without the model.
+"""
+import copy
+import types
+from typing import Any, List, Tuple, Union, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError, model_validator
+
+from .metrics import LLM_REPAIRS
+
+MAX_ROUNDS = 3
+
+_MISSING = object()
+
+
+class _Unfixable(Exception):
+    pass
+
+
+def _optional(tp: Any) -> Tuple[Any, bool]:
+    """Split ``X | None`` into ``(X, True)``; other types give ``(tp, False)``."""
+    if get_origin(tp) in (Union, types.UnionType):
+        args = [arg for arg in get_args(tp) if arg is not type(None)]
+        if len(args) < len(get_args(tp)):
+            return (args[0] if len(args) == 1 else Union[tuple(args)]), True
+    return tp, tp is Any
+
+
+def _child(tp: Any, part: Any) -> Tuple[Any, bool]:
+    """Return the annotation of ``part`` inside a value of type ``tp`` and whether it is a model field."""
+    tp, _ = _optional(tp)
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        field = tp.model_fields.get(part)
+        return (Any if field is None else field.annotation), True
+    args = get_args(tp)
+    if get_origin(tp) is list:
+        return (args[0] if args else Any), False
+    if get_origin(tp) is dict:
+        return (args[1] if args else Any), False
+    return Any, False
+
+
+def _resolve(model: type, data: Any, loc: tuple):
+    """Follow an error location through ``data`` and the schema.
+
+    Returns the container holding the failing value, its key, the value (or
+    a missing marker), the expected annotation and a label naming the model
+    fields on the way. Trailing union member tags in ``loc`` are ignored.
+    """
+    parent, key, node, tp, names = None, None, data, model, []
+    for part in loc:
+        if isinstance(node, dict) and isinstance(part, str):
+            child, is_field = _child(tp, part)
+            if part not in node and not is_field:
+                break
+            parent, key, node, tp = node, part, node.get(part, _MISSING), child
+            if is_field:
+                names.append(part)
+        elif isinstance(node, list) and isinstance(part, int) and 0 <= part < len(node):
+            parent, key, node, tp = node, part, node[part], _child(tp, part)[0]
+        else:
+            break
+    return parent, key, node, tp, ".".join(names) or "__root__"
+
+
+def _fix(value: Any, tp: Any, error: str) -> Any:
+    """Return a replacement for ``value`` that should satisfy ``tp``, or raise :class:`_Unfixable`."""
+    base, nullable = _optional(tp)
+    origin = get_origin(base) or base
+    if value is _MISSING:
+        if nullable:
+            return None
+        if origin is list:
+            return []
+        if origin is dict:
+            return {}
+        raise _Unfixable(error)
+    if error == "string_type":
+        if isinstance(value, (bool, int, float)):
+            return str(value).lower() if isinstance(value, bool) else str(value)
+        if value is None:
+            return ""
+        if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+            return "\n".join(map(str, value))
+    elif error == "list_type":
+        if value is None:
+            return []
+        if isinstance(value, (str, int, float)):
+            return [value]
+    elif error == "dict_type" and value is None:
+        return {}
+    if nullable:
+        return None
+    raise _Unfixable(error)
+
+
+def repair(model: type, data: Any, errors: List[dict]) -> Tuple[Any, List[Tuple[str, str]]]:
+    """Fix the fields of ``data`` named in pydantic ``errors`` for ``model``.
+
+    Missing lists and dicts are filled with empty ones and missing optional
+    fields with None; scalars are turned into strings or one-item lists, and
+    null into an empty string, list or dict, as the schema expects. Invalid
+    optional values are dropped to None. A value failing every member of a
+    union (``str | list | dict``) gets the first fix that applies.
+
+    Returns a repaired copy of ``data`` and a ``(field, error type)`` pair
+    per fix. The fix list is empty, and ``data`` returned as is, if any
+    error cannot be fixed locally.
+    """
+    fixed = copy.deepcopy(data)
+    by_path: dict = {}
+    for error in errors:
+        by_path.setdefault(error["loc"], []).append(error["type"])
+    targets: dict = {}
+    for loc, kinds in by_path.items():
+        parent, key, value, tp, name = _resolve(model, fixed, loc)
+        if parent is None:
+            return data, []
+        slot = targets.setdefault((id(parent), key), [parent, key, value, tp, name, []])
+        slot[5].extend(kinds)
+    fixes = []
+    for parent, key, value, tp, name, kinds in targets.values():
+        for kind in kinds:
+            try:
+                parent[key] = _fix(value, tp, kind)
+            except _Unfixable:
+                continue
+            fixes.append((name, kind))
+            break
+        else:
+            return data, []
+    return fixed, fixes
+
+
+class Repairable(BaseModel):
+    """Base class for model output schemas that repairs near misses locally.
+
+    Validation first runs as usual; if it fails, :func:`repair` is applied
+    for up to :data:`MAX_ROUNDS` rounds and each fix is counted in
+    ``detectobot_llm_repairs_total``. If the output cannot be repaired the
+    original error is raised, so the caller (Pydantic AI) re-requests it.
+    """
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _repair(cls, data: Any, handler):
+        try:
+            return handler(data)
+        except ValidationError as exc:
+            if not isinstance(data, dict):
+                raise
+            original = exc
+            errors = exc.errors()
+        applied: List[Tuple[str, str]] = []
+        for _ in range(MAX_ROUNDS):
+            data, fixes = repair(cls, data, errors)
+            if not fixes:
+                break
+            applied.extend(fixes)
+            try:
+                result = handler(data)
+            except ValidationError as exc:
+                errors = exc.errors()
+                continue
+            for field, kind in applied:
+                LLM_REPAIRS.inc(schema=cls.__name__, field=field, error=kind)
+            return result
+        raise original
@@ -0,0 +1,138 @@
+"""Per-source poll scheduling for the long-running watch mode."""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .config import get_config
+
+DEFAULT_POLL_INTERVAL_MINUTES = 60
+DEFAULT_MIN_INTERVAL_MINUTES = 10
+DEFAULT_MAX_INTERVAL_MINUTES = 720
+DEFAULT_SPEEDUP = 0.5
+DEFAULT_BACKOFF = 1.5
+DEFAULT_JITTER = 0.1
+
+
+class SourceState:
+    """Scheduling state of one feed or site."""
+
+    __slots__ = ("kind", "source", "interval", "next_due", "failures", "last_new")
+
+    def __init__(self, kind: str, source: Dict[str, Any], interval: float, next_due: float):
+        self.kind = kind
+        self.source = source
+        self.interval = interval
+        self.next_due = next_due
+        self.failures = 0
+        self.last_new = 0
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.kind, self.source.get("url")
+
+
+class PollScheduler:
+    """Adaptive poll intervals for a set of sources.
+
+    Every source starts at ``interval`` seconds and is due immediately. After
+    each poll its interval adapts to what the poll found: a source that
+    published something is polled ``speedup`` times sooner, a quiet one
+    ``backoff`` times later and a failing one twice as late for every
+    consecutive failure, always within ``[min_interval, max_interval]``. A
+    ``jitter`` fraction spreads sources so they do not fall due together.
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[Tuple[str, Dict[str, Any]]],
+        interval: float = DEFAULT_POLL_INTERVAL_MINUTES * 60,
+        min_interval: float = DEFAULT_MIN_INTERVAL_MINUTES * 60,
+        max_interval: float = DEFAULT_MAX_INTERVAL_MINUTES * 60,
+        speedup: float = DEFAULT_SPEEDUP,
+        backoff: float = DEFAULT_BACKOFF,
+        jitter: float = DEFAULT_JITTER,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.backoff = backoff
+        self.jitter = jitter
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.states: Dict[Tuple[str, str], SourceState] = {}
+        self.sync(sources)
+
+    def sync(self, sources: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Track exactly ``sources``, e.g. after the config was reloaded.
+
+        New sources are due immediately, removed ones are dropped and the
+        others keep their adapted interval (with their entry refreshed, so a
+        changed selector takes effect on the next poll).
+        """
+        now = self._clock()
+        with self._lock:
+            states = {}
+            for kind, source in sources:
+                key = (kind, source.get("url"))
+                state = self.states.get(key)
+                if state is None:
+                    state = SourceState(kind, source, self.interval, now)
+                state.source = source
+                states[key] = state
+            self.states = states
+
+    def due(self) -> List[SourceState]:
+        """Return the sources whose next poll time has passed."""
+        now = self._clock()
+        with self._lock:
+            return [state for state in self.states.values() if state.next_due <= now]
+
+    def record(self, kind: str, source: Dict[str, Any], new_count: int | None) -> None:
+        """Adapt a source's interval after a poll.
+
+        ``new_count`` is the number of unseen links the poll found, or None if
+        the source could not be fetched.
+        """
+        with self._lock:
+            state = self.states.get((kind, source.get("url")))
+            if state is None:
+                return
+            if new_count is None:
+                state.failures += 1
+                interval = state.interval * 2 ** state.failures
+            else:
+                state.failures = 0
+                state.last_new = new_count
+                factor = self.speedup if new_count else self.backoff
+                state.interval = min(max(state.interval * factor, self.min_interval), self.max_interval)
+                interval = state.interval
+            interval = min(interval, self.max_interval)
+            if self.jitter:
+                interval *= 1 + random.uniform(-self.jitter, self.jitter)
+            state.next_due = self._clock() + interval
+
+    def seconds_until_due(self) -> float:
+        """Return how long until the next source falls due (0 if one already has)."""
+        with self._lock:
+            if not self.states:
+                return self.max_interval
+            next_due = min(state.next_due for state in self.states.values())
+        return max(0.0, next_due - self._clock())
+
+
+def scheduler_from_config(sources: Iterable[Tuple[str, Dict[str, Any]]]) -> PollScheduler:
+    """Build a :class:`PollScheduler` from ``poll_interval_minutes`` and the ``watch`` config section."""
+    config = get_config()
+    cfg = config.watch
+    return PollScheduler(
+        sources,
+        interval=config.poll_interval_minutes * 60,
+        min_interval=cfg.min_interval_minutes * 60,
+        max_interval=cfg.max_interval_minutes * 60,
+        speedup=cfg.speedup,
+        backoff=cfg.backoff,
+        jitter=cfg.jitter,
+    )
@@ -0,0 +1,70 @@
+"""In-memory front filter over ``seen_entries`` hashes."""
+import threading
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Number of hex digits of the SHA-256 kept per hash (64 bits). A new link is
+# only misreported as seen if its prefix collides with a stored one, which at
+# the default size happens with probability around 1e-14 per lookup.
+_PREFIX_HEX = 16
+_PREFIX_BYTES = _PREFIX_HEX // 2
+
+
+def _prefix(h: str) -> int:
+    return int(h[:_PREFIX_HEX], 16)
+
+
+class SeenFilter:
+    """Compact set of hash prefixes for entries already in the database.
+
+    A hit means the entry is known and can be skipped without a query. A miss
+    only means "not known here": the database stays the source of truth and
+    decides whether the entry is really new. Memory is bounded by
+    ``max_entries``; once full, further hashes are simply not cached, which
+    costs a database lookup but never changes results.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._prefixes: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def __contains__(self, h: str) -> bool:
+        return _prefix(h) in self._prefixes
+
+    def add(self, h: str) -> None:
+        """Record ``h`` as seen if there is room left."""
+        with self._lock:
+            if len(self._prefixes) < self.max_entries:
+                self._prefixes.add(_prefix(h))
+
+    def load(self, conn) -> None:
+        """Fill the filter with the most recently seen hashes in ``conn``."""
+        cur = conn.execute(
+            "SELECT hash FROM seen_entries ORDER BY timestamp DESC LIMIT ?",
+            (self.max_entries,),
+        )
+        with self._lock:
+            # Stored hashes are raw bytes; their leading bytes are the prefix.
+            for (h,) in cur:
+                if len(self._prefixes) >= self.max_entries:
+                    break
+                self._prefixes.add(int.from_bytes(h[:_PREFIX_BYTES], "big"))
+
+
+_filters: dict[str, SeenFilter] = {}
+_filters_lock = threading.Lock()
+
+
+def get_seen_filter(conn, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> SeenFilter:
+    """Return the process-wide filter for ``db_path``, loading it on first use."""
+    with _filters_lock:
+        seen = _filters.get(db_path)
+        if seen is None:
+            seen = SeenFilter(max_entries)
+            seen.load(conn)
+            _filters[db_path] = seen
+        return seen
@@ -0,0 +1,414 @@
+"""Local store of validated analysis results with indexed TTP, actor and logsource lookups."""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from typing import Iterator
+
+import yaml
+from pydantic import BaseModel
+
+from .config import get_config
+from .db_utils import connect, DB_PATH
+from .urls import url_key
+
+_ATTACK_ID = re.compile(r"\bT(\d{4})(?:\.(\d{3}))?\b", re.IGNORECASE)
+_SUB_ID = re.compile(r"^\s*\.?(\d{3})\b")
+
+# Rows fetched per round trip while streaming query results.
+_FETCH_BATCH = 200
+
+
+def attack_id(technique: str | None, subtechnique: str | None = None) -> str | None:
+    """Return the most specific ATT&CK ID in a TTP's technique fields, e.g. ``T1059.001``.
+
+    The model writes these fields freely ("T1059 - Command and Scripting
+    Interpreter", "T1059.001", "001 PowerShell"), so the ID is picked out of
+    the text. Returns None when the technique names no ID.
+    """
+    match = _ATTACK_ID.search(technique or "")
+    if match is None:
+        return None
+    base, sub = f"T{match.group(1)}", match.group(2)
+    if sub is None and subtechnique:
+        sub_match = _ATTACK_ID.search(subtechnique)
+        if sub_match is not None and sub_match.group(1) == match.group(1):
+            sub = sub_match.group(2)
+        elif (sub_match := _SUB_ID.match(subtechnique)) is not None:
+            sub = sub_match.group(1)
+    return f"{base}.{sub}" if sub else base
+
+
+def sigma_rule(ttp: dict, url: str) -> dict | None:
+    """Turn a TTP's ``sigma_stub`` into a Sigma rule dict, with the condition under ``detection``."""
+    stub = ttp.get("sigma_stub")
+    if not stub:
+        return None
+    detection = dict(stub.get("detection") or {})
+    if stub.get("condition"):
+        detection["condition"] = stub["condition"]
+    rule = {
+        "title": stub.get("title"),
+        "id": stub.get("id"),
+        "status": "experimental",
+        "description": ttp.get("description"),
+        "references": [url],
+        "tags": stub.get("tags") or [],
+        "logsource": stub.get("logsource") or {},
+        "detection": detection,
+        "falsepositives": stub.get("falsepositives") or [],
+    }
+    return {key: value for key, value in rule.items() if value not in (None, "")}
+
+
+class SpecStore:
+    """SQLite tables holding every validated result, one row per article and result type.
+
+    The full result is kept as JSON in ``specs``. Detection specs are also
+    broken down into ``ttps`` rows that reference the normalized
+    ``techniques``, ``threat_actors`` and ``logsources`` tables, each indexed,
+    so "every spec touching T1059" or "all stubs for process_creation" are
+    index lookups. Storing a result for an article again replaces it.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self._lock = threading.Lock()
+        self.conn = connect(db_path, check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS threat_actors (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE COLLATE NOCASE
+            );
+            CREATE TABLE IF NOT EXISTS techniques (
+                id INTEGER PRIMARY KEY,
+                attack_id TEXT NOT NULL UNIQUE,
+                parent TEXT NOT NULL,
+                name TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_techniques_parent ON techniques (parent);
+            CREATE TABLE IF NOT EXISTS logsources (
+                id INTEGER PRIMARY KEY,
+                category TEXT NOT NULL DEFAULT '',
+                product TEXT NOT NULL DEFAULT '',
+                service TEXT NOT NULL DEFAULT '',
+                UNIQUE (category, product, service)
+            );
+            CREATE INDEX IF NOT EXISTS idx_logsources_product ON logsources (product, service);
+            CREATE INDEX IF NOT EXISTS idx_logsources_service ON logsources (service);
+            CREATE TABLE IF NOT EXISTS specs (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                title TEXT,
+                publication_date TEXT,
+                status TEXT,
+                threat_actor_id INTEGER REFERENCES threat_actors (id),
+                stored_at INTEGER NOT NULL,
+                doc TEXT NOT NULL,
+                UNIQUE (url, kind)
+            );
+            CREATE INDEX IF NOT EXISTS idx_specs_actor ON specs (threat_actor_id);
+            CREATE INDEX IF NOT EXISTS idx_specs_status ON specs (status);
+            CREATE INDEX IF NOT EXISTS idx_specs_stored_at ON specs (stored_at);
+            CREATE TABLE IF NOT EXISTS ttps (
+                id INTEGER PRIMARY KEY,
+                spec_id INTEGER NOT NULL REFERENCES specs (id),
+                position INTEGER NOT NULL,
+                tactic TEXT,
+                technique_id INTEGER REFERENCES techniques (id),
+                logsource_id INTEGER REFERENCES logsources (id),
+                confidence TEXT,
+                doc TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_ttps_spec ON ttps (spec_id);
+            CREATE INDEX IF NOT EXISTS idx_ttps_technique ON ttps (technique_id);
+            CREATE INDEX IF NOT EXISTS idx_ttps_tactic ON ttps (tactic);
+            CREATE INDEX IF NOT EXISTS idx_ttps_logsource ON ttps (logsource_id);
+            """
+        )
+        self.conn.commit()
+
+    def _intern(self, sql_select: str, sql_insert: str, params: tuple) -> int:
+        row = self.conn.execute(sql_select, params).fetchone()
+        if row is None:
+            row = self.conn.execute(sql_insert, params).fetchone()
+        return row[0]
+
+    def _threat_actor(self, name: str | None) -> int | None:
+        name = (name or "").strip()
+        if not name:
+            return None
+        return self._intern(
+            "SELECT id FROM threat_actors WHERE name = ?",
+            "INSERT INTO threat_actors (name) VALUES (?) RETURNING id",
+            (name,),
+        )
+
+    def _technique(self, ttp: dict) -> int | None:
+        aid = attack_id(ttp.get("technique"), ttp.get("subtechnique"))
+        if aid is None:
+            return None
+        row = self.conn.execute("SELECT id FROM techniques WHERE attack_id = ?", (aid,)).fetchone()
+        if row is not None:
+            return row[0]
+        name = _ATTACK_ID.sub("", ttp.get("technique") or "").strip(" -:\t") or None
+        return self.conn.execute(
+            "INSERT INTO techniques (attack_id, parent, name) VALUES (?, ?, ?) RETURNING id",
+            (aid, aid.split(".")[0], name),
+        ).fetchone()[0]
+
+    def _logsource(self, ttp: dict) -> int | None:
+        logsource = (ttp.get("sigma_stub") or {}).get("logsource") or {}
+        key = tuple((logsource.get(field) or "").strip().lower() for field in ("category", "product", "service"))
+        if not any(key):
+            return None
+        return self._intern(
+            "SELECT id FROM logsources WHERE category = ? AND product = ? AND service = ?",
+            "INSERT INTO logsources (category, product, service) VALUES (?, ?, ?) RETURNING id",
+            key,
+        )
+
+    def put(self, url: str, result: BaseModel) -> int:
+        """Store ``result`` for the article at ``url`` and return its spec id."""
+        doc = result.model_dump(mode="json")
+        kind = type(result).__name__
+        with self._lock, self.conn:
+            spec_id = self.conn.execute(
+                """
+                INSERT INTO specs (url, kind, title, publication_date, status, threat_actor_id, stored_at, doc)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url, kind) DO UPDATE SET
+                    title = excluded.title,
+                    publication_date = excluded.publication_date,
+                    status = excluded.status,
+                    threat_actor_id = excluded.threat_actor_id,
+                    stored_at = excluded.stored_at,
+                    doc = excluded.doc
+                RETURNING id
+                """,
+                (
+                    url_key(url),
+                    kind,
+                    doc.get("article_title"),
+                    doc.get("publication_date"),
+                    doc.get("status"),
+                    self._threat_actor(doc.get("threat_actor")),
+                    int(time.time()),
+                    json.dumps(doc),
+                ),
+            ).fetchone()[0]
+            self.conn.execute("DELETE FROM ttps WHERE spec_id = ?", (spec_id,))
+            self.conn.executemany(
+                """
+                INSERT INTO ttps (spec_id, position, tactic, technique_id, logsource_id, confidence, doc)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        spec_id,
+                        position,
+                        (ttp.get("tactic") or "").strip().lower() or None,
+                        self._technique(ttp),
+                        self._logsource(ttp),
+                        ttp.get("detectability_confidence"),
+                        json.dumps(ttp),
+                    )
+                    for position, ttp in enumerate(doc.get("ttps") or [])
+                ],
+            )
+        return spec_id
+
+    @staticmethod
+    def _ttp_filter(
+        technique: str | None,
+        tactic: str | None,
+        category: str | None,
+        product: str | None,
+        service: str | None,
+    ) -> tuple[list[str], list]:
+        where, params = [], []
+        if technique:
+            aid = attack_id(technique) or technique.upper()
+            column = "attack_id" if "." in aid else "parent"
+            where.append(f"t.technique_id IN (SELECT id FROM techniques WHERE {column} = ?)")
+            params.append(aid)
+        if tactic:
+            where.append("t.tactic = ?")
+            params.append(tactic.strip().lower())
+        logsource = [(field, value) for field, value in
+                     (("category", category), ("product", product), ("service", service)) if value]
+        if logsource:
+            conditions = " AND ".join(f"{field} = ?" for field, _ in logsource)
+            where.append(f"t.logsource_id IN (SELECT id FROM logsources WHERE {conditions})")
+            params.extend(value.strip().lower() for _, value in logsource)
+        return where, params
+
+    def _stream(self, sql: str, params: list) -> Iterator[tuple]:
+        cur = self.conn.execute(sql, params)
+        while rows := cur.fetchmany(_FETCH_BATCH):
+            yield from rows
+
+    def iter_specs(
+        self,
+        technique: str | None = None,
+        tactic: str | None = None,
+        actor: str | None = None,
+        category: str | None = None,
+        product: str | None = None,
+        service: str | None = None,
+        status: str | None = None,
+        kind: str | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        """Yield stored results matching every given filter, newest first.
+
+        ``technique`` is an ATT&CK ID; a technique also matches its
+        subtechniques. Logsource fields and tactics compare case-insensitively.
+        Each result is a dict with ``id``, ``url``, ``kind``, ``title``,
+        ``status``, ``threat_actor``, ``stored_at`` and the stored ``doc``.
+        Rows are read in batches, so any number of results can be streamed.
+        """
+        ttp_where, params = self._ttp_filter(technique, tactic, category, product, service)
+        where = []
+        if ttp_where:
+            where.append(f"EXISTS (SELECT 1 FROM ttps t WHERE t.spec_id = s.id AND {' AND '.join(ttp_where)})")
+        if actor:
+            where.append("s.threat_actor_id = (SELECT id FROM threat_actors WHERE name = ?)")
+            params.append(actor.strip())
+        if status:
+            where.append("s.status = ?")
+            params.append(status)
+        if kind:
+            where.append("s.kind = ?")
+            params.append(kind)
+        sql = f"""
+            SELECT s.id, s.url, s.kind, s.title, s.status, a.name, s.stored_at, s.doc
+            FROM specs s LEFT JOIN threat_actors a ON a.id = s.threat_actor_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY s.stored_at DESC, s.id DESC
+            LIMIT ?
+        """
+        params.append(-1 if limit is None else limit)
+        for spec_id, url, kind, title, status, actor_name, stored_at, doc in self._stream(sql, params):
+            yield {
+                "id": spec_id,
+                "url": url,
+                "kind": kind,
+                "title": title,
+                "status": status,
+                "threat_actor": actor_name,
+                "stored_at": stored_at,
+                "doc": json.loads(doc),
+            }
+
+    def iter_sigma(
+        self,
+        technique: str | None = None,
+        tactic: str | None = None,
+        actor: str | None = None,
+        category: str | None = None,
+        product: str | None = None,
+        service: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        """Yield a Sigma rule (see :func:`sigma_rule`) for every matching TTP.
+
+        Filters work as in :meth:`iter_specs` but select individual TTPs, so
+        ``category="process_creation"`` yields only the stubs for that
+        logsource.
+        """
+        where, params = self._ttp_filter(technique, tactic, category, product, service)
+        if actor:
+            where.append("s.threat_actor_id = (SELECT id FROM threat_actors WHERE name = ?)")
+            params.append(actor.strip())
+        if status:
+            where.append("s.status = ?")
+            params.append(status)
+        sql = f"""
+            SELECT s.url, t.doc FROM ttps t JOIN specs s ON s.id = t.spec_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY s.stored_at DESC, s.id DESC, t.position
+            LIMIT ?
+        """
+        params.append(-1 if limit is None else limit)
+        for url, doc in self._stream(sql, params):
+            rule = sigma_rule(json.loads(doc), url)
+            if rule is not None:
+                yield rule
+
+
+_stores: dict[str, SpecStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_spec_store(db_path: str = DB_PATH) -> SpecStore | None:
+    """Return the process-wide spec store for ``db_path``, or None if ``spec_store.enabled`` is off."""
+    if not get_config().spec_store.enabled:
+        return None
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = SpecStore(db_path)
+        return store
+
+
+def _add_filters(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--technique", help="ATT&CK ID, e.g. T1059 (includes its subtechniques) or T1059.001")
+    parser.add_argument("--tactic", help="ATT&CK tactic, e.g. execution")
+    parser.add_argument("--actor", help="Threat actor name")
+    parser.add_argument("--category", help="Sigma logsource category, e.g. process_creation")
+    parser.add_argument("--product", help="Sigma logsource product, e.g. windows")
+    parser.add_argument("--service", help="Sigma logsource service, e.g. sysmon")
+    parser.add_argument("--status", help="Spec status: draft, ready or insufficient_detail")
+    parser.add_argument("--limit", type=int, help="Return at most this many results")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Query and export stored analysis results (``detectobot-specs``)."""
+    parser = argparse.ArgumentParser(description="Query stored detection specs")
+    parser.add_argument("--db", default=DB_PATH, help="Database file (default: watcher.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    _add_filters(commands.add_parser("query", help="List matching specs, newest first"))
+    export = commands.add_parser("export", help="Stream matching specs as JSONL or their Sigma stubs as YAML")
+    export.add_argument("--format", choices=["jsonl", "sigma"], default="jsonl")
+    export.add_argument("-o", "--output", help="Write to this file instead of stdout")
+    _add_filters(export)
+    args = parser.parse_args(argv)
+
+    store = SpecStore(args.db)
+    filters = {
+        name: getattr(args, name)
+        for name in ("technique", "tactic", "actor", "category", "product", "service", "status", "limit")
+    }
+    if args.command == "query":
+        for spec in store.iter_specs(**filters):
+            stored = time.strftime("%Y-%m-%d", time.localtime(spec["stored_at"]))
+            print(
+                f"{stored}  {spec['status'] or '-':<20}  {spec['threat_actor'] or '-':<20}"
+                f"  {spec['title'] or spec['kind']}  {spec['url']}"
+            )
+        return
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.format == "jsonl":
+            for spec in store.iter_specs(**filters):
+                out.write(json.dumps(dict(spec["doc"], url=spec["url"])) + "\n")
+        else:
+            first = True
+            for rule in store.iter_sigma(**filters):
+                if not first:
+                    out.write("---\n")
+                first = False
+                yaml.safe_dump(rule, out, sort_keys=False, allow_unicode=True)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Pre-LLM text preparation: token counting, cleanup and chunking."""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, List
+
+from .config import get_config
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - exercised only without tiktoken
+    tiktoken = None
+
+DEFAULT_BUDGET_TOKENS = 8000
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_ENCODING = "o200k_base"
+
+# Short lines that are navigation, sharing or comment widgets rather than
+# article content.
+_BOILERPLATE_LINE = re.compile(
+    r"^\W*("
+    r"skip to (main )?content|share( this( post| article)?)?( on \w+)?|tweet|"
+    r"subscribe( now| to .*)?|sign up|sign in|log ?in|menu|search|home|"
+    r"previous( post| article)?|next( post| article)?|related (posts|articles)|"
+    r"read more|continue reading|back to top|tags?:.*|categories:.*|posted in .*|"
+    r"filed under .*|all rights reserved.*|(copyright|©).*|privacy policy|"
+    r"cookie (policy|settings|preferences)|accept( all)?( cookies)?|"
+    r"click to share.*|like this:?|loading\.*"
+    r")\W*$",
+    re.IGNORECASE,
+)
+# Everything after a comment widget heading is reader discussion. A bare
+# "Comments" heading only counts near the end of the text; "Response" is a
+# normal section in incident write-ups and never ends the article.
+_COMMENTS_HEADING = re.compile(
+    r"^\W*(\d+ (comments?|responses?|replies)|leave a (reply|comment)|join the discussion)\W*$",
+    re.IGNORECASE,
+)
+_TRAILING_COMMENTS_HEADING = re.compile(r"^\W*comments\W*$", re.IGNORECASE)
+_TRAILING_FRACTION = 0.75
+_BOILERPLATE_MAX_LEN = 80
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=4)
+def _encoder(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:  # encoding files unavailable, e.g. offline
+        return None
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Return the number of tokens in ``text``.
+
+    Uses tiktoken when it is installed and the encoding is available locally,
+    otherwise estimates about four characters per token.
+    """
+    enc = _encoder(encoding)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def strip_boilerplate(text: str) -> str:
+    """Drop navigation, sharing and cookie lines and any trailing comment section."""
+    kept = []
+    lines = text.splitlines()
+    tail = int(len(lines) * _TRAILING_FRACTION)
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if len(stripped) <= _BOILERPLATE_MAX_LEN:
+            if _COMMENTS_HEADING.match(stripped) or (i >= tail and _TRAILING_COMMENTS_HEADING.match(stripped)):
+                break
+            if stripped and _BOILERPLATE_LINE.match(stripped):
+                continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def dedupe_paragraphs(text: str) -> str:
+    """Remove repeated paragraphs, keeping the first occurrence of each.
+
+    Paragraphs are compared ignoring case and whitespace. Blank-line runs are
+    collapsed so the result has one paragraph per line.
+    """
+    seen = set()
+    paragraphs = []
+    for paragraph in text.splitlines():
+        key = " ".join(paragraph.split()).lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        paragraphs.append(paragraph.strip())
+    return "\n".join(paragraphs)
+
+
+def clean_text(text: str) -> str:
+    """Strip boilerplate and duplicate paragraphs from extracted article text."""
+    return dedupe_paragraphs(strip_boilerplate(text))
+
+
+def _split_oversized(paragraph: str, budget: int) -> List[str]:
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        candidate = f"{current} {sentence}" if current else sentence
+        if current and count_tokens(candidate) > budget:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    # A single sentence over budget is cut by characters as a last resort.
+    result = []
+    for piece in pieces:
+        while count_tokens(piece) > budget and len(piece) > 1:
+            cut = max(1, len(piece) * budget // count_tokens(piece))
+            result.append(piece[:cut])
+            piece = piece[cut:]
+        result.append(piece)
+    return result
+
+
+def split_chunks(text: str, budget: int = DEFAULT_BUDGET_TOKENS) -> List[str]:
+    """Split ``text`` into chunks of at most ``budget`` tokens on paragraph boundaries.
+
+    Paragraphs longer than the budget are split on sentence boundaries.
+    """
+    chunks, current, used = [], [], 0
+    for paragraph in text.splitlines():
+        if not paragraph.strip():
+            continue
+        size = count_tokens(paragraph)
+        parts = [paragraph] if size <= budget else _split_oversized(paragraph, budget)
+        for part in parts:
+            size = count_tokens(part) if len(parts) > 1 else size
+            if current and used + size > budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(part)
+            used += size
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def map_reduce(
+    text: str,
+    analyze: Callable[[str], Any],
+    merge: Callable[[List[Any]], Any],
+    budget: int = DEFAULT_BUDGET_TOKENS,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Any:
+    """Analyze ``text`` in one call, or chunk-wise if it exceeds ``budget`` tokens.
+
+    Chunks are analyzed concurrently and their results, in document order,
+    are combined with ``merge``.
+    """
+    if count_tokens(text) <= budget:
+        return analyze(text)
+    chunks = split_chunks(text, budget)
+    if len(chunks) == 1:
+        return analyze(chunks[0])
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        partials = list(pool.map(analyze, chunks))
+    return merge(partials)
+
+
+def chunking_limits() -> dict:
+    """Return ``budget_tokens`` and ``max_workers`` from the ``chunking`` config section."""
+    cfg = get_config().chunking
+    return {"budget_tokens": cfg.budget_tokens, "max_workers": cfg.max_workers}
@@ -0,0 +1,155 @@
+"""URL canonicalization applied to article links before they are hashed.
+
+The canonical form is only an identity for deduplication (see
+:func:`url_key`); links are stored and fetched as found, resolved to an
+absolute URL with :func:`absolute_url`, since a site may not serve the
+rewritten form.
+"""
+import fnmatch
+import os
+from typing import Iterable, List
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from.
+DEFAULT_STRIP_PARAMS = (
+    "utm_*",
+    "fbclid",
+    "gclid",
+    "dclid",
+    "mc_cid",
+    "mc_eid",
+    "_hsenc",
+    "_hsmi",
+    "mkt_tok",
+    "ref_src",
+)
+
+DEFAULT_RULES = {
+    "strip_params": list(DEFAULT_STRIP_PARAMS),
+    "strip_trailing_slash": True,
+    "sort_query": True,
+    "fold_scheme": True,
+}
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def rules_for_host(host: str, rules: dict | None = None) -> dict:
+    """Return the effective rules for ``host``.
+
+    ``rules`` is the ``canonicalization`` config section: top-level keys
+    override :data:`DEFAULT_RULES` and ``hosts`` maps a host name to further
+    overrides. ``strip_params`` lists are merged rather than replaced.
+    """
+    merged = dict(DEFAULT_RULES)
+    layers = [rules or {}]
+    hosts = (rules or {}).get("hosts") or {}
+    if host in hosts:
+        layers.append(hosts[host] or {})
+    for layer in layers:
+        for key, value in layer.items():
+            if key == "hosts":
+                continue
+            if key == "strip_params":
+                merged["strip_params"] = merged["strip_params"] + list(value or [])
+            else:
+                merged[key] = value
+    return merged
+
+
+def canonicalize_url(url: str, base: str | None = None, rules: dict | None = None) -> str:
+    """Return a cleaned, absolute form of ``url``.
+
+    Relative links are resolved against ``base``; the scheme and host are
+    lower-cased, default ports, fragments and tracking parameters are dropped,
+    the remaining query is sorted and a trailing slash is removed from
+    non-root paths. The scheme itself is kept so the result stays fetchable.
+
+    Raises:
+        ValueError: If ``url`` is malformed, e.g. has a non-numeric port or
+            an unclosed IPv6 bracket.
+    """
+    if not url:
+        return url
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    effective = rules_for_host(host, rules)
+
+    netloc = f"[{host}]" if ":" in host else host
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+    if effective["strip_trailing_slash"] and len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    patterns = effective["strip_params"]
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not any(fnmatch.fnmatchcase(key.lower(), p) for p in patterns)
+    ]
+    if effective["sort_query"]:
+        query.sort()
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def absolute_url(url: str, base: str | None = None) -> str:
+    """Return ``url`` resolved against ``base`` and otherwise unchanged.
+
+    Raises:
+        ValueError: If ``url`` is malformed in the ways that make
+            :func:`canonicalize_url` fail, so it could not be hashed.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+    urlsplit(url).port  # parses the host and port; raises ValueError if malformed
+    return url
+
+
+def absolute_links(links: Iterable[str], base: str | None = None) -> List[str]:
+    """Resolve ``links`` found on a page against ``base``, skipping malformed ones.
+
+    One bad ``href`` must not stop discovery for the whole page.
+    """
+    resolved = []
+    for link in links:
+        try:
+            resolved.append(absolute_url(link, base))
+        except ValueError:
+            continue
+    return resolved
+
+
+def url_key(url: str, rules: dict | None = None) -> str:
+    """Return the identity of ``url`` used for deduplication.
+
+    This is :func:`canonicalize_url` with ``http`` folded into ``https`` (unless
+    the host's ``fold_scheme`` rule is off), so both variants of a link hash
+    the same.
+    """
+    canonical = canonicalize_url(url, rules=rules)
+    if not canonical:
+        return canonical
+    parts = urlsplit(canonical)
+    if parts.scheme == "http" and rules_for_host(parts.hostname or "", rules)["fold_scheme"]:
+        canonical = urlunsplit(("https",) + tuple(parts[1:]))
+    return canonical
+
+
+def load_rules(config_path: str) -> dict:
+    """Return the ``canonicalization`` section of the config file at ``config_path``."""
+    if not os.path.exists(config_path):
+        return {}
+    from .config import get_config
+
+    return get_config(config_path).canonicalization.as_rules()
@@ -1,66 +1,401 @@
 """Website and feed monitoring functionality."""
-import sqlite3
-import feedparser
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from .db_utils import init_db, entry_hash, check_and_store
-from .config import load_config
+import time
+from itertools import chain
+from typing import Any, Callable
+
+from . import http_client
+from .db_utils import (
+    connect,
+    init_db,
+    check_and_store_many,
+    check_and_store_changed,
+    load_http_cache,
+    store_http_cache,
+)
+from .config import get_config
+from .urls import absolute_links, absolute_url
+from .links import extract_links, DEFAULT_BACKEND
+from .seen_filter import get_seen_filter
+from .scheduler import PollScheduler
+from .leases import ARTICLES, LeaseQueue
+from .metrics import PARSE_SECONDS, record_fetch
+from .fetcher import (
+    iter_fetch,
+    conditional_headers,
+    body_digest,
+)
 
 # Use the DB_PATH from db_utils
 from .db_utils import DB_PATH
 
-def get_new_feed_links(db_path: str = DB_PATH):
-    """Return unseen article links for all configured RSS feeds."""
-    feeds = load_config('feeds')
-    conn = sqlite3.connect(db_path)
-    init_db(conn)
-    new_articles = []
-    for feed in feeds:
-        name = feed['name']
-        url = feed['url']
-        parsed = feedparser.parse(url)
-        for entry in getattr(parsed, "entries", []):
-            h = entry_hash(entry)
-            if check_and_store(conn, h, name, entry):
-                link = entry.get("link")
-                if link:
-                    new_articles.append({"name": name, "link": link})
-    conn.close()
-    return new_articles
-
-
-def get_new_site_links(db_path: str = DB_PATH):
-    """Return unseen article links from configured websites (HTML scraping)."""
-    sites = load_config('sites')
-    conn = sqlite3.connect(db_path)
-    init_db(conn)
-    new_links = []
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
+
+def _concurrency_limits(max_workers: int | None, per_host: int | None):
+    """Fill unset concurrency limits from the ``concurrency`` config section."""
+    cfg = get_config().concurrency
+    if max_workers is None:
+        max_workers = cfg.max_workers
+    if per_host is None:
+        per_host = cfg.per_host
+    return max_workers, per_host
+
+
+def _canonical_rules() -> dict:
+    """Return the ``canonicalization`` config section as a rules dict."""
+    return get_config().canonicalization.as_rules()
+
+
+def _seen_filter(conn, db_path: str):
+    """Return the shared seen filter if enabled in the ``seen_filter`` config section."""
+    cfg = get_config().seen_filter
+    if not cfg.enabled:
+        return None
+    return get_seen_filter(conn, str(db_path), cfg.max_entries)
+
+
+def _check_and_store(conn, url: str, name: str, entries: list, seen, rules, on_new=None):
+    """Store unseen ``entries`` of one source, incrementally if the ``incremental`` section allows.
+
+    ``on_new`` is called with ``conn`` and the new links, as yielded items,
+    inside the transaction that marks them seen.
+    """
+    hook = None
+    if on_new is not None:
+        def hook(conn, new):
+            on_new(conn, _link_items(name, new))
+    cfg = get_config().incremental
+    if not cfg.enabled:
+        return check_and_store_many(conn, name, entries, seen, rules, hook)
+    return check_and_store_changed(conn, url, name, entries, seen, rules, cfg.full_scan_every, hook)
+
+
+def _link_items(name: str, entries: list) -> list:
+    return [{"name": name, "link": entry["link"]} for entry in entries if entry.get("link")]
+
+
+def _fetch_feed_entries(url: str, cached: dict | None):
+    """Download and parse one feed.
+
+    Returns ``(entries, validators)`` where each entry holds the title and
+    link of a feed item. Cached validators are sent along so an
+    unchanged feed answers 304 and is never parsed; in that case ``entries``
+    is empty and ``validators`` is None. A body identical to the last poll
+    is not parsed either and gives empty ``entries``. Both are None if the
+    feed could not be downloaded at all.
+    """
+    started = time.perf_counter()
+    try:
+        resp = http_client.get(url, headers=conditional_headers(cached), accept=http_client.FEED_TYPES)
+        resp.raise_for_status()
+    except Exception as exc:
+        record_fetch("feed", url, time.perf_counter() - started, getattr(exc, "result", "error"))
+        return None, None
+    elapsed = time.perf_counter() - started
+    if resp.status_code == 304:
+        record_fetch("feed", url, elapsed, "not_modified")
+        return [], None
+    validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "digest": body_digest(resp.content),
     }
-    for site in sites:
-        name = site.get('name')
-        url = site.get('url')
-        selector = site.get('selector', 'a')
+    if cached and cached.get("digest") == validators["digest"]:
+        record_fetch("feed", url, elapsed, "unchanged", len(resp.content))
+        return [], validators
+    record_fetch("feed", url, elapsed, "ok", len(resp.content))
+    import feedparser  # imported here so site-only runs never load it
+
+    parsed = feedparser.parse(
+        resp.content,
+        response_headers={"content-location": resp.url, "content-type": resp.headers.get("Content-Type", "")},
+    )
+    entries = []
+    for entry in getattr(parsed, "entries", []):
         try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-        except Exception:
+            link = absolute_url(entry.get("link"))
+        except ValueError:
+            # A malformed link must not hide the rest of the feed.
             continue
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        for a in soup.select(selector):
-            link = a.get('href')
-            if not link:
+        entries.append({"title": entry.get("title"), "link": link})
+    return entries, validators
+
+
+def _fetch_site_links(
+    url: str,
+    selector: str,
+    cached: dict | None,
+    backend: str = DEFAULT_BACKEND,
+):
+    """Download one site and return the absolute links matching ``selector``.
+
+    Returns ``(links, validators)``; ``links`` is None when the page could not
+    be fetched. On a 304 or a body identical to the last poll the page is not
+    parsed and ``links`` is empty, since every link on it is already known.
+    """
+    started = time.perf_counter()
+    try:
+        resp = http_client.get(url, headers=conditional_headers(cached))
+        resp.raise_for_status()
+    except Exception as exc:
+        record_fetch("site", url, time.perf_counter() - started, getattr(exc, "result", "error"))
+        return None, None
+    elapsed = time.perf_counter() - started
+    if resp.status_code == 304:
+        record_fetch("site", url, elapsed, "not_modified")
+        return [], None
+    validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "digest": body_digest(resp.content, selector),
+    }
+    if cached and cached.get("digest") == validators["digest"]:
+        record_fetch("site", url, elapsed, "unchanged", len(resp.content))
+        return [], validators
+    record_fetch("site", url, elapsed, "ok", len(resp.content))
+    with PARSE_SECONDS.time(backend=backend):
+        found = extract_links(resp.text, selector, backend)
+    links = absolute_links(found, base=url)
+    return links, validators
+
+
+def iter_new_feed_links(
+    db_path: str = DB_PATH,
+    max_workers: int | None = None,
+    per_host: int | None = None,
+    ordered: bool = False,
+    feeds: list | None = None,
+    conn=None,
+    on_polled: Callable[[dict, int | None], None] | None = None,
+    on_new: Callable[[Any, list], None] | None = None,
+):
+    """Yield unseen article links for configured RSS feeds as each feed arrives.
+
+    Links from a feed are yielded as soon as that feed has been fetched and
+    checked, while slower feeds are still downloading. With ``ordered`` feeds
+    are processed in configuration order instead.
+
+    Args:
+        feeds: Feed entries to poll instead of the configured ``feeds``.
+        conn: Open database connection to reuse; it is left open.
+        on_polled: Called with each feed and its number of new links, or None
+            if the feed could not be fetched.
+        on_new: Called with the connection and a feed's new link items inside
+            the transaction that marks them seen, to store them atomically
+            with it (see :func:`iter_leased_links`).
+    """
+    if feeds is None:
+        feeds = [feed.model_dump() for feed in get_config().feeds]
+    max_workers, per_host = _concurrency_limits(max_workers, per_host)
+    rules = _canonical_rules()
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path)
+    try:
+        init_db(conn, rules)
+        seen = _seen_filter(conn, db_path)
+        cache = load_http_cache(conn)
+        results = iter_fetch(
+            [feed['url'] for feed in feeds],
+            lambda url: _fetch_feed_entries(url, cache.get(url)),
+            max_workers,
+            per_host,
+            ordered=ordered,
+        )
+        for i, (entries, validators) in results:
+            feed = feeds[i]
+            if entries is None:
+                if on_polled:
+                    on_polled(feed, None)
+                continue
+            name = feed['name']
+            new = _check_and_store(conn, feed['url'], name, entries, seen, rules, on_new)
+            store_http_cache(conn, feed['url'], validators)
+            if on_polled:
+                on_polled(feed, len(new))
+            yield from _link_items(name, new)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_new_feed_links(db_path: str = DB_PATH, max_workers: int | None = None, per_host: int | None = None):
+    """Return unseen article links for all configured RSS feeds.
+
+    Feeds are fetched concurrently; entries are then checked against the
+    database in configuration order (see :func:`iter_new_feed_links`).
+    """
+    return list(iter_new_feed_links(db_path, max_workers, per_host, ordered=True))
+
+
+def iter_new_site_links(
+    db_path: str = DB_PATH,
+    max_workers: int | None = None,
+    per_host: int | None = None,
+    ordered: bool = False,
+    sites: list | None = None,
+    conn=None,
+    on_polled: Callable[[dict, int | None], None] | None = None,
+    on_new: Callable[[Any, list], None] | None = None,
+):
+    """Yield unseen article links from configured websites as each site arrives.
+
+    Links from a site are yielded as soon as that page has been fetched,
+    parsed and checked. With ``ordered`` sites are processed in configuration
+    order instead. The ``link_parser`` config key picks the link extraction
+    backend (see :func:`extract_links`). ``sites``, ``conn``, ``on_polled``
+    and ``on_new`` work as in :func:`iter_new_feed_links`.
+    """
+    if sites is None:
+        sites = [site.model_dump() for site in get_config().sites]
+    backend = get_config().link_parser
+    max_workers, per_host = _concurrency_limits(max_workers, per_host)
+    rules = _canonical_rules()
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path)
+    try:
+        init_db(conn, rules)
+        seen = _seen_filter(conn, db_path)
+        cache = load_http_cache(conn)
+        results = iter_fetch(
+            sites,
+            lambda site: _fetch_site_links(
+                site.get('url'), site.get('selector', 'a'), cache.get(site.get('url')), backend
+            ),
+            max_workers,
+            per_host,
+            key=lambda site: site.get('url'),
+            ordered=ordered,
+        )
+        for i, (links, validators) in results:
+            site = sites[i]
+            if links is None:
+                if on_polled:
+                    on_polled(site, None)
+                continue
+            name = site.get('name')
+            new = _check_and_store(
+                conn, site.get('url'), name, [{'link': link} for link in links], seen, rules, on_new
+            )
+            store_http_cache(conn, site.get('url'), validators)
+            if on_polled:
+                on_polled(site, len(new))
+            yield from _link_items(name, new)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_new_site_links(db_path: str = DB_PATH, max_workers: int | None = None, per_host: int | None = None):
+    """Return unseen article links from configured websites (HTML scraping).
+
+    Sites are fetched and parsed concurrently; links are then checked against
+    the database in configuration order (see :func:`iter_new_site_links`).
+    """
+    return list(iter_new_site_links(db_path, max_workers, per_host, ordered=True))
+
+
+def watched_sources(kinds=('feed', 'site')):
+    """Return ``(kind, source)`` pairs for the configured feeds and/or sites."""
+    config = get_config()
+    sources = []
+    if 'feed' in kinds:
+        sources += [('feed', feed.model_dump()) for feed in config.feeds]
+    if 'site' in kinds:
+        sources += [('site', site.model_dump()) for site in config.sites]
+    return sources
+
+
+def iter_due_links(scheduler: PollScheduler, db_path: str = DB_PATH, conn=None):
+    """Poll the sources ``scheduler`` reports as due and yield their unseen links.
+
+    Each poll's outcome is fed back to the scheduler so it can adapt that
+    source's interval.
+    """
+    due = scheduler.due()
+    feeds = [state.source for state in due if state.kind == 'feed']
+    sites = [state.source for state in due if state.kind == 'site']
+    streams = []
+    if feeds:
+        streams.append(iter_new_feed_links(
+            db_path, feeds=feeds, conn=conn,
+            on_polled=lambda feed, count: scheduler.record('feed', feed, count),
+        ))
+    if sites:
+        streams.append(iter_new_site_links(
+            db_path, sites=sites, conn=conn,
+            on_polled=lambda site, count: scheduler.record('site', site, count),
+        ))
+    return chain.from_iterable(streams)
+
+
+def iter_leased_links(
+    leases: LeaseQueue,
+    kinds=('feed', 'site'),
+    db_path: str = DB_PATH,
+    conn=None,
+    idle_seconds: float | None = None,
+):
+    """Yield unseen article links while sharing the work with other worker processes.
+
+    The configured sources are claimed from ``leases`` a batch at a time, so
+    concurrent workers poll disjoint sources; a polled source is not handed
+    out again for ``watch.min_interval_minutes``. The new links a batch turns
+    up go to the shared :data:`~detectobot.core.leases.ARTICLES` queue, and
+    each worker yields the articles it claims from there, also while it is
+    still polling. They are queued in the same transaction that marks them
+    seen, so a worker dying mid-poll cannot leave links seen but never
+    queued. The caller acks every yielded link once processed, or releases it
+    to have it retried.
+
+    When nothing can be claimed but other workers still hold leases, the
+    worker checks again every ``idle_seconds`` (``leases.idle_seconds`` by
+    default): those leases may turn up new articles, or expire because their
+    worker died and are then claimed here. It returns once nothing is left
+    available or leased elsewhere.
+    """
+    cfg = get_config()
+    cooldown = cfg.watch.min_interval_minutes * 60
+    if idle_seconds is None:
+        idle_seconds = cfg.leases.idle_seconds
+    for kind in kinds:
+        leases.sync(kind, [(source['url'], source) for _, source in watched_sources((kind,))])
+
+    def queue_articles(conn, items):
+        leases.offer(ARTICLES, [(item['link'], item) for item in items], conn=conn)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path)
+    try:
+        while True:
+            # Checked before claiming: a lease expiring in between is then
+            # still claimed on the next round instead of being missed.
+            busy_elsewhere = leases.leased_by_others((*kinds, ARTICLES))
+            claimed_any = False
+            for kind in kinds:
+                claimed = [source for _, source in leases.claim(kind)]
+                if not claimed:
+                    continue
+                claimed_any = True
+                if kind == 'feed':
+                    polled = iter_new_feed_links(db_path, feeds=claimed, conn=conn, on_new=queue_articles)
+                else:
+                    polled = iter_new_site_links(db_path, sites=claimed, conn=conn, on_new=queue_articles)
+                # queue_articles has queued each polled link; hand out a batch
+                # of articles whenever a batch worth has been queued.
+                for found, _ in enumerate(polled, 1):
+                    if found % leases.batch == 0:
+                        for _, item in leases.claim(ARTICLES):
+                            yield item
+                leases.ack_many(kind, [source['url'] for source in claimed], delay=cooldown)
+            articles = leases.claim(ARTICLES)
+            for _, item in articles:
+                yield item
+            if claimed_any or articles:
                 continue
-            abs_link = urljoin(url, link)
-            entry = {'link': abs_link}
-            h = entry_hash(entry)
-            if check_and_store(conn, h, name, entry):
-                new_links.append({'name': name, 'link': abs_link})
-    conn.close()
-    return new_links
+            if not busy_elsewhere:
+                return
+            time.sleep(idle_seconds)
+    finally:
+        if own_conn:
+            conn.close()
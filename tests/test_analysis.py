@@ -0,0 +1,121 @@
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.analysis import AnalysisPool, ModelGate, RateLimiter
+from detectobot.core import textprep
+from detectobot.core.textprep import map_reduce
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    """Answers like a model endpoint, rejecting every first request with 429."""
+
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with FakeModelHandler.lock:
+            FakeModelHandler.calls += 1
+            limited = FakeModelHandler.calls == 1
+        if limited:
+            self.send_response(429)
+            self.end_headers()
+            return
+        time.sleep(0.1)
+        data = json.dumps({"summary": body["text"].upper()}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ModelHTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def test_pool_against_fake_endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeModelHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    def analyze(text):
+        req = urllib.request.Request(url, data=json.dumps({"text": text}).encode(), method="POST")
+        try:
+            with urllib.request.urlopen(req) as resp:
+                return json.load(resp)["summary"]
+        except urllib.error.HTTPError as exc:
+            raise ModelHTTPError(exc.code)
+
+    pool = AnalysisPool(analyze, max_concurrency=4, backoff=0.01)
+    texts = [f"article {i}" for i in range(8)]
+    start = time.monotonic()
+    results = {item: result for item, result, error in pool.imap_unordered(texts)}
+    elapsed = time.monotonic() - start
+    server.shutdown()
+
+    assert results == {t: t.upper() for t in texts}
+    assert FakeModelHandler.calls == 9
+    assert elapsed < 0.1 * len(texts)
+
+
+def test_pool_skips_limiter_on_cache_hit():
+    pool = AnalysisPool(lambda t: 1 / 0, lookup=lambda t: "cached", requests_per_minute=0)
+    assert list(pool.imap_unordered(["a"])) == [("a", "cached", None)]
+
+
+def test_pool_reports_errors_per_item():
+    pool = AnalysisPool(lambda t: 1 / 0)
+    [(item, result, error)] = pool.imap_unordered(["a"])
+    assert item == "a" and result is None and isinstance(error, ZeroDivisionError)
+
+
+def test_rate_limiter_waits_for_window():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=100, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire(10)
+    limiter.acquire(10)
+    limiter.acquire(10)
+    assert slept == [60.0]
+    limiter.acquire(95)
+    assert now[0] == 120.0
+
+
+def test_gate_budgets_and_retries_each_chunk_call(monkeypatch):
+    monkeypatch.setattr(textprep, "_encoder", lambda name: None)
+    gate = ModelGate(max_concurrency=2, requests_per_minute=None, backoff=0, sleep=lambda s: None)
+    calls = []
+
+    def model(chunk):
+        calls.append(chunk)
+        if chunk.startswith("b") and calls.count(chunk) == 1:
+            raise ModelHTTPError(429)
+        return chunk[0]
+
+    pool = AnalysisPool(
+        lambda text: map_reduce(text, lambda c: gate.call(lambda: model(c), len(c)), "".join, budget=60),
+        gate=gate,
+    )
+    text = "\n".join(letter * 200 for letter in "abc")
+    assert pool.analyze_one(text) == "abc"
+    # Three chunks plus one retry of the rate-limited chunk, each budgeted on its own.
+    assert sorted(c[0] for c in calls) == ["a", "b", "b", "c"]
+    assert len(gate.limiter._events) == 4
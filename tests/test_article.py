@@ -0,0 +1,69 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import article
+from detectobot.core.article import ExtractionPool, ExtractionTimeout, NotStored, fetch_article_text
+from detectobot.core.content_store import ContentStore
+
+PAGE = "<html><body><nav>Menu</nav><article>" + "<p>Attackers used PowerShell to stage the payload.</p>" * 30 + "</article></body></html>"
+
+
+def test_pool_extracts_and_survives_a_timeout():
+    pool = ExtractionPool(1, timeout=0.5)
+    try:
+        assert "Attackers used PowerShell" in pool.extract(PAGE)
+
+        # time.sleep stands in for a pathological page.
+        slow = ExtractionPool(1, timeout=0.5, fn=time.sleep)
+        started = time.perf_counter()
+        with pytest.raises(ExtractionTimeout):
+            slow.extract(30)
+        assert time.perf_counter() - started < 10
+        assert slow.extract(0) is None
+        slow.shutdown()
+
+        assert "Attackers used PowerShell" in pool.extract(PAGE)
+    finally:
+        pool.shutdown()
+
+
+def test_pdf_goes_to_extractor_hook(tmp_path, monkeypatch):
+    class Download:
+        status_code, url, headers = 200, "https://example.com/report.pdf", {"Content-Type": "application/pdf"}
+        content_type, content = "application/pdf", b"%PDF-1.4 ..."
+
+        def raise_for_status(self):
+            pass
+
+    accepted = []
+
+    def fake_get(url, accept=()):
+        accepted.extend(accept)
+        return Download()
+
+    monkeypatch.setattr(article.http_client, "get", fake_get)
+    monkeypatch.setattr(article, "get_extraction_pool", lambda: None)
+    monkeypatch.setitem(article.EXTRACTORS, "application/pdf", lambda content: f"{len(content)} bytes of PDF")
+    store = ContentStore(str(tmp_path / "db.sqlite"))
+
+    assert fetch_article_text("https://example.com/report.pdf", store) == "12 bytes of PDF"
+    assert "application/pdf" in accepted
+    assert fetch_article_text("https://example.com/report.pdf", store, reextract=True) == "12 bytes of PDF"
+
+
+def test_fetch_failures_raise(tmp_path, monkeypatch):
+    def refuse(url, accept=()):
+        raise article.http_client.UnsupportedContentType(f"unsupported content type at {url}")
+
+    monkeypatch.setattr(article.http_client, "get", refuse)
+    store = ContentStore(str(tmp_path / "db.sqlite"))
+    with pytest.raises(NotStored):
+        fetch_article_text("https://example.com/a", store, offline=True)
+    with pytest.raises(article.http_client.UnsupportedContentType):
+        fetch_article_text("https://example.com/a", store)
+    assert store.get("https://example.com/a") is None
@@ -0,0 +1,95 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import config
+from detectobot.core.analysis import DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE
+from detectobot.core.db_utils import DEFAULT_RETENTION_DAYS
+from detectobot.core.content_store import DEFAULT_MAX_MB, DEFAULT_TTL_HOURS
+from detectobot.core.fetcher import DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST
+from detectobot.core.http_client import DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES
+from detectobot.core.leases import DEFAULT_BATCH, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+from detectobot.core.llm_cache import DEFAULT_MAX_ENTRIES
+from detectobot.core.pipeline import DEFAULT_QUEUE_SIZE
+from detectobot.core.scheduler import DEFAULT_MAX_INTERVAL_MINUTES, DEFAULT_POLL_INTERVAL_MINUTES
+from detectobot.core.textprep import DEFAULT_BUDGET_TOKENS
+
+
+def _write(path, text, bump):
+    path.write_text(text)
+    # Make sure the change is visible even on coarse mtime filesystems.
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump * 1_000_000_000))
+
+
+def test_config_is_cached_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    _write(path, "sites:\n  - name: A\n    url: https://a.example/\n", 1)
+    parses = []
+    real_parse = config._parse
+    monkeypatch.setattr(config, "_parse", lambda p: parses.append(p) or real_parse(p))
+
+    first = config.get_config(str(path))
+    assert config.get_config(str(path)) is first
+    assert [site.selector for site in first.sites] == ["a"]
+    assert len(parses) == 1
+
+    _write(path, "sites:\n  - name: A\n    url: https://a.example/\n    selector: h2 a\n"
+                 "  - name: B\n    url: https://b.example/\n", 2)
+    reloaded = config.get_config(str(path))
+    assert [(s.name, s.selector) for s in reloaded.sites] == [("A", "h2 a"), ("B", "a")]
+    assert len(parses) == 2
+
+
+def test_invalid_edit_keeps_last_good_config(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "concurrency:\n  max_workers: 4\n", 1)
+    assert config.get_config(str(path)).concurrency.max_workers == 4
+
+    _write(path, "concurrency:\n  max_workers: -1\n", 2)
+    with pytest.warns(UserWarning):
+        assert config.get_config(str(path)).concurrency.max_workers == 4
+
+    other = tmp_path / "other.yaml"
+    other.write_text("link_parser: regex\n")
+    with pytest.raises(Exception):
+        config.get_config(str(other))
+
+
+def test_model_defaults_match_module_defaults():
+    c = config.Config()
+    assert c.poll_interval_minutes == DEFAULT_POLL_INTERVAL_MINUTES
+    assert c.watch.max_interval_minutes == DEFAULT_MAX_INTERVAL_MINUTES
+    assert (c.concurrency.max_workers, c.concurrency.per_host) == (DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST)
+    assert (c.http.read_timeout, c.http.retries) == (DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES)
+    assert c.llm_cache.max_entries == DEFAULT_MAX_ENTRIES
+    assert (c.llm.max_concurrency, c.llm.requests_per_minute) == (DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE)
+    assert c.pipeline.queue_size == DEFAULT_QUEUE_SIZE
+    assert c.chunking.budget_tokens == DEFAULT_BUDGET_TOKENS
+    assert (c.content_store.ttl_hours, c.content_store.max_mb) == (DEFAULT_TTL_HOURS, DEFAULT_MAX_MB)
+    assert c.retention.seen_days == DEFAULT_RETENTION_DAYS
+    assert (c.incremental.enabled, c.incremental.full_scan_every) == (True, 24)
+    assert c.spec_store.enabled
+    assert (c.extraction.workers, c.extraction.timeout_seconds) == (None, 30)
+    assert (c.http.max_mb, c.http.deadline_seconds) == (10, 60)
+    assert (c.relevance.enabled, c.relevance.min_score, c.relevance.min_words) == (True, 6, 150)
+    assert (c.leases.lease_seconds, c.leases.batch, c.leases.max_attempts) == (
+        DEFAULT_LEASE_SECONDS, DEFAULT_BATCH, DEFAULT_MAX_ATTEMPTS
+    )
+
+
+def test_canonicalization_rules_are_validated(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "canonicalization:\n  sort_query: false\n  hosts:\n    a.example:\n"
+                 "      strip_params: [source]\n", 1)
+    rules = config.get_config(str(path)).canonicalization.as_rules()
+    assert rules == {"sort_query": False, "hosts": {"a.example": {"strip_params": ["source"]}}}
+
+    bad = tmp_path / "bad.yaml"
+    bad.write_text("canonicalization:\n  hosts:\n    a.example:\n      strip_params: source\n")
+    with pytest.raises(Exception):
+        config.get_config(str(bad))
@@ -0,0 +1,79 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.content_store import ContentStore
+
+
+def test_round_trip_by_canonical_url(tmp_path):
+    store = ContentStore(str(tmp_path / "db.sqlite"))
+    html = "<html><body>" + "<p>hello</p>" * 500 + "</body></html>"
+    store.put("https://example.com/post/?utm_source=x", html, "hello", status=200, content_type="text/html")
+    entry = store.get("http://example.com/post#comments")
+    assert entry["html"] == html
+    assert entry["text"] == "hello"
+    assert entry["status"] == 200
+    raw_size = store.conn.execute("SELECT length(raw) FROM article_store").fetchone()[0]
+    assert raw_size < len(html) / 10
+    assert store.urls() == ["https://example.com/post"]
+
+
+def test_ttl_and_lru_size_cap(tmp_path):
+    store = ContentStore(str(tmp_path / "db.sqlite"), ttl_hours=1, max_mb=None)
+    store.put("https://example.com/old", "<p>old</p>", "old")
+    store.conn.execute("UPDATE article_store SET fetched_at = ?", (int(time.time()) - 7200,))
+    assert store.get("https://example.com/old") is None
+    assert store.evict() == 1
+
+    store.max_mb = 1 / 1024  # 1 KiB
+    store.put("https://example.com/a", "a", "x" * 400)
+    store.put("https://example.com/b", "b", "y" * 400)
+    store.conn.execute("UPDATE article_store SET last_used = 0 WHERE url = 'https://example.com/a'")
+    store.put("https://example.com/c", "c", "z" * 400)
+    assert store.get("https://example.com/a") is None
+    assert store.get("https://example.com/b") is not None
+    assert store.get("https://example.com/c") is not None
+
+
+def test_size_total_follows_writes(tmp_path):
+    store = ContentStore(str(tmp_path / "db.sqlite"), max_mb=None)
+
+    def totals():
+        kept = store.conn.execute("SELECT total FROM article_store_size").fetchone()[0]
+        summed = store.conn.execute("SELECT COALESCE(SUM(size), 0) FROM article_store").fetchone()[0]
+        return kept, summed
+
+    store.put("https://example.com/a", "<p>a</p>", "a" * 100)
+    store.put("https://example.com/b", "<p>b</p>", "b" * 200)
+    store.put("https://example.com/a", "<p>a</p>", "a" * 50)
+    store.update_text("https://example.com/b", "b" * 10)
+    kept, summed = totals()
+    assert kept == summed > 0
+
+    store.max_mb = 0
+    store.evict()
+    assert totals() == (0, 0)
+    reopened = ContentStore(str(tmp_path / "db.sqlite"), max_mb=None)
+    reopened.put("https://example.com/c", "<p>c</p>", "c")
+    assert reopened.conn.execute("SELECT total FROM article_store_size").fetchone()[0] == len(
+        reopened.conn.execute("SELECT raw FROM article_store").fetchone()[0]
+    ) + 1
+
+
+def test_size_total_is_seeded_from_an_older_store(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    store = ContentStore(path, max_mb=None)
+    store.put("https://example.com/a", "<p>a</p>", "a" * 100)
+    store.put("https://example.com/b", "<p>b</p>", "b" * 200)
+    for trigger in ("insert", "delete", "update"):
+        store.conn.execute(f"DROP TRIGGER article_store_size_{trigger}")
+    store.conn.execute("DROP TABLE article_store_size")
+    store.conn.commit()
+
+    reopened = ContentStore(path, max_mb=None)
+    assert not reopened.conn.in_transaction
+    reopened.put("https://example.com/c", "<p>c</p>", "c")
+    kept = reopened.conn.execute("SELECT total FROM article_store_size").fetchone()[0]
+    assert kept == reopened.conn.execute("SELECT SUM(size) FROM article_store").fetchone()[0]
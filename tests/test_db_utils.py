@@ -0,0 +1,116 @@
+import sys
+import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.db_utils import (
+    SCHEMA_VERSION,
+    check_and_store_changed,
+    check_and_store_many,
+    entry_hash,
+    init_db,
+    prune_seen_entries,
+    seen_stats,
+)
+from detectobot.core.seen_filter import SeenFilter
+
+
+def _v1_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE seen_entries (hash TEXT PRIMARY KEY, feed_name TEXT,"
+        " entry_title TEXT, entry_link TEXT, timestamp INTEGER)"
+    )
+    for i, (feed, link) in enumerate([("a", "https://example.com/1"), ("a", "https://example.com/2"),
+                                      ("b", "https://example.org/3")]):
+        conn.execute(
+            "INSERT INTO seen_entries VALUES (?, ?, 't', ?, ?)", (entry_hash({"link": link}), feed, link, i)
+        )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    return conn
+
+
+def test_migrates_hex_keys_to_blobs_and_interns_sources(tmp_path):
+    conn = _v1_db(tmp_path / "db.sqlite")
+    init_db(conn)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    rows = conn.execute(
+        "SELECT hash, name FROM seen_entries JOIN sources ON sources.id = source_id ORDER BY timestamp"
+    ).fetchall()
+    assert [(h.hex(), name) for h, name in rows] == [
+        (entry_hash({"link": "https://example.com/1"}), "a"),
+        (entry_hash({"link": "https://example.com/2"}), "a"),
+        (entry_hash({"link": "https://example.org/3"}), "b"),
+    ]
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'seen_entries'").fetchone()[0]
+    assert "WITHOUT ROWID" in sql
+    indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_seen_entries_timestamp", "idx_seen_entries_source"} <= indexes
+    assert check_and_store_many(conn, "a", [{"link": "https://example.com/1"}]) == []
+
+
+def test_concurrent_init_of_a_fresh_db(tmp_path):
+    path = tmp_path / "db.sqlite"
+    first, second = sqlite3.connect(path), sqlite3.connect(path)
+    # A current-layout table without the version stamp must not be taken for
+    # a legacy one (it has no feed_name column to migrate).
+    first.execute(
+        "CREATE TABLE seen_entries (hash BLOB PRIMARY KEY, source_id INTEGER,"
+        " entry_title TEXT, entry_link TEXT, timestamp INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    first.commit()
+    init_db(second)
+    init_db(first)
+
+    for conn in (first, second):
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert check_and_store_many(first, "a", [{"link": "https://example.com/1"}]) != []
+    assert check_and_store_many(second, "a", [{"link": "https://example.com/1"}]) == []
+
+
+def test_pruned_entries_stay_seen(tmp_path):
+    conn = _v1_db(tmp_path / "db.sqlite")
+    init_db(conn)
+
+    assert prune_seen_entries(conn, retention_days=1, now=86400 + 2) == 2
+    assert prune_seen_entries(conn, retention_days=1, now=86400 + 2) == 0
+    stats = seen_stats(conn)
+    assert (stats["entries"], stats["pruned"], stats["sources"]) == (3, 2, 2)
+    assert conn.execute("SELECT entry_link FROM seen_entries WHERE timestamp = 2").fetchone()[0]
+
+    entries = [{"link": "https://example.com/1"}, {"link": "https://example.com/new"}]
+    assert [e["link"] for e in check_and_store_many(conn, "a", entries)] == ["https://example.com/new"]
+
+
+def test_seen_filter_loads_blob_hashes(tmp_path):
+    conn = _v1_db(tmp_path / "db.sqlite")
+    init_db(conn)
+
+    seen = SeenFilter()
+    seen.load(conn)
+    assert entry_hash({"link": "https://example.org/3"}) in seen
+    assert entry_hash({"link": "https://example.org/4"}) not in seen
+
+
+def test_incremental_scan_checks_only_entries_missing_from_last_poll(tmp_path):
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    init_db(conn)
+    url = "https://example.com/feed"
+    first = [{"link": f"https://example.com/{i}"} for i in range(3)]
+
+    def poll(entries):
+        return [e["link"] for e in check_and_store_changed(conn, url, "f", entries, full_scan_every=2)]
+
+    assert poll(first) == [e["link"] for e in first]
+    # Forget an entry: incremental polls trust the mark and skip it...
+    conn.execute("DELETE FROM seen_entries WHERE hash = ?", (bytes.fromhex(entry_hash(first[0])),))
+    conn.commit()
+    assert poll([{"link": "https://example.com/new"}] + first) == ["https://example.com/new"]
+    assert poll([]) == []
+    assert poll(first) == []
+    # ...until the periodic full scan checks every entry again.
+    assert poll(first) == ["https://example.com/0"]
+    assert conn.execute("SELECT polls FROM scan_marks").fetchone()[0] == 0
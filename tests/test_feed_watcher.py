@@ -73,6 +73,23 @@ def test_load_config(tmp_path, monkeypatch):
     assert feeds == [("MyFeed", "http://example.com/rss")]
 
 
+class FakeResponse:
+    status_code = 200
+    content = b"<rss/>"
+    headers = {"ETag": '"v1"'}
+
+    def __init__(self, url):
+        self.url = url
+
+    def raise_for_status(self):
+        pass
+
+
+def fake_get(url, headers=None, accept=None):
+    assert accept == agent_feed_watcher.http_client.FEED_TYPES
+    return FakeResponse(url)
+
+
 def test_get_latest_article_links(monkeypatch):
     monkeypatch.setattr(
         agent_feed_watcher,
@@ -84,9 +101,11 @@ def test_get_latest_article_links(monkeypatch):
         def __init__(self, entries):
             self.entries = entries
 
-    def fake_parse(url):
+    def fake_parse(content, response_headers=None):
+        assert content == FakeResponse.content
         return FakeFeed([{"link": "https://example.com/local"}])
 
+    monkeypatch.setattr(agent_feed_watcher.http_client, "get", fake_get)
     monkeypatch.setattr(agent_feed_watcher.feedparser, "parse", fake_parse)
     links = agent_feed_watcher.get_latest_article_links()
     assert links == [{"name": "LocalFeed", "link": "https://example.com/local"}]
@@ -103,12 +122,19 @@ def test_get_new_article_links(monkeypatch, tmp_path):
         def __init__(self, entries):
             self.entries = entries
 
-    def fake_parse(url):
+    def fake_parse(content, response_headers=None):
         return FakeFeed([
             {"link": "https://example.com/new1", "title": "t"},
             {"link": "https://example.com/new2", "title": "t"},
         ])
 
+    requests = []
+
+    def recording_get(url, headers=None, accept=None):
+        requests.append(headers)
+        return fake_get(url, headers, accept)
+
+    monkeypatch.setattr(agent_feed_watcher.http_client, "get", recording_get)
     monkeypatch.setattr(agent_feed_watcher.feedparser, "parse", fake_parse)
 
     db_path = tmp_path / "db.sqlite"
@@ -122,3 +148,52 @@ def test_get_new_article_links(monkeypatch, tmp_path):
     # Second call should return empty list since entries are stored
     links = agent_feed_watcher.get_new_article_links(db_path=str(db_path))
     assert links == []
+    assert requests == [{}, {"If-None-Match": '"v1"'}]
+
+
+def test_check_and_store_many(tmp_path):
+    conn = feed_watcher.connect(str(tmp_path / "db.sqlite"))
+    init_db(conn)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    entries = [{"link": f"https://example.com/{i}"} for i in range(400)]
+    check_and_store(conn, entry_hash(entries[5]), "Test Feed", entries[5])
+    new = feed_watcher.check_and_store_many(conn, "Test Feed", entries + [entries[0]])
+    assert new == entries[:5] + entries[6:]
+    assert feed_watcher.check_and_store_many(conn, "Test Feed", entries) == []
+
+
+def test_seen_filter_skips_known_entries(tmp_path):
+    from detectobot.core.seen_filter import SeenFilter
+
+    conn = feed_watcher.connect(str(tmp_path / "db.sqlite"))
+    init_db(conn)
+    known = {"link": "https://example.com/known"}
+    check_and_store(conn, entry_hash(known), "Test Feed", known)
+
+    seen = SeenFilter(max_entries=2)
+    seen.load(conn)
+    assert entry_hash(known) in seen
+    fresh = [{"link": f"https://example.com/{i}"} for i in range(3)]
+    assert feed_watcher.check_and_store_many(conn, "Test Feed", [known] + fresh, seen) == fresh
+    # Bounded: only one more hash fits, the rest fall back to the database
+    assert len(seen) == 2
+    assert feed_watcher.check_and_store_many(conn, "Test Feed", fresh, seen) == []
+
+
+def test_unchanged_feed_body_is_not_reparsed(monkeypatch):
+    from detectobot.core import watcher as core_watcher
+
+    parsed = []
+
+    def counting_parse(content, response_headers=None):
+        parsed.append(content)
+        return types.SimpleNamespace(entries=[{"link": "https://example.com/a", "title": "a"}])
+
+    monkeypatch.setattr(core_watcher.http_client, "get", fake_get)
+    monkeypatch.setattr(sys.modules["feedparser"], "parse", counting_parse)
+    entries, validators = core_watcher._fetch_feed_entries("http://example.com/rss", None)
+    assert [e["link"] for e in entries] == ["https://example.com/a"]
+    assert validators["digest"]
+
+    assert core_watcher._fetch_feed_entries("http://example.com/rss", validators) == ([], validators)
+    assert len(parsed) == 1
@@ -0,0 +1,34 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.fetcher import fetch_all
+
+
+def test_fetch_all_preserves_order():
+    urls = [f"http://host{i % 3}.example/{i}" for i in range(12)]
+    assert fetch_all(urls, lambda u: u.upper(), max_workers=4) == [u.upper() for u in urls]
+    assert fetch_all(urls, lambda u: u.upper(), max_workers=1) == [u.upper() for u in urls]
+
+
+def test_fetch_all_respects_per_host_cap():
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def fetch(url):
+        host = url.split("/")[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+        return url
+
+    urls = [f"http://a.example/{i}" for i in range(6)] + [f"http://b.example/{i}" for i in range(6)]
+    fetch_all(urls, fetch, max_workers=8, per_host=2)
+    assert peak == {"a.example": 2, "b.example": 2}
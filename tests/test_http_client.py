@@ -0,0 +1,127 @@
+import gzip
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    connections = set()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with Handler.lock:
+            Handler.requests.append((self.path, dict(self.headers)))
+            Handler.connections.add(self.client_address)
+            attempts = sum(1 for path, _ in Handler.requests if path == self.path)
+        if self.path in GUARDED:
+            return GUARDED[self.path](self)
+        if self.path == "/flaky" and attempts == 1:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = gzip.compress(b"<html>ok</html>")
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _send(handler, content_type, body, length=True):
+    handler.send_response(200)
+    handler.send_header("Content-Type", content_type)
+    if length:
+        handler.send_header("Content-Length", str(len(body)))
+    else:
+        handler.send_header("Connection", "close")
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _trickle(handler):
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/html")
+    handler.send_header("Connection", "close")
+    handler.end_headers()
+    try:
+        for _ in range(50):
+            handler.wfile.write(b"<p>x</p>")
+            handler.wfile.flush()
+            time.sleep(0.1)
+    except OSError:
+        pass
+
+
+GUARDED = {
+    "/pdf": lambda h: _send(h, "application/pdf", b"%PDF-1.4"),
+    "/big": lambda h: _send(h, "text/html", b"x" * 3000),
+    "/big-unsized": lambda h: _send(h, "text/html", b"x" * 3000, length=False),
+    "/latin": lambda h: _send(h, "text/html", '<meta charset="iso-8859-1"><p>caf\xe9</p>'.encode("latin-1")),
+    "/slow": _trickle,
+}
+
+
+@pytest.fixture()
+def server(monkeypatch):
+    Handler.requests, Handler.connections = [], set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(http_client, "_session", http_client.build_session(retries=2, backoff=0.01))
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_shared_session_reuses_connections_and_decodes_gzip(server):
+    for _ in range(5):
+        resp = http_client.get(f"{server}/page")
+        assert resp.text == "<html>ok</html>"
+    assert len(Handler.connections) == 1
+    headers = Handler.requests[0][1]
+    assert headers["User-Agent"] == http_client.USER_AGENT
+    assert "gzip" in headers["Accept-Encoding"]
+
+
+def test_transient_errors_are_retried(server):
+    resp = http_client.get(f"{server}/flaky", headers={"If-None-Match": '"v1"'})
+    assert resp.status_code == 200
+    assert [path for path, _ in Handler.requests] == ["/flaky", "/flaky"]
+    assert Handler.requests[1][1]["If-None-Match"] == '"v1"'
+
+
+def test_downloads_are_bounded(server):
+    with pytest.raises(http_client.UnsupportedContentType):
+        http_client.get(f"{server}/pdf")
+    assert http_client.get(f"{server}/pdf", accept=("application/pdf",)).content == b"%PDF-1.4"
+    for path in ("/big", "/big-unsized"):
+        with pytest.raises(http_client.ContentTooLarge):
+            http_client.get(f"{server}{path}", max_bytes=1000)
+    started = time.monotonic()
+    with pytest.raises(http_client.DeadlineExceeded):
+        http_client.get(f"{server}/slow", deadline=0.5)
+    assert time.monotonic() - started < 2
+
+
+def test_charset_is_sniffed_from_meta(server):
+    assert "café" in http_client.get(f"{server}/latin").text
+
+
+def test_body_is_read_without_read1():
+    class Raw:  # urllib3 1.26 responses have stream() but no read1()
+        def stream(self, amt, decode_content=True):
+            yield from (b"<html>", b"ok</html>")
+
+    assert list(http_client._body_chunks(Raw())) == [b"<html>", b"ok</html>", b""]
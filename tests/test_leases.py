@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import watcher
+from detectobot.core.leases import ARTICLES, LeaseQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_queue(db_path, owner, clock, **kwargs):
+    return LeaseQueue(str(db_path), owner=owner, lease_seconds=60, batch=2, clock=clock, **kwargs)
+
+
+def test_workers_claim_disjoint_items_and_take_over_expired_leases(tmp_path):
+    clock = Clock()
+    a = make_queue(tmp_path / "w.db", "a", clock)
+    b = make_queue(tmp_path / "w.db", "b", clock)
+    a.sync("site", [(f"https://{i}/", {"url": f"https://{i}/"}) for i in range(3)])
+
+    first, second = a.claim("site"), b.claim("site")
+    assert [key for key, _ in first] == ["https://0/", "https://1/"]
+    assert [key for key, _ in second] == ["https://2/"]
+    assert b.claim("site") == []
+
+    # a polls one source and dies; its other lease expires and b takes it over.
+    assert a.ack("site", "https://0/", delay=600)
+    assert b.ack("site", "https://2/", delay=600)
+    clock.now = 61
+    assert [key for key, _ in b.claim("site")] == ["https://1/"]
+    assert not a.ack("site", "https://1/", delay=600)
+    assert b.counts("site") == {"available": 0, "leased": 1, "waiting": 2, "failed": 0}
+    assert b.ack("site", "https://1/", delay=600)
+
+    clock.now = 700
+    assert {key for key, _ in a.claim("site")} == {"https://0/", "https://2/"}
+
+
+def test_failed_articles_are_retried_up_to_max_attempts(tmp_path):
+    clock = Clock()
+    queue = make_queue(tmp_path / "w.db", "a", clock, max_attempts=2)
+    assert queue.offer(ARTICLES, [("https://x/1", {"link": "https://x/1"})]) == 1
+    assert queue.offer(ARTICLES, [("https://x/1", {"link": "https://x/1"})]) == 0
+
+    for _ in range(2):
+        [(key, item)] = queue.claim(ARTICLES)
+        queue.finish_article(dict(item, error=RuntimeError("boom")))
+    assert queue.claim(ARTICLES) == []
+    assert queue.counts(ARTICLES)["failed"] == 1
+
+
+def _run_worker(queue, db_path, processed):
+    for item in watcher.iter_leased_links(queue, ("site",), db_path, idle_seconds=0.01):
+        processed.append(item["link"])
+        queue.finish_article(item)
+    queue.flush()
+
+
+def test_leased_links_split_sources_and_articles_between_workers(tmp_path, monkeypatch):
+    sites = [{"name": f"s{i}", "url": f"https://s{i}.example/"} for i in range(4)]
+    polled = []
+
+    def fake_fetch(url, selector, cached, backend=None):
+        polled.append(url)
+        time.sleep(0.05)
+        return [f"{url}post-1", f"{url}post-2"], None
+
+    monkeypatch.setattr(watcher, "_fetch_site_links", fake_fetch)
+    monkeypatch.setattr(watcher, "watched_sources", lambda kinds: [("site", site) for site in sites])
+    db_path = str(tmp_path / "w.db")
+    queues = {name: make_queue(db_path, name, time.time) for name in "ab"}
+    processed = {"a": [], "b": []}
+    threads = [
+        threading.Thread(target=_run_worker, args=(queue, db_path, processed[name])) for name, queue in queues.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(polled) == sorted(site["url"] for site in sites)
+    links = processed["a"] + processed["b"]
+    assert len(links) == len(set(links)) == 8
+    assert processed["a"] and processed["b"]
+    assert queues["a"].counts(ARTICLES) == {"available": 0, "leased": 0, "waiting": 0, "failed": 0}
+
+
+def test_leases_of_a_dead_worker_are_taken_over(tmp_path, monkeypatch):
+    site = {"name": "s", "url": "https://s.example/"}
+    monkeypatch.setattr(watcher, "_fetch_site_links", lambda *args, **kwargs: (["https://s.example/post"], None))
+    monkeypatch.setattr(watcher, "watched_sources", lambda kinds: [("site", site)])
+    db_path = str(tmp_path / "w.db")
+    dead = LeaseQueue(db_path, owner="dead", lease_seconds=0.2)
+    dead.sync("site", [(site["url"], site)])
+    assert dead.claim("site")
+
+    # The live worker waits for the dead one's lease to expire instead of exiting.
+    live = LeaseQueue(db_path, owner="live", lease_seconds=60)
+    processed = []
+    _run_worker(live, db_path, processed)
+    assert processed == ["https://s.example/post"]
+    assert live.counts("site") == {"available": 0, "leased": 0, "waiting": 1, "failed": 0}
+
+
+def test_links_are_not_seen_unless_queued(tmp_path, monkeypatch):
+    site = {"name": "s", "url": "https://s.example/"}
+    monkeypatch.setattr(watcher, "_fetch_site_links", lambda *args, **kwargs: (["https://s.example/post"], None))
+    db_path = str(tmp_path / "w.db")
+    queue = make_queue(db_path, "a", Clock())
+
+    def crash(conn, items):
+        queue.offer(ARTICLES, [(item["link"], item) for item in items], conn=conn)
+        raise KeyboardInterrupt
+
+    try:
+        list(watcher.iter_new_site_links(db_path, sites=[site], on_new=crash))
+    except KeyboardInterrupt:
+        pass
+    # Neither the seen row nor the article survived, so the next poll finds the link again.
+    assert queue.counts(ARTICLES)["available"] == 0
+    assert list(watcher.iter_new_site_links(db_path, sites=[site])) == [{"name": "s", "link": "https://s.example/post"}]
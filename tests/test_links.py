@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import bs4
+import pytest
+
+from detectobot.core.links import extract_links
+
+# Other test modules replace bs4 in sys.modules with a stub; BeautifulSoup's
+# CSS support imports from bs4 lazily, so put the real module back.
+_real_bs4 = bs4
+
+
+@pytest.fixture(autouse=True)
+def real_bs4(monkeypatch):
+    monkeypatch.setitem(sys.modules, "bs4", _real_bs4)
+
+PAGE = """<?xml version="1.0" encoding="utf-8"?>
+<html><body>
+<nav><a href="/tag/x">tag</a></nav>
+<article><h2><a href="/post-1/">One</a></h2><a class="author" href="/author/a">a</a></article>
+<article><h2><a href="https://example.com/post-2?utm_source=rss">Two</a></h2><a>no href</a></article>
+</body></html>"""
+
+
+def test_backends_agree():
+    for selector in ["a", "h2 a", "article a", "a[href]", "a.author", "nav > a"]:
+        assert extract_links(PAGE, selector, "lxml") == extract_links(PAGE, selector, "bs4")
+
+
+def test_selector_results():
+    assert extract_links(PAGE, "h2 a") == ["/post-1/", "https://example.com/post-2?utm_source=rss"]
+    assert extract_links("", "a") == []
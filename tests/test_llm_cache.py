@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from pydantic import BaseModel
+
+from detectobot.core.llm_cache import LLMCache, cache_key
+
+
+class Output(BaseModel):
+    summary: str
+
+
+class OtherOutput(BaseModel):
+    summary: str
+    extra: int
+
+
+def test_cache_key_components():
+    base = cache_key("Some  article\ntext", "prompt", "gpt-4o", Output)
+    assert base == cache_key("Some article text ", "prompt", "gpt-4o", Output)
+    assert base != cache_key("Some article text", "other prompt", "gpt-4o", Output)
+    assert base != cache_key("Some article text", "prompt", "gpt-4o-mini", Output)
+    assert base != cache_key("Some article text", "prompt", "gpt-4o", OtherOutput)
+
+
+def test_round_trip_and_lru_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path / "db.sqlite"), max_entries=2)
+    cache.put("a", "m", Output(summary="A"))
+    cache.put("b", "m", Output(summary="B"))
+    assert cache.get("a", Output) == Output(summary="A")
+    cache.conn.execute("UPDATE llm_cache SET last_used = 0 WHERE key = 'b'")
+    cache.put("c", "m", Output(summary="C"))
+    assert cache.get("b", Output) is None
+    assert cache.get("c", Output) == Output(summary="C")
+
+
+def test_pool_looks_each_text_up_once(tmp_path, monkeypatch):
+    from detectobot.agents import summarizer
+    from detectobot.core.metrics import LLM_CACHE
+
+    cache = LLMCache(str(tmp_path / "db.sqlite"))
+    spec = summarizer.DetectionSpec(
+        article_title="t", publication_date="", threat_actor=None, ttps=[], prerequisites=[], notes="", status="draft"
+    )
+    calls = []
+    monkeypatch.setattr(summarizer, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(summarizer, "get_agent", lambda system_prompt: None)
+    monkeypatch.setattr(
+        summarizer,
+        "_run_agent",
+        lambda agent, text: calls.append(text) or spec,
+    )
+    LLM_CACHE.clear()
+    pool = summarizer.analysis_pool()
+    assert pool.analyze_one("article") == spec
+    assert pool.analyze_one("article") == spec
+    assert len(calls) == 1
+    assert LLM_CACHE.value(result="miss") == 1
+    assert LLM_CACHE.value(result="hit") == 1
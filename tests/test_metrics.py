@@ -0,0 +1,56 @@
+import json
+import sqlite3
+import sys
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import metrics
+from detectobot.core.db_utils import check_and_store_many, init_db
+from detectobot.core.metrics import Registry, start_metrics_server
+
+
+def test_prometheus_text_and_json():
+    registry = Registry()
+    fetches = registry.counter("fetches_total", "Fetches")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    fetches.inc(host="a.example")
+    fetches.inc(2, host="a.example")
+    latency.observe(0.05, host='b"x')
+    latency.observe(5, host='b"x')
+
+    text = registry.render_prometheus()
+    assert "# TYPE fetches_total counter" in text
+    assert 'fetches_total{host="a.example"} 3' in text
+    assert 'latency_seconds_bucket{host="b\\"x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{host="b\\"x",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{host="b\\"x"} 2' in text
+
+    data = registry.to_json()
+    assert data["fetches_total"]["series"] == [{"labels": {"host": "a.example"}, "value": 3}]
+    assert data["latency_seconds"]["series"][0]["buckets"] == {"0.1": 1, "1.0": 0, "+Inf": 1}
+
+
+def test_metrics_endpoint():
+    registry = Registry()
+    registry.counter("up_total", "Up").inc()
+    server = start_metrics_server(0, registry=registry)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        assert "up_total 1" in urllib.request.urlopen(f"{base}/metrics").read().decode()
+        assert json.loads(urllib.request.urlopen(f"{base}/metrics.json").read())["up_total"]["series"]
+    finally:
+        server.shutdown()
+
+
+def test_check_and_store_counts_new_and_seen():
+    metrics.REGISTRY.reset()
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    entries = [{"link": "https://example.com/a"}, {"link": "https://example.com/b"}]
+    check_and_store_many(conn, "feed", entries)
+    check_and_store_many(conn, "feed", entries + [{"link": "https://example.com/c"}])
+    assert metrics.LINKS.value(result="new") == 3
+    assert metrics.LINKS.value(result="seen") == 2
+    assert metrics.DB_SECONDS.count(op="check_and_store") == 2
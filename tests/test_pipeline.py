@@ -0,0 +1,58 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.pipeline import Stage, run_pipeline
+
+
+def test_first_result_arrives_before_discovery_finishes():
+    release = threading.Event()
+
+    def source():
+        yield {"name": "s", "link": "https://example.com/1"}
+        assert release.wait(5)
+        yield {"name": "s", "link": "https://example.com/2"}
+
+    results = run_pipeline(source(), [Stage("fetch", lambda item: dict(item, text="t"), 2)])
+    first = next(results)
+    assert first["link"] == "https://example.com/1"
+    release.set()
+    assert [item["link"] for item in results] == ["https://example.com/2"]
+
+
+def test_errors_are_recorded_and_skip_later_stages():
+    def fetch(item):
+        if item["link"].endswith("bad"):
+            raise ValueError("boom")
+        return dict(item, text="ok")
+
+    analyzed = []
+
+    def analyze(item):
+        analyzed.append(item["link"])
+        return dict(item, result=item["text"].upper())
+
+    source = [{"name": "s", "link": "https://example.com/good"}, {"name": "s", "link": "https://example.com/bad"}]
+    items = {item["link"]: item for item in run_pipeline(source, [Stage("fetch", fetch, 2), Stage("analyze", analyze)])}
+    assert items["https://example.com/good"]["result"] == "OK"
+    bad = items["https://example.com/bad"]
+    assert bad["stage"] == "fetch" and isinstance(bad["error"], ValueError)
+    assert analyzed == ["https://example.com/good"]
+
+
+def test_discovery_is_backpressured_by_queue_size():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield {"name": "s", "link": str(i)}
+
+    results = run_pipeline(source(), [Stage("fetch", lambda item: item)], queue_size=2)
+    next(results)
+    # discovery queue + fetch worker + output queue bound what can be in flight
+    threading.Event().wait(0.2)
+    assert len(produced) <= 8
+    assert len(list(results)) == 99
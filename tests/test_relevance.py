@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core.pipeline import Stage, run_pipeline
+from detectobot.core.relevance import RelevanceFilter, score_text, url_verdict
+
+INTEL = (
+    "The threat actor gained initial access through a phishing email carrying an ISO loader. "
+    "The payload dropped a Cobalt Strike beacon, dumped LSASS with Mimikatz and used PsExec for "
+    "lateral movement (T1021.002) before deploying ransomware. Indicators of compromise and Sigma "
+    "rules for detection are listed below. "
+) * 8
+NAV = "Home About Careers Contact. Our team writes about engineering culture and product design. " * 20
+
+
+def test_url_verdict():
+    site = {"url": "https://posts.example.io/", "deny": [r"/membership"]}
+    assert url_verdict("https://posts.example.io/hunting-lsass-abc123", site)[0]
+    assert not url_verdict("https://posts.example.io/", site)[0]
+    assert not url_verdict("https://posts.example.io/tagged/red-team", site)[0]
+    assert not url_verdict("https://posts.example.io/@someone", site)[0]
+    assert not url_verdict("https://posts.example.io/membership", site)[0]
+    assert not url_verdict("https://posts.example.io/page/2/", site)[0]
+    # An allow list replaces the heuristics.
+    allow = {"allow": [r"/\d{4}/\d{2}/"]}
+    assert url_verdict("https://blog.example.com/2024/05/page/", allow)[0]
+    assert not url_verdict("https://blog.example.com/some-post", allow)[0]
+
+
+def test_score_text_prefers_intel():
+    intel, counts = score_text(INTEL)
+    assert counts["attack-id"] == 8 and counts["cobalt strike"] == 8
+    assert intel > 30
+    assert score_text(NAV)[0] < 6
+
+
+def test_filter_skips_and_records(tmp_path):
+    relevance = RelevanceFilter(str(tmp_path / "db.sqlite"), sources=[{"name": "s", "url": "https://s.example/"}])
+    pages = {"https://s.example/post-1": INTEL, "https://s.example/post-2": NAV, "https://s.example/post-3": "short"}
+    analyzed = []
+
+    def analyze(item):
+        analyzed.append(item["link"])
+        return dict(item, result="ok")
+
+    items = [{"name": "s", "link": link} for link in [*pages, "https://s.example/tag/apt"]]
+    stages = [
+        Stage("triage-url", relevance.check_url),
+        Stage("fetch", lambda item: dict(item, text=pages[item["link"]])),
+        Stage("triage-text", relevance.check_text),
+        Stage("analyze", analyze),
+    ]
+    out = {item["link"]: item for item in run_pipeline(items, stages)}
+
+    assert analyzed == ["https://s.example/post-1"]
+    assert out["https://s.example/tag/apt"]["skipped"].startswith("dropped by URL")
+    assert out["https://s.example/post-3"]["skipped"] == "parked: 1 words"
+    decisions = {url: decision for url, _, _, decision, *_ in relevance.decisions()}
+    assert decisions == {
+        "https://s.example/post-1": "pass",
+        "https://s.example/post-2": "park",
+        "https://s.example/post-3": "park",
+        "https://s.example/tag/apt": "drop",
+    }
@@ -0,0 +1,109 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from detectobot.agents.summarizer import DetectionSpec, _run_agent, with_source_url
+from detectobot.core.metrics import LLM_REPAIRS, LLM_RETRIES
+from detectobot.core.repair import Repairable, repair
+
+SPEC = {
+    "article_title": "Report",
+    "source_url": "see the link above",
+    "publication_date": "2024-01-01",
+    "threat_actor": None,
+    "ttps": [
+        {
+            "tactic": "Execution",
+            "technique": "T1059",
+            "description": "PowerShell",
+            "detectability_confidence": "high",
+            "confidence_reason": "specific command line",
+            "sigma_stub": {
+                "title": "Encoded PowerShell",
+                "id": "1",
+                "logsource": {"product": "windows", "category": "process_creation"},
+                "detection": {"selection": {"EventID": 4688}, "timeframe": 5, "keywords": None},
+                "condition": "selection",
+                "tags": "attack.t1059.001",
+            },
+            "validation": [],
+            "falsepositive_notes": None,
+        }
+    ],
+    "prerequisites": [],
+    "notes": ["first", "second"],
+    "status": "draft",
+}
+
+
+class Item(BaseModel):
+    name: str
+
+
+class Plain(BaseModel):
+    title: str
+    count: str
+    tags: list[str]
+    items: list[Item] = []
+
+
+class Output(Repairable, Plain):
+    pass
+
+
+def test_repair_coerces_and_fills_fields():
+    data = {"title": "t", "count": 3, "items": [{"name": 1}]}
+    errors = []
+    try:
+        Plain.model_validate(data)
+    except ValidationError as exc:
+        errors = exc.errors()
+    fixed, fixes = repair(Plain, data, errors)
+    assert fixed == {"title": "t", "count": "3", "tags": [], "items": [{"name": "1"}]}
+    assert sorted(fixes) == [("count", "string_type"), ("items.name", "string_type"), ("tags", "missing")]
+    assert data["count"] == 3
+
+
+def test_unfixable_output_still_fails():
+    LLM_REPAIRS.clear()
+    with pytest.raises(ValidationError) as info:
+        Output.model_validate({"count": 3, "tags": []})
+    assert [e["loc"] for e in info.value.errors()] == [("title",), ("count",)]
+    assert LLM_REPAIRS.to_json() == []
+
+
+def test_detection_spec_is_repaired_locally():
+    LLM_REPAIRS.clear()
+    spec = DetectionSpec.model_validate_json(json.dumps(SPEC))
+    stub = spec.ttps[0].sigma_stub
+    assert spec.source_url is None and spec.notes == "first\nsecond"
+    assert stub.detection == {"selection": {"EventID": 4688}, "timeframe": "5", "keywords": ""}
+    assert stub.tags == ["attack.t1059.001"] and stub.falsepositives == []
+    assert LLM_REPAIRS.value(schema="DetectionSpec", field="ttps.sigma_stub.tags", error="list_type") == 1
+    assert "source_url" not in json.dumps(DetectionSpec.model_json_schema())
+    assert str(with_source_url(spec, "https://example.com/post").source_url) == "https://example.com/post"
+
+
+def test_only_unrepairable_output_is_re_requested(monkeypatch):
+    monkeypatch.setenv("PYDANTIC_AI_NO_BANNER", "1")
+    from pydantic_ai import Agent
+    from pydantic_ai.messages import ModelResponse, ToolCallPart
+    from pydantic_ai.models.function import FunctionModel
+
+    replies = [{k: v for k, v in SPEC.items() if k != "article_title"}, SPEC, SPEC]
+    calls = []
+
+    def model(messages, info):
+        calls.append(len(messages))
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, json.dumps(replies[len(calls) - 1]))])
+
+    LLM_RETRIES.clear()
+    agent = Agent(FunctionModel(model), output_type=DetectionSpec)
+    assert _run_agent(agent, "text").article_title == "Report"
+    assert len(calls) == 2
+    assert LLM_RETRIES.to_json()[0]["value"] == 1
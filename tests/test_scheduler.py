@@ -0,0 +1,105 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import watcher
+from detectobot.core.daemon import watch
+from detectobot.core.pipeline import Stage
+from detectobot.core.scheduler import PollScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(clock, sources):
+    return PollScheduler(sources, interval=600, min_interval=60, max_interval=3600, jitter=0, clock=clock)
+
+
+def test_intervals_adapt_to_publish_rate_and_failures():
+    clock = Clock()
+    busy, quiet, broken = {"url": "https://a/"}, {"url": "https://b/"}, {"url": "https://c/"}
+    scheduler = make_scheduler(clock, [("site", busy), ("site", quiet), ("feed", broken)])
+    assert len(scheduler.due()) == 3
+
+    scheduler.record("site", busy, 3)
+    scheduler.record("site", quiet, 0)
+    scheduler.record("feed", broken, None)
+    states = scheduler.states
+    assert states[("site", "https://a/")].next_due == 300
+    assert states[("site", "https://b/")].next_due == 900
+    assert states[("feed", "https://c/")].next_due == 1200
+    assert scheduler.seconds_until_due() == 300
+
+    clock.now = 300
+    assert [state.source for state in scheduler.due()] == [busy]
+    for _ in range(10):
+        scheduler.record("site", busy, 1)
+        scheduler.record("feed", broken, None)
+    assert states[("site", "https://a/")].interval == 60
+    assert states[("feed", "https://c/")].next_due == 300 + 3600
+
+
+def test_watch_polls_only_due_sources(tmp_path, monkeypatch):
+    fetched = []
+
+    def fake_fetch(url, selector, cached, backend=None):
+        fetched.append(url)
+        if "busy" in url:
+            return [f"{url}post-{len(fetched)}"], None
+        return [f"{url}post"], None
+
+    monkeypatch.setattr(watcher, "_fetch_site_links", fake_fetch)
+    clock = Clock()
+    sites = [{"name": "busy", "url": "https://busy.example/"}, {"name": "quiet", "url": "https://quiet.example/"}]
+    scheduler = make_scheduler(clock, [("site", site) for site in sites])
+    emitted = []
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    watch(scheduler, [Stage("fetch", lambda item: item)], emitted.append, tmp_path / "w.db", cycles=3, sleep=sleep)
+    # t=0 both publish; t=300 only busy publishes, so quiet backs off past t=450.
+    assert fetched.count("https://busy.example/") == 3
+    assert fetched.count("https://quiet.example/") == 2
+    assert len(emitted) == 4
+
+
+def test_watch_backs_off_sources_whose_poll_raised(tmp_path, monkeypatch):
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(watcher, "_fetch_site_links", lambda url, selector, cached, backend=None: ([url + "post"], None))
+    monkeypatch.setattr(watcher, "_check_and_store", locked)
+    clock = Clock()
+    site = {"name": "a", "url": "https://a.example/"}
+    scheduler = make_scheduler(clock, [("site", site)])
+    slept, emitted = [], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    watch(scheduler, [Stage("fetch", lambda item: item)], emitted.append, tmp_path / "w.db", cycles=2, sleep=sleep)
+    assert slept == [1200]
+    assert scheduler.states[("site", "https://a.example/")].failures == 2
+    assert [item["stage"] for item in emitted] == ["discover", "discover"]
+
+
+def test_sync_keeps_adapted_state_and_adds_new_sources():
+    clock = Clock()
+    a, b = {"url": "https://a/"}, {"url": "https://b/"}
+    scheduler = make_scheduler(clock, [("site", a)])
+    scheduler.record("site", a, 0)
+    scheduler.sync([("site", dict(a, selector="h2 a")), ("site", b)])
+    assert scheduler.states[("site", "https://a/")].interval == 900
+    assert scheduler.states[("site", "https://a/")].source["selector"] == "h2 a"
+    assert [state.source for state in scheduler.due()] == [b]
+    scheduler.sync([("site", b)])
+    assert list(scheduler.states) == [("site", "https://b/")]
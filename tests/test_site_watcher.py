@@ -5,20 +5,18 @@ import types
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-# Provide simple stubs for requests and yaml
-requests_stub = types.ModuleType("requests")
-
+# Provide simple stubs for HTTP and yaml
 def _fake_get(url, headers=None, timeout=10):
     class Resp:
+        status_code = 200
+        headers = {}
         def __init__(self, text):
             self.text = text
+            self.content = text.encode("utf-8")
         def raise_for_status(self):
             pass
     return Resp(_fake_get.html)
 
-requests_stub.get = _fake_get
-sys.modules["requests"] = requests_stub
-
 bs4_stub = types.ModuleType("bs4")
 
 class _Tag:
@@ -30,7 +28,7 @@ class _Tag:
 
 
 class BeautifulSoup:
-    def __init__(self, html, parser):
+    def __init__(self, html, parser, parse_only=None):
         import re
         self._links = re.findall(r"href=['\"]([^'\"]+)['\"]", html)
 
@@ -38,6 +36,7 @@ class BeautifulSoup:
         return [_Tag(h) for h in self._links]
 
 bs4_stub.BeautifulSoup = BeautifulSoup
+bs4_stub.SoupStrainer = lambda name: None
 sys.modules["bs4"] = bs4_stub
 
 yaml_stub = types.ModuleType("yaml")
@@ -46,10 +45,15 @@ def _yaml_load(stream):
     text = stream.read() if hasattr(stream, "read") else stream
     lines = [line.rstrip() for line in text.splitlines()]
     sites = []
+    top = {}
     current = None
     for line in lines:
         if line.startswith("sites:"):
             continue
+        if line and not line.startswith(" "):
+            key, value = line.split(":", 1)
+            top[key.strip()] = value.strip()
+            continue
         if line.startswith("  - "):
             if current:
                 sites.append(current)
@@ -63,19 +67,27 @@ def _yaml_load(stream):
             current[key.strip()] = value.strip()
     if current:
         sites.append(current)
-    return {"sites": sites}
+    return {**top, "sites": sites}
 
 yaml_stub.safe_load = _yaml_load
 sys.modules["yaml"] = yaml_stub
 
+import pytest
+
 from detectobot import feed_watcher
 from detectobot.agents import site_watcher
+from detectobot.core import http_client
 
 entry_hash = feed_watcher.entry_hash
 check_and_store = feed_watcher.check_and_store
 init_db = feed_watcher.init_db
 
 
+@pytest.fixture(autouse=True)
+def _stub_http(monkeypatch):
+    monkeypatch.setattr(http_client, "get", _fake_get)
+
+
 def test_load_config(monkeypatch, tmp_path):
     cfg = tmp_path / "cfg.yaml"
     cfg.write_text(
@@ -93,7 +105,7 @@ def test_get_new_article_links(monkeypatch, tmp_path):
     )
     monkeypatch.setattr(site_watcher, "CONFIG_PATH", str(cfg))
 
-    html = "<html><body><a href='p1'>1</a><a href='p2'>2</a></body></html>"
+    html = "<html><body><a href='p1'>1</a><a href='http://x.com:abc/'>bad</a><a href='p2'>2</a></body></html>"
     _fake_get.html = html
 
     db_path = tmp_path / "db.sqlite"
@@ -106,3 +118,58 @@ def test_get_new_article_links(monkeypatch, tmp_path):
     # second call should return empty
     links = site_watcher.get_new_article_links(db_path=str(db_path))
     assert links == []
+
+
+def test_unchanged_page_is_not_reparsed(monkeypatch, tmp_path):
+    cfg = tmp_path / "cfg.yaml"
+    cfg.write_text(
+        "link_parser: bs4\nsites:\n  - name: Example\n    url: http://example.com\n    selector: a\n"
+    )
+    monkeypatch.setattr(site_watcher, "CONFIG_PATH", str(cfg))
+    _fake_get.html = "<html><body><a href='p1'>1</a></body></html>"
+    parsed = []
+
+    real_extract_links = site_watcher.extract_links
+
+    def counting_extract_links(html, selector, backend):
+        assert backend == "bs4"
+        parsed.append(html)
+        return real_extract_links(html, selector, backend)
+
+    monkeypatch.setattr(site_watcher, "extract_links", counting_extract_links)
+
+    db_path = tmp_path / "db.sqlite"
+    site_watcher.get_new_article_links(db_path=str(db_path))
+    assert len(parsed) == 1
+    assert site_watcher.get_new_article_links(db_path=str(db_path)) == []
+    assert len(parsed) == 1
+
+    # A changed body is parsed again
+    _fake_get.html = "<html><body><a href='p1'>1</a><a href='p3'>3</a></body></html>"
+    links = site_watcher.get_new_article_links(db_path=str(db_path))
+    assert links == [{"name": "Example", "link": "http://example.com/p3"}]
+    assert len(parsed) == 2
+
+
+def test_links_listed_last_poll_are_not_checked_again(monkeypatch, tmp_path):
+    cfg = tmp_path / "cfg.yaml"
+    cfg.write_text(
+        "link_parser: bs4\nsites:\n  - name: Example\n    url: http://example.com\n    selector: a\n"
+    )
+    monkeypatch.setattr(site_watcher, "CONFIG_PATH", str(cfg))
+    checked = []
+    real_check = site_watcher.check_and_store_many
+
+    def recording_check(conn, name, entries, *args, **kwargs):
+        checked.append([entry["link"] for entry in entries])
+        return real_check(conn, name, entries, *args, **kwargs)
+
+    monkeypatch.setattr("detectobot.core.db_utils.check_and_store_many", recording_check)
+    db_path = tmp_path / "db.sqlite"
+
+    _fake_get.html = "<a href='p1'>1</a><a href='p2'>2</a>"
+    assert len(site_watcher.get_new_article_links(db_path=str(db_path))) == 2
+    _fake_get.html = "<a href='p3'>3</a><a href='p1'>1</a><a href='p2'>2</a>"
+    links = site_watcher.get_new_article_links(db_path=str(db_path))
+    assert links == [{"name": "Example", "link": "http://example.com/p3"}]
+    assert checked == [["http://example.com/p1", "http://example.com/p2"], ["http://example.com/p3"]]
@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from pydantic import BaseModel
+
+from detectobot.core.spec_store import SpecStore, attack_id, main
+
+
+class Stub(BaseModel):
+    article_title: str
+    threat_actor: str | None
+    status: str
+    ttps: list[dict]
+
+
+def _ttp(technique, category, subtechnique=None, tactic="Execution"):
+    return {
+        "tactic": tactic,
+        "technique": technique,
+        "subtechnique": subtechnique,
+        "description": f"{technique} seen",
+        "sigma_stub": {
+            "title": f"Detect {technique}",
+            "id": technique,
+            "logsource": {"category": category, "product": "windows"},
+            "detection": {"selection": {"Image|endswith": "\\powershell.exe"}},
+            "condition": "selection",
+            "tags": [],
+            "falsepositives": [],
+        },
+    }
+
+
+def test_attack_id_normalization():
+    assert attack_id("T1059 - Command and Scripting Interpreter") == "T1059"
+    assert attack_id("t1059", "001 PowerShell") == "T1059.001"
+    assert attack_id("T1059", "T1059.003") == "T1059.003"
+    assert attack_id("Phishing") is None
+
+
+def test_queries_use_normalized_tables(tmp_path):
+    store = SpecStore(str(tmp_path / "db.sqlite"))
+    store.put("https://example.com/a?utm_source=x", Stub(
+        article_title="A", threat_actor="APT29", status="ready",
+        ttps=[_ttp("T1059", "process_creation", "001"), _ttp("T1566", "email", tactic="Initial Access")],
+    ))
+    store.put("https://example.com/b", Stub(
+        article_title="B", threat_actor="apt29 ", status="draft", ttps=[_ttp("T1059.003", "process_creation")],
+    ))
+    store.put("https://example.com/c", Stub(article_title="C", threat_actor=None, status="draft", ttps=[]))
+
+    assert sorted(s["title"] for s in store.iter_specs(technique="T1059")) == ["A", "B"]
+    assert [s["title"] for s in store.iter_specs(technique="T1059.001")] == ["A"]
+    assert [s["url"] for s in store.iter_specs(tactic="initial access")] == ["https://example.com/a"]
+    assert sorted(s["title"] for s in store.iter_specs(actor="APT29")) == ["A", "B"]
+    assert store.conn.execute("SELECT COUNT(*) FROM threat_actors").fetchone()[0] == 1
+    assert sorted(r["id"] for r in store.iter_sigma(category="PROCESS_CREATION")) == ["T1059", "T1059.003"]
+
+    # Storing an article again replaces its TTPs.
+    store.put("https://example.com/a", Stub(article_title="A2", threat_actor=None, status="ready", ttps=[]))
+    assert [s["title"] for s in store.iter_specs(technique="T1059")] == ["B"]
+
+    plan = " ".join(row[-1] for row in store.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT spec_id FROM ttps WHERE logsource_id = 1"
+    ))
+    assert "idx_ttps_logsource" in plan
+
+
+def test_sigma_rules_and_jsonl_export(tmp_path):
+    db = str(tmp_path / "db.sqlite")
+    store = SpecStore(db)
+    store.put("https://example.com/a", Stub(
+        article_title="A", threat_actor=None, status="ready",
+        ttps=[_ttp("T1059", "process_creation"), _ttp("T1566", "email")],
+    ))
+    rules = list(store.iter_sigma())
+    assert [r["logsource"]["category"] for r in rules] == ["process_creation", "email"]
+    assert rules[0]["detection"]["condition"] == "selection"
+    assert rules[0]["references"] == ["https://example.com/a"]
+
+    out = tmp_path / "specs.jsonl"
+    main(["--db", db, "export", "--technique", "T1566", "-o", str(out)])
+    lines = out.read_text().splitlines()
+    assert len(lines) == 1 and '"url": "https://example.com/a"' in lines[0]
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+HEAVY = ("pydantic_ai", "openai", "readability", "feedparser", "bs4", "lxml", "requests")
+
+
+def test_agent_imports_defer_heavy_dependencies():
+    code = (
+        "import sys\n"
+        "import detectobot.agents.summarizer, detectobot.agents.detection_agent\n"
+        f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+    )
+    # Third-party pydantic plugins (e.g. logfire) import their own dependencies.
+    env = dict(os.environ, PYTHONPATH=str(SRC), PYDANTIC_DISABLE_PLUGINS="__all__")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert proc.stdout.strip() == ""
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from detectobot.core import textprep
+from detectobot.core.textprep import clean_text, count_tokens, map_reduce, split_chunks
+
+
+def test_clean_text_strips_boilerplate_and_duplicates():
+    text = "\n".join([
+        "Skip to content",
+        "Menu",
+        "The actor used rundll32 to load a DLL.",
+        "",
+        "Share on Twitter",
+        "The actor used  rundll32 to load a DLL.",
+        "Persistence was set via a Run key.",
+        "3 Comments",
+        "Great write-up, thanks!",
+    ])
+    assert clean_text(text) == "The actor used rundll32 to load a DLL.\nPersistence was set via a Run key."
+
+
+def test_response_sections_are_kept():
+    text = "\n".join([
+        "Initial access came through a phishing email.",
+        "Response",
+        "The SOC isolated the host and reset credentials.",
+        "Comments",
+        "Lessons learned are listed below.",
+        "Logging gaps delayed triage.",
+        "Comments",
+        "Nice post!",
+    ])
+    assert clean_text(text).splitlines() == [
+        "Initial access came through a phishing email.",
+        "Response",
+        "The SOC isolated the host and reset credentials.",
+        "Comments",
+        "Lessons learned are listed below.",
+        "Logging gaps delayed triage.",
+    ]
+
+
+def test_split_chunks_respects_budget():
+    paragraphs = [f"Paragraph {i} describes step {i} of the intrusion in detail." for i in range(40)]
+    paragraphs.append(" ".join(f"Sentence {i} is long enough to matter." for i in range(60)))
+    chunks = split_chunks("\n".join(paragraphs), budget=80)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 80 for chunk in chunks)
+    assert "Paragraph 0" in chunks[0] and "Sentence 59" in chunks[-1]
+
+
+def test_map_reduce_only_chunks_long_text(monkeypatch):
+    monkeypatch.setattr(textprep, "_encoder", lambda name: None)
+    calls = []
+
+    def analyze(chunk):
+        calls.append(chunk)
+        return [len(chunk)]
+
+    def merge(partials):
+        return [n for partial in partials for n in partial]
+
+    assert map_reduce("short", analyze, merge, budget=100) == [5]
+    long_text = "\n".join("x" * 200 for _ in range(5))
+    assert len(map_reduce(long_text, analyze, merge, budget=60)) == 5
+    assert len(calls) == 6
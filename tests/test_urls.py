@@ -0,0 +1,74 @@
+import sys
+import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import pytest
+
+from detectobot.core.urls import absolute_links, absolute_url, canonicalize_url, url_key
+from detectobot.core.db_utils import entry_hash, init_db
+
+
+def test_canonicalize_url_strips_noise():
+    assert canonicalize_url("../post/?utm_source=x&b=2&a=1#top", base="HTTP://Example.com:80/blog/") == (
+        "http://example.com/post?a=1&b=2"
+    )
+
+
+def test_per_host_rules():
+    rules = {"hosts": {"posts.example.io": {"strip_params": ["source"]}}}
+    assert canonicalize_url("https://posts.example.io/p?source=rss", rules=rules) == "https://posts.example.io/p"
+    assert canonicalize_url("https://other.io/p?source=rss", rules=rules) == "https://other.io/p?source=rss"
+
+
+def test_netloc_is_preserved():
+    assert canonicalize_url("http://[::1]:8080/a") == "http://[::1]:8080/a"
+    assert canonicalize_url("https://[2001:DB8::1]/a/") == "https://[2001:db8::1]/a"
+    assert canonicalize_url("https://user:pw@Example.com/a") == "https://user:pw@example.com/a"
+    assert canonicalize_url("https://user@example.com/a") == "https://user@example.com/a"
+
+
+def test_malformed_links_are_skipped():
+    for bad in ("http://x.com:abc/", "http://[bad/x"):
+        with pytest.raises(ValueError):
+            canonicalize_url(bad)
+        with pytest.raises(ValueError):
+            absolute_url(bad)
+    found = ["/a", "http://x.com:abc/", "http://[bad/x", "/b/"]
+    assert absolute_links(found, base="https://example.com/") == ["https://example.com/a", "https://example.com/b/"]
+
+
+def test_links_are_fetched_as_found():
+    link = "https://a.com/x/?q=a%20b&flag&path=%2Fz&utm_source=rss"
+    assert absolute_url(link) == link
+    assert absolute_url("../x/?flag", base="https://a.com/blog/") == "https://a.com/x/?flag"
+    assert url_key(link) == "https://a.com/x?flag=&path=%2Fz&q=a+b"
+
+
+def test_variants_share_a_hash():
+    variants = [
+        "https://example.com/a",
+        "http://example.com/a/",
+        "https://example.com/a?utm_campaign=feed#comments",
+    ]
+    assert {url_key(v) for v in variants} == {"https://example.com/a"}
+    assert len({entry_hash({"link": v}) for v in variants}) == 1
+
+
+def test_init_db_rekeys_legacy_rows(tmp_path):
+    import hashlib
+
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    conn.execute(
+        "CREATE TABLE seen_entries (hash TEXT PRIMARY KEY, feed_name TEXT,"
+        " entry_title TEXT, entry_link TEXT, timestamp INTEGER)"
+    )
+    for i, link in enumerate(["http://example.com/a/", "https://example.com/a#x", "https://example.com/b"]):
+        raw = hashlib.sha256(link.encode("utf-8")).hexdigest()
+        conn.execute("INSERT INTO seen_entries VALUES (?, 'f', NULL, ?, ?)", (raw, link, i))
+    conn.commit()
+
+    init_db(conn)
+    hashes = {h.hex() for (h,) in conn.execute("SELECT hash FROM seen_entries")}
+    assert hashes == {entry_hash({"link": "https://example.com/a"}), entry_hash({"link": "https://example.com/b"})}